@@ -1,32 +1,259 @@
-"""Adapter registry — auto-discovers and manages all adapters."""
-from typing import Dict
+"""Adapter registry — auto-discovers and manages all adapters.
+
+Adapter modules are imported lazily: the registry only knows each adapter's
+metadata (id, label, default config path) until the adapter is first asked for.
+
+Besides the built-ins below, adapters are discovered from
+  - the `claw_adapter.adapters` entry-point group (`name = "pkg.module:AdapterClass"`)
+  - `*.py` files in VAULT_ADAPTER_DIR (default: `plugins/` in the project root)
+  - `*.json` declarative specs in the same directory (see adapters/declarative.py)
+Discovered metadata is cached in VAULT_ADAPTER_CACHE (default: `.adapter_cache.json`
+next to the database), keyed by a stat() fingerprint of sys.path and the plugin
+files. While the fingerprint holds, boots read the cache and import nothing; a new
+or changed plugin is imported once to read its class attributes.
+
+all_adapters() leaves out adapters disabled in the `adapters` table and any
+whose code fails to load (logged once, retried after discover(refresh=True)).
+"""
+import hashlib
+import importlib
+import importlib.util
+import json
+import logging
+import os
+import sqlite3
+import sys
+from typing import Dict, FrozenSet, List, NamedTuple, Set
 from .base import BaseAdapter
-from .openclaw import OpenClawAdapter
-from .sillytavern import SillyTavernAdapter
-from .claude_code_router import ClaudeCodeRouterAdapter
+
+log = logging.getLogger(__name__)
+
+ENTRY_POINT_GROUP = "claw_adapter.adapters"
+PLUGIN_DIR = os.environ.get(
+    "VAULT_ADAPTER_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "plugins"))
+
+
+class AdapterMeta(NamedTuple):
+    id: str
+    label: str
+    default_config_path: str
+    module: str     # dotted module name, or the file path of a plugin-directory adapter / spec file
+    cls: str        # class name (the adapter id for spec files)
+    enabled: bool = True    # initial state when first registered in the adapters table
+
 
 # Register all adapters here. To add a new one:
 # 1. Create adapters/myservice.py inheriting BaseAdapter
-# 2. Import and add to _BUILTIN below
+# 2. Add its metadata to _BUILTIN below (module/class are imported on first use)
+# Adapters shipped outside this package use an entry point or the plugin directory instead.
 _BUILTIN = [
-    OpenClawAdapter(),
-    SillyTavernAdapter(),
-    ClaudeCodeRouterAdapter(),
+    AdapterMeta("openclaw", "OpenClaw", os.path.expanduser("~/.openclaw/openclaw.json"),
+                "adapters.openclaw", "OpenClawAdapter"),
+    AdapterMeta("sillytavern", "SillyTavern", os.path.expanduser("~/SillyTavern/data/default-user"),
+                "adapters.sillytavern", "SillyTavernAdapter"),
+    AdapterMeta("claude_code_router", "Claude Code Router", os.path.expanduser("~/.claude-code-router/config.json"),
+                "adapters.claude_code_router", "ClaudeCodeRouterAdapter"),
+    # Reference HTTPAdapter; there is no service to talk to until the user sets one up
+    AdapterMeta("http_admin", "HTTP Admin API", "http://127.0.0.1:8080",
+                "adapters.http_admin", "HTTPAdminAdapter", enabled=False),
 ]
 
+_BUILTIN_IDS = frozenset(m.id for m in _BUILTIN)
+_meta: Dict[str, AdapterMeta] = {m.id: m for m in _BUILTIN}
 _registry: Dict[str, BaseAdapter] = {}
+_broken: Set[str] = set()
+_disabled: Dict = {"version": None, "ids": frozenset()}
+_discovered = False
+
+
+# ── Discovery ──
+
+def _cache_path() -> str:
+    from db import DB_PATH
+    return os.environ.get("VAULT_ADAPTER_CACHE",
+                          os.path.join(os.path.dirname(os.path.abspath(DB_PATH)), ".adapter_cache.json"))
+
+
+def _plugin_files() -> List[str]:
+    try:
+        names = sorted(os.listdir(PLUGIN_DIR))
+    except OSError:
+        return []
+    return [os.path.join(PLUGIN_DIR, n) for n in names
+            if n.endswith((".py", ".json")) and not n.startswith(("_", "."))]
+
+
+def _stat_key(path: str) -> str:
+    try:
+        st = os.stat(path)
+        return f"{st.st_mtime_ns}:{st.st_size}"
+    except OSError:
+        return "-"
+
+
+def _fingerprint(files: List[str]) -> str:
+    """Changes when a distribution is (un)installed on sys.path or a plugin file changes."""
+    parts = [f"{p}={_stat_key(p)}" for p in sys.path if p and os.path.isdir(p)]
+    parts += [f"{f}={_stat_key(f)}" for f in [PLUGIN_DIR, *files]]
+    return hashlib.sha1("\n".join(parts).encode()).hexdigest()
 
-def _init():
-    for a in _BUILTIN:
-        _registry[a.id] = a
 
-_init()
+def _import(module: str):
+    if not module.endswith(".py"):
+        return importlib.import_module(module)
+    name = "claw_adapter_plugins." + os.path.splitext(os.path.basename(module))[0]
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.spec_from_file_location(name, module)
+    mod = importlib.util.module_from_spec(spec)
+    sys.modules[name] = mod
+    try:
+        spec.loader.exec_module(mod)
+    except BaseException:
+        del sys.modules[name]
+        raise
+    return mod
+
+
+def _meta_of(cls, module: str) -> list:
+    return list(AdapterMeta(cls.id, getattr(cls, "label", cls.id), getattr(cls, "default_config_path", ""),
+                            module, cls.__name__, getattr(cls, "enabled_by_default", True)))
+
+
+def _scan(previous: Dict[str, list], files: List[str]) -> Dict[str, list]:
+    """source key -> [meta fields, ...]. Sources unchanged since `previous` are not imported."""
+    from importlib.metadata import entry_points
+    found: Dict[str, list] = {}
+    for ep in entry_points(group=ENTRY_POINT_GROUP):
+        dist = getattr(ep, "dist", None)
+        key = f"ep:{dist.name if dist else ''}:{dist.version if dist else ''}:{ep.value}"
+        if key in previous:
+            found[key] = previous[key]
+            continue
+        try:
+            cls = ep.load()
+            found[key] = [_meta_of(cls, ep.value.partition(":")[0].strip())]
+        except Exception:
+            log.exception("adapter entry point %s failed to load", ep.name)
+    for path in files:
+        key = f"file:{path}:{_stat_key(path)}"
+        if key in previous:
+            found[key] = previous[key]
+            continue
+        try:
+            if path.endswith(".json"):
+                from .declarative import load_specs
+                found[key] = [list(AdapterMeta(s["id"], s.get("label", s["id"]),
+                                               os.path.expanduser(s.get("default_config_path", "")), path, s["id"]))
+                              for s in load_specs(path)]
+                continue
+            mod = _import(path)
+        except Exception:
+            log.exception("adapter plugin %s failed to load", path)
+            continue
+        found[key] = [_meta_of(obj, path) for obj in vars(mod).values()
+                      if isinstance(obj, type) and issubclass(obj, BaseAdapter)
+                      and obj.__module__ == mod.__name__ and getattr(obj, "id", None)]
+    return found
+
+
+def discover(refresh: bool = False) -> Dict[str, AdapterMeta]:
+    """Merge entry-point and plugin-directory adapters into the registry metadata.
+    Built-in ids take precedence. Runs once per process unless refresh is set."""
+    global _discovered
+    if _discovered and not refresh:
+        return dict(_meta)
+    _broken.clear()
+    files = _plugin_files()
+    fp = _fingerprint(files)
+    path = _cache_path()
+    try:
+        with open(path) as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        cache = {}
+    sources = cache.get("sources", {})
+    if refresh or cache.get("fingerprint") != fp:
+        sources = _scan(sources, files)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "w") as f:
+                json.dump({"fingerprint": fp, "sources": sources}, f)
+            os.replace(tmp, path)
+        except OSError:
+            pass  # read-only location: rescan next boot
+    for metas in sources.values():
+        for fields in metas:
+            m = AdapterMeta(*fields)
+            if m.id not in _BUILTIN_IDS:
+                _meta[m.id] = m
+    _discovered = True
+    return dict(_meta)
+
+
+# ── Registry ──
+
+def _load(adapter_id: str) -> BaseAdapter | None:
+    m = adapter_meta().get(adapter_id)
+    if m is None:
+        return None
+    if m.module.endswith(".json"):
+        from .declarative import from_spec_file
+        adapter = from_spec_file(m.module, m.cls)
+        if adapter is None:
+            return None
+    else:
+        adapter = getattr(_import(m.module), m.cls)()
+    _registry[adapter_id] = adapter
+    return adapter
+
+
+def adapter_meta() -> Dict[str, AdapterMeta]:
+    """Metadata for every known adapter, without importing adapter code."""
+    return discover()
+
 
 def get_adapter(adapter_id: str) -> BaseAdapter | None:
-    return _registry.get(adapter_id)
+    adapter = _registry.get(adapter_id)
+    if adapter is None:
+        adapter = _load(adapter_id)
+    return adapter
+
+
+def disabled_ids() -> FrozenSet[str]:
+    """Adapters switched off in the adapters table, re-read when the data version moves."""
+    import db
+    version = db.data_version()
+    if _disabled["version"] != version:
+        try:
+            with db.get_db_ctx() as conn:
+                ids = frozenset(r[0] for r in conn.execute("SELECT id FROM adapters WHERE enabled=0"))
+        except sqlite3.OperationalError:  # schema not created yet
+            ids = frozenset()
+        _disabled.update(version=version, ids=ids)
+    return _disabled["ids"]
+
+
+def all_adapters(include_disabled: bool = False) -> Dict[str, BaseAdapter]:
+    """Every adapter that loads; disabled ones only with include_disabled."""
+    skip = _broken if include_disabled else _broken | disabled_ids()
+    adapters = {}
+    for aid in adapter_meta():
+        if aid in skip:
+            continue
+        try:
+            adapter = get_adapter(aid)
+        except Exception:
+            log.exception("adapter %s failed to load", aid)
+            _broken.add(aid)
+            continue
+        if adapter is not None:
+            adapters[aid] = adapter
+    return adapters
 
-def all_adapters() -> Dict[str, BaseAdapter]:
-    return dict(_registry)
 
 def register(adapter: BaseAdapter):
+    discover()
+    _meta[adapter.id] = AdapterMeta(adapter.id, adapter.label, adapter.default_config_path,
+                                    type(adapter).__module__, type(adapter).__name__, adapter.enabled_by_default)
     _registry[adapter.id] = adapter
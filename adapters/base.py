@@ -1,6 +1,32 @@
 """Abstract base adapter — all service adapters inherit from this."""
+import asyncio
+import functools
+import hashlib
+import json
+import os
+import shutil
 from abc import ABC, abstractmethod
-from typing import Any, Dict, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, NamedTuple, Optional
+
+# Config file I/O from async routes runs here, apart from the DB executor and
+# the default threadpool.
+_IO_EXECUTOR = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("VAULT_ADAPTER_IO_WORKERS", "8")), thread_name_prefix="adapter-io",
+)
+
+
+class Endpoints(NamedTuple):
+    names: List[str]     # endpoint names in the service config, in file order
+    fingerprint: str     # hash of the content the names were read from ("" when there is none)
+
+
+def content_fingerprint(*chunks: str) -> str:
+    h = hashlib.sha1()
+    for chunk in chunks:
+        h.update(chunk.encode())
+        h.update(b"\0")
+    return h.hexdigest()[:16]
 
 
 class BaseAdapter(ABC):
@@ -9,6 +35,7 @@ class BaseAdapter(ABC):
     id: str          # unique key, e.g. "openclaw"
     label: str       # display name
     default_config_path: str = ""
+    enabled_by_default: bool = True   # registered disabled otherwise, until the user turns it on
 
     @abstractmethod
     def read_current(self, config_path: str) -> Optional[Dict[str, Any]]:
@@ -25,6 +52,82 @@ class BaseAdapter(ABC):
         Returns True on success."""
         ...
 
+    def list_endpoints(self, config_path: str) -> Endpoints:
+        """Endpoint names only, for orphan checks that must not touch API keys.
+        This default goes through read_current; adapters override it with a
+        read that skips secrets and per-endpoint details."""
+        current = self.read_current(config_path)
+        names = []
+        if current and "providers" in current:
+            names = [p.get("provider_name", "") for p in current["providers"] if p.get("provider_name")]
+        return Endpoints(names, content_fingerprint(*names) if names else "")
+
+    def config_lock(self, config_path: str):
+        """Cross-process lock guarding a read-modify-write of this adapter's config."""
+        from locks import file_lock
+        return file_lock(f"adapter-{self.id}-{os.path.abspath(config_path or self.default_config_path)}")
+
+    def apply_locked(self, config_path: str, base_url: str, api_key: str, **kwargs) -> bool:
+        """apply() under config_lock, so concurrent workers can't clobber each other's writes."""
+        with self.config_lock(config_path):
+            return self.apply(config_path, base_url, api_key, **kwargs)
+
+    async def read_current_async(self, config_path: str) -> Optional[Dict[str, Any]]:
+        """Non-blocking read_current, run on the adapter I/O executor."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_IO_EXECUTOR, self.read_current, config_path)
+
+    async def list_endpoints_async(self, config_path: str) -> Endpoints:
+        """Non-blocking list_endpoints, run on the adapter I/O executor."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_IO_EXECUTOR, self.list_endpoints, config_path)
+
+    async def apply_async(self, config_path: str, base_url: str, api_key: str, **kwargs) -> bool:
+        """Non-blocking apply_locked, run on the adapter I/O executor."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            _IO_EXECUTOR, functools.partial(self.apply_locked, config_path, base_url, api_key, **kwargs))
+
+    def write_json(self, path: str, data: Any):
+        """Write a config file atomically (temp file + rename, original mode kept),
+        so readers in other workers never see a half-written file."""
+        self.write_text(path, json.dumps(data, indent=2, ensure_ascii=False))
+
+    def write_text(self, path: str, text: str):
+        """write_json for already-serialized content (e.g. a patched document).
+        The file being replaced is snapshotted first (services.snapshots)."""
+        self._replace(path, "w", text)
+
+    def write_bytes(self, path: str, data: bytes):
+        """write_text for raw file content, written back byte for byte (snapshot restores)."""
+        self._replace(path, "wb", data)
+
+    def _replace(self, path: str, mode: str, content):
+        from services import snapshots
+        snapshots.capture(self.id, path)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, mode) as f:
+            f.write(content)
+        if os.path.exists(path):
+            shutil.copymode(path, tmp)
+        os.replace(tmp, path)
+
+    def config_files(self, config_path: str) -> List[str]:
+        """Files that read_current/apply touch. Used for change fingerprints."""
+        return [config_path or self.default_config_path]
+
+    def change_token(self, config_path: str) -> str:
+        """Cheap value that changes when the config may have changed (ETags):
+        stat() of every config file, no reads."""
+        parts = []
+        for path in self.config_files(config_path):
+            try:
+                st = os.stat(path)
+                parts.append(f"{st.st_mtime_ns}:{st.st_size}")
+            except OSError:
+                parts.append("-")
+        return ",".join(parts)
+
     def mask_key(self, key: str) -> str:
         if len(key) <= 8:
             return "****"
@@ -2,7 +2,8 @@
 import json
 import os
 from typing import Any, Dict, List, Optional
-from .base import BaseAdapter
+from . import json_edit
+from .base import BaseAdapter, Endpoints, content_fingerprint
 
 
 class ClaudeCodeRouterAdapter(BaseAdapter):
@@ -29,6 +30,25 @@ class ClaudeCodeRouterAdapter(BaseAdapter):
             })
         return {"providers": results}
 
+    def list_endpoints(self, config_path: str) -> Endpoints:
+        path = config_path or self.default_config_path
+        if not os.path.exists(path):
+            return Endpoints([], "")
+        with open(path, "r") as f:
+            text = f.read()
+        span = json_edit.find(text, ("Providers",))
+        names: List[str] = []
+        if span is not None and text[span[0]] == "[":
+            # Decode only each provider's name, never its api_key
+            for start, _ in json_edit.iter_items(text, span[0]):
+                if text[start] != "{":
+                    continue
+                p = json_edit.index_members(text, start, ("name",))
+                name = json_edit.decode(text, p.spans["name"][1]) if "name" in p.spans else ""
+                if name:
+                    names.append(name)
+        return Endpoints(names, content_fingerprint(text))
+
     def apply(self, config_path: str, base_url: str, api_key: str, **kwargs) -> bool:
         path = config_path or self.default_config_path
         if not os.path.exists(path):
@@ -46,6 +66,5 @@ class ClaudeCodeRouterAdapter(BaseAdapter):
             updated = True
         if not updated:
             return False
-        with open(path, "w") as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+        self.write_json(path, data)
         return True
@@ -0,0 +1,145 @@
+"""Declarative adapters — onboard a service with a spec entry instead of code.
+
+A spec says where a service keeps its endpoints and which fields hold the
+connection settings:
+
+    {
+      "id": "litellm",
+      "label": "LiteLLM",
+      "default_config_path": "~/litellm/config.yaml",
+      "format": "yaml",
+      "endpoints": "model_list",
+      "name": "model_name",
+      "base_url": "litellm_params.api_base",
+      "api_key": "litellm_params.api_key",
+      "fields": {"api": "litellm_params.custom_llm_provider"}
+    }
+
+- format: json | yaml | toml | env (default: from the file extension)
+- endpoints: dotted path to a list or mapping of endpoints; omit it when the
+  whole file is one endpoint (typical for .env), named by "endpoint_name"
+- name: for a list, the field holding each endpoint's name (mappings use the key)
+- base_url / api_key / fields: dotted paths inside an endpoint; numeric parts index lists
+
+Spec files are `*.json` in the plugin directory (one spec or a list of specs)
+and are discovered with the code plugins. Writes go through adapters.formats,
+so only the changed values are rewritten.
+"""
+import json
+import os
+from typing import Any, Dict, List, Optional, Tuple
+from . import formats
+from .base import BaseAdapter, Endpoints, content_fingerprint
+
+_REQUIRED = ("id", "base_url", "api_key")
+
+
+def _path(expr: str) -> Tuple:
+    return tuple(int(p) if p.isdigit() else p for p in expr.split(".") if p) if expr else ()
+
+
+def load_specs(spec_file: str) -> List[Dict[str, Any]]:
+    """Specs in a spec file, validated. Raises ValueError on a malformed spec."""
+    with open(spec_file) as f:
+        data = json.load(f)
+    specs = data if isinstance(data, list) else [data]
+    for spec in specs:
+        missing = [k for k in _REQUIRED if not spec.get(k)]
+        if missing:
+            raise ValueError(f"adapter spec {spec.get('id', '?')!r} is missing {', '.join(missing)}")
+        if spec.get("format") and spec["format"] not in formats.FORMATS:
+            raise ValueError(f"adapter spec {spec['id']!r}: unknown format {spec['format']!r}")
+    return specs
+
+
+def from_spec_file(spec_file: str, adapter_id: str) -> Optional["DeclarativeAdapter"]:
+    for spec in load_specs(spec_file):
+        if spec["id"] == adapter_id:
+            return DeclarativeAdapter(spec)
+    return None
+
+
+class DeclarativeAdapter(BaseAdapter):
+    """Adapter driven entirely by a spec dict (see module docstring)."""
+
+    def __init__(self, spec: Dict[str, Any]):
+        self.spec = spec
+        self.id = spec["id"]
+        self.label = spec.get("label", spec["id"])
+        self.default_config_path = os.path.expanduser(spec.get("default_config_path", ""))
+        self._endpoints_path = _path(spec.get("endpoints", ""))
+        self._name_path = _path(spec.get("name", "name"))
+        self._base_url_path = _path(spec["base_url"])
+        self._api_key_path = _path(spec["api_key"])
+        self._fields = {k: _path(v) for k, v in spec.get("fields", {}).items()}
+
+    def _document(self, config_path: str) -> Optional[formats.Document]:
+        path = config_path or self.default_config_path
+        if not os.path.exists(path):
+            return None
+        with open(path, "r") as f:
+            text = f.read()
+        return formats.load(text, self.spec.get("format") or formats.detect_format(path))
+
+    def _endpoints(self, data: Any) -> List[Tuple[str, Tuple]]:
+        """(name, path prefix) for every endpoint in the parsed config."""
+        if not self._endpoints_path and "endpoints" not in self.spec:
+            return [(self.spec.get("endpoint_name", "default"), ())]
+        container = formats.get_in(data, self._endpoints_path)
+        prefix = self._endpoints_path
+        if isinstance(container, dict):
+            return [(str(k), prefix + (k,)) for k in container]
+        if isinstance(container, list):
+            return [(str(formats.get_in(item, self._name_path, "") or ""), prefix + (i,))
+                    for i, item in enumerate(container)]
+        return []
+
+    def read_current(self, config_path: str) -> Optional[Dict[str, Any]]:
+        doc = self._document(config_path)
+        if doc is None:
+            return None
+        results = []
+        for name, prefix in self._endpoints(doc.data):
+            item = formats.get_in(doc.data, prefix)
+            entry = {
+                "provider_name": name,
+                "base_url": formats.get_in(item, self._base_url_path, "") or "",
+                "api_key": formats.get_in(item, self._api_key_path, "") or "",
+            }
+            for field, path in self._fields.items():
+                entry[field] = formats.get_in(item, path, "")
+            results.append(entry)
+        return {"providers": results} if results else None
+
+    def list_endpoints(self, config_path: str) -> Endpoints:
+        doc = self._document(config_path)
+        if doc is None:
+            return Endpoints([], "")
+        names = [name for name, _ in self._endpoints(doc.data) if name]
+        return Endpoints(names, content_fingerprint(doc.text))
+
+    def apply(self, config_path: str, base_url: str, api_key: str, **kwargs) -> bool:
+        doc = self._document(config_path)
+        if doc is None:
+            return False
+        target = kwargs.get("provider_name", "")
+        extra = kwargs.get("extra_fields", {}) or {}
+        endpoints = self._endpoints(doc.data)
+        if target:
+            endpoints = [(n, p) for n, p in endpoints if n == target]
+        if not endpoints:
+            # Target specified but not found (or nothing to update) — refuse to write
+            return False
+        for _, prefix in endpoints:
+            updates = [(self._base_url_path, base_url), (self._api_key_path, api_key)]
+            updates += [(path, extra[field]) for field, path in self._fields.items() if field in extra]
+            for path, value in updates:
+                if not doc.set(prefix + path, value):
+                    return False
+        if doc.changed:
+            try:
+                text = doc.render()
+            except ValueError:
+                return False
+            self.write_text(config_path or self.default_config_path, text)
+        return True
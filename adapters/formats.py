@@ -0,0 +1,355 @@
+"""Format-preserving config documents: JSON, YAML, TOML and .env.
+
+Each Document parses its text into plain Python data for reading, and turns
+set(path, value) calls into edits of the scalar spans in the original text,
+so a write changes only the lines holding the updated values (comments, key
+order, quoting style and indentation are kept). A missing final key is
+appended next to its siblings; anything the locator can't place (flow
+collections, multi-line values) makes set() return False. render() re-parses
+the patched text and checks it against the expected data before returning it.
+
+YAML needs PyYAML; TOML needs tomllib (3.11+) or tomli.
+"""
+import copy
+import json
+import os
+import re
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+from . import json_edit
+
+try:
+    import yaml
+except ImportError:  # optional; YAML configs unsupported without it
+    yaml = None
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    try:
+        import tomli as tomllib
+    except ImportError:  # optional; TOML configs unsupported without it
+        tomllib = None
+
+Path = Tuple[Union[str, int], ...]
+_MISSING = object()
+
+FORMATS = ("json", "yaml", "toml", "env")
+_EXTENSIONS = {".json": "json", ".yaml": "yaml", ".yml": "yaml", ".toml": "toml", ".env": "env"}
+
+
+def detect_format(path: str) -> str:
+    name = os.path.basename(path)
+    if name == ".env" or name.startswith(".env.") or name.endswith(".env"):
+        return "env"
+    return _EXTENSIONS.get(os.path.splitext(name)[1].lower(), "json")
+
+
+def get_in(data: Any, path: Sequence[Union[str, int]], default: Any = None) -> Any:
+    for part in path:
+        if isinstance(data, dict) and part in data:
+            data = data[part]
+        elif isinstance(data, list) and isinstance(part, int) and 0 <= part < len(data):
+            data = data[part]
+        else:
+            return default
+    return data
+
+
+def _set_in(data: Any, path: Path, value: Any) -> bool:
+    parent = get_in(data, path[:-1])
+    if isinstance(parent, dict):
+        parent[path[-1]] = value
+        return True
+    if isinstance(parent, list) and isinstance(path[-1], int) and 0 <= path[-1] < len(parent):
+        parent[path[-1]] = value
+        return True
+    return False
+
+
+class Document(ABC):
+    """Parsed config text plus pending span edits."""
+
+    def __init__(self, text: str):
+        self.text = text
+        self.data = self.parse(text)
+        self._expected = copy.deepcopy(self.data)
+        self._edits: List[json_edit.Edit] = []
+
+    @abstractmethod
+    def parse(self, text: str) -> Any:
+        """Plain Python data for text."""
+        ...
+
+    @abstractmethod
+    def locate(self, path: Path, value: Any) -> Optional[json_edit.Edit]:
+        """Edit writing value at path, or None when it can't be placed."""
+        ...
+
+    def set(self, path: Path, value: Any) -> bool:
+        if get_in(self._expected, path, _MISSING) == value:
+            return True
+        edit = self.locate(tuple(path), value)
+        if edit is None or not _set_in(self._expected, tuple(path), value):
+            return False
+        self._edits.append(edit)
+        return True
+
+    @property
+    def changed(self) -> bool:
+        return bool(self._edits)
+
+    def render(self) -> str:
+        """Patched text. Raises ValueError if it wouldn't parse back to the expected data."""
+        text = json_edit.apply_edits(self.text, self._edits)
+        if self.parse(text) != self._expected:
+            raise ValueError("patched config does not round-trip")
+        return text
+
+
+# ── JSON ──
+
+class JSONDocument(Document):
+    _unit: Any = _MISSING   # document indent step, found on first insert
+
+    def parse(self, text: str) -> Any:
+        return json.loads(text) if text.strip() else {}
+
+    def locate(self, path: Path, value: Any) -> Optional[json_edit.Edit]:
+        text = self.text
+        if not text.strip() or not path:
+            return None
+        start = json_edit.root(text)
+        parent = json_edit.find(text, path[:-1], start) if path[:-1] else (start, None)
+        if parent is None:
+            return None
+        pos = parent[0]
+        if isinstance(path[-1], int):
+            span = json_edit.find(text, path[-1:], pos)
+            return (span[0], span[1], json.dumps(value, ensure_ascii=False)) if span else None
+        if text[pos:pos + 1] != "{":
+            return None
+        if self._unit is _MISSING:
+            top = json_edit.index_members(text, start, ()) if text[start:start + 1] == "{" else None
+            self._unit = json_edit.indent_unit(text, top) if top else None
+        obj = json_edit.index_members(text, pos, (path[-1],))
+        return json_edit.set_member(text, obj, path[-1], value, self._unit)
+
+
+# ── YAML ──
+
+_YAML_PLAIN = re.compile(r"[A-Za-z0-9_./:@+-][A-Za-z0-9_./:@+ -]*\Z")
+_YAML_RESERVED = re.compile(r"(?i)(true|false|yes|no|on|off|null|~|[-+]?[0-9][0-9_.eE+-]*|\.inf|\.nan)\Z")
+
+
+def _yaml_scalar(value: Any, style: Optional[str]) -> str:
+    if not isinstance(value, str):
+        return json.dumps(value)
+    if style == "'" and "\n" not in value:
+        return "'" + value.replace("'", "''") + "'"
+    if style in (None, "") and _YAML_PLAIN.match(value) and not _YAML_RESERVED.match(value) \
+            and not value.endswith(" ") and ": " not in value and " #" not in value:
+        return value
+    return json.dumps(value, ensure_ascii=False)
+
+
+class YAMLDocument(Document):
+    def parse(self, text: str) -> Any:
+        if yaml is None:
+            raise RuntimeError("YAML configs need PyYAML (pip install pyyaml)")
+        return yaml.safe_load(text) if text.strip() else {}
+
+    def _node(self, path: Path):
+        node = yaml.compose(self.text)
+        for part in path:
+            if isinstance(node, yaml.MappingNode):
+                node = next((v for k, v in node.value if k.value == part), None)
+            elif isinstance(node, yaml.SequenceNode) and isinstance(part, int) and part < len(node.value):
+                node = node.value[part]
+            else:
+                return None
+            if node is None:
+                return None
+        return node
+
+    def locate(self, path: Path, value: Any) -> Optional[json_edit.Edit]:
+        if not path or not self.text.strip():
+            return None
+        node = self._node(path)
+        if isinstance(node, yaml.ScalarNode):
+            if node.style in ("|", ">"):
+                return None
+            return (node.start_mark.index, node.end_mark.index, _yaml_scalar(value, node.style))
+        if node is not None or isinstance(path[-1], int):
+            return None
+        parent = self._node(path[:-1])
+        if not isinstance(parent, yaml.MappingNode) or parent.flow_style or not parent.value:
+            return None
+        indent = " " * parent.value[0][0].start_mark.column
+        line = f"{indent}{_yaml_scalar(path[-1], None)}: {_yaml_scalar(value, None)}"
+        end = parent.value[-1][1].end_mark.index
+        if end and self.text[end - 1] == "\n":
+            return (end, end, line + "\n")
+        eol = self.text.find("\n", end)
+        eol = len(self.text) if eol < 0 else eol
+        return (eol, eol, "\n" + line)
+
+
+# ── TOML ──
+
+_TOML_KEY = r'(?:[A-Za-z0-9_-]+|"(?:[^"\\]|\\.)*"|\'[^\']*\')'
+_TOML_DOTTED = re.compile(rf"\s*({_TOML_KEY}(?:\s*\.\s*{_TOML_KEY})*)\s*")
+_TOML_HEADER = re.compile(rf"\s*(\[\[?)\s*({_TOML_KEY}(?:\s*\.\s*{_TOML_KEY})*)\s*\]\]?\s*(?:#.*)?$")
+_TOML_KEY_PART = re.compile(_TOML_KEY)
+_TOML_BASIC = re.compile(r'"(?:[^"\\\n]|\\.)*"')
+_TOML_LITERAL = re.compile(r"'[^'\n]*'")
+
+
+def _toml_keys(dotted: str) -> List[str]:
+    keys = []
+    for k in _TOML_KEY_PART.findall(dotted):
+        if k.startswith('"'):
+            k = json.loads(k)
+        elif k.startswith("'"):
+            k = k[1:-1]
+        keys.append(k)
+    return keys
+
+
+class TOMLDocument(Document):
+    def parse(self, text: str) -> Any:
+        if tomllib is None:
+            raise RuntimeError("TOML configs need Python 3.11+ or tomli (pip install tomli)")
+        return tomllib.loads(text)
+
+    def _scan(self):
+        """Single-line values: full path -> (start, end); tables: path -> insertion point."""
+        values: Dict[Path, Tuple[int, int]] = {}
+        tables: Dict[Path, int] = {(): 0}
+        table: Path = ()
+        counts: Dict[Path, int] = {}
+        pos, text, skip_until = 0, self.text, None
+        for line in text.splitlines(keepends=True):
+            start, pos = pos, pos + len(line)
+            if skip_until:
+                if skip_until in line:
+                    skip_until = None
+                continue
+            header = _TOML_HEADER.match(line)
+            if header:
+                path = tuple(_toml_keys(header.group(2)))
+                if header.group(1) == "[[":
+                    counts[path] = counts.get(path, -1) + 1
+                    path = path + (counts[path],)
+                else:
+                    # Nested tables under an array-of-tables element belong to its latest entry
+                    resolved: List[Union[str, int]] = []
+                    for k in path:
+                        resolved.append(k)
+                        if tuple(resolved) in counts:
+                            resolved.append(counts[tuple(resolved)])
+                    path = tuple(resolved)
+                table = path
+                tables[table] = pos if line.endswith("\n") else start + len(line)
+                continue
+            m = _TOML_DOTTED.match(line)
+            if not m or line[m.end():m.end() + 1] != "=" or line.lstrip().startswith("#"):
+                continue
+            vstart = m.end() + 1
+            while vstart < len(line) and line[vstart] in " \t":
+                vstart += 1
+            rest = line[vstart:]
+            for quote in ('"""', "'''"):
+                if rest.startswith(quote) and rest.count(quote) < 2:
+                    skip_until = quote
+            if skip_until or rest[:1] in "[{":
+                if rest[:1] in "[{" and rest.count(rest[0]) != rest.count("]" if rest[0] == "[" else "}"):
+                    skip_until = "]" if rest[0] == "[" else "}"
+                tables[table] = pos
+                continue
+            tm = _TOML_BASIC.match(rest) or _TOML_LITERAL.match(rest)
+            if tm:
+                vend = tm.end()
+            else:
+                vend = len(rest.split("#", 1)[0].rstrip())
+            values[table + tuple(_toml_keys(m.group(1)))] = (start + vstart, start + vstart + vend)
+            tables[table] = pos
+        return values, tables
+
+    def locate(self, path: Path, value: Any) -> Optional[json_edit.Edit]:
+        if not path or isinstance(path[-1], int):
+            return None
+        values, tables = self._scan()
+        literal = json.dumps(value, ensure_ascii=False)
+        if path in values:
+            start, end = values[path]
+            if isinstance(value, str) and self.text[start:start + 1] == "'" and "'" not in value and "\n" not in value:
+                literal = f"'{value}'"
+            return (start, end, literal)
+        if path[:-1] not in tables:
+            return None
+        at = tables[path[:-1]]
+        key = path[-1] if re.fullmatch(r"[A-Za-z0-9_-]+", path[-1]) else json.dumps(path[-1])
+        prefix = "" if at == 0 or self.text[at - 1:at] == "\n" else "\n"
+        return (at, at, f"{prefix}{key} = {literal}\n")
+
+
+# ── .env ──
+
+# [ \t] rather than \s: with re.M, \s would run over a newline and give an empty
+# KEY= the next line as its value
+_ENV_LINE = re.compile(r"^([ \t]*(?:export[ \t]+)?)([A-Za-z_][A-Za-z0-9_.]*)([ \t]*=[ \t]*)(.*?)(\r?)$", re.M)
+
+
+def _env_value(raw: str) -> Tuple[str, int]:
+    """(value, length of the value token) for the text after `KEY=`."""
+    if raw[:1] == '"':
+        m = re.match(r'"((?:[^"\\]|\\.)*)"', raw)
+        if m:
+            return re.sub(r"\\(.)", lambda e: {"n": "\n", "t": "\t"}.get(e.group(1), e.group(1)), m.group(1)), m.end()
+    if raw[:1] == "'":
+        end = raw.find("'", 1)
+        if end > 0:
+            return raw[1:end], end + 1
+    token = re.split(r"\s+#", raw, 1)[0].rstrip()
+    return token, len(token)
+
+
+def _env_literal(value: Any, quote: str) -> str:
+    value = "" if value is None else str(value)
+    if quote == "'" and "'" not in value and "\n" not in value:
+        return f"'{value}'"
+    if quote == '"' or re.search(r"[\s#'\"\\]", value):
+        return '"' + value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+    return value
+
+
+class EnvDocument(Document):
+    def parse(self, text: str) -> Any:
+        return {m.group(2): _env_value(m.group(4))[0] for m in _ENV_LINE.finditer(text)}
+
+    def set(self, path: Path, value: Any) -> bool:
+        return super().set(path, "" if value is None else str(value))
+
+    def locate(self, path: Path, value: Any) -> Optional[json_edit.Edit]:
+        if len(path) != 1:
+            return None
+        found = None
+        for m in _ENV_LINE.finditer(self.text):
+            if m.group(2) == path[0]:
+                found = m  # the last assignment wins, as in the shell
+        if found:
+            start = found.start(4)
+            _, length = _env_value(found.group(4))
+            return (start, start + length, _env_literal(value, found.group(4)[:1]))
+        at = len(self.text)
+        prefix = "" if not self.text or self.text.endswith("\n") else "\n"
+        return (at, at, f"{prefix}{path[0]}={_env_literal(value, '')}\n")
+
+
+_DOCUMENTS = {"json": JSONDocument, "yaml": YAMLDocument, "toml": TOMLDocument, "env": EnvDocument}
+
+
+def load(text: str, fmt: str) -> Document:
+    return _DOCUMENTS[fmt](text)
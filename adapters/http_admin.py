@@ -0,0 +1,48 @@
+"""Generic HTTP admin API adapter — reference implementation of HTTPAdapter.
+
+Speaks a minimal JSON contract:
+  GET /providers          -> {"providers": [{"name", "base_url", "api_key", ...}]}
+  PUT /providers/{name}   <- {"base_url", "api_key", ...extra fields}; 404 if unknown
+config_path is the admin API base URL (several instances: comma-separated);
+a bearer token, if the API wants one, comes from VAULT_HTTP_ADMIN_TOKEN.
+It is registered disabled: enable it (and set its URL) on the adapters page.
+"""
+from typing import Any, Dict, List
+from .http_base import HTTPAdapter, HTTPError
+
+
+class HTTPAdminAdapter(HTTPAdapter):
+    id = "http_admin"
+    label = "HTTP Admin API"
+    default_config_path = "http://127.0.0.1:8080"
+    token_env = "VAULT_HTTP_ADMIN_TOKEN"
+    enabled_by_default = False
+
+    def fetch_endpoints(self, instance: str) -> List[Dict[str, Any]]:
+        data = self.call(instance, "GET", "/providers", retries=self.read_retries) or {}
+        items = data.get("providers", []) if isinstance(data, dict) else data
+        return [{
+            "provider_name": p.get("name", ""),
+            "base_url": p.get("base_url", ""),
+            "api_key": p.get("api_key", ""),
+            "api": p.get("api", ""),
+        } for p in items]
+
+    def push_endpoint(self, instance: str, base_url: str, api_key: str,
+                      provider_name: str, extra_fields: Dict[str, Any]) -> bool:
+        payload = {"base_url": base_url, "api_key": api_key}
+        if "api" in extra_fields:
+            payload["api"] = extra_fields["api"]
+        if provider_name:
+            targets = [provider_name]
+        else:
+            # No target specified — update every endpoint, as the file adapters do
+            targets = [p["provider_name"] for p in self.fetch_endpoints(instance) if p["provider_name"]]
+        for name in targets:
+            try:
+                self.call(instance, "PUT", f"/providers/{self.quote(name)}", payload)
+            except HTTPError as e:
+                if e.status == 404:
+                    return False  # target not found — refuse, like the file adapters
+                raise
+        return bool(targets)
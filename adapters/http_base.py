@@ -0,0 +1,226 @@
+"""HTTP-backed adapters — for services configured through a local admin API.
+
+The adapter's config_path holds the admin API base URL instead of a file path;
+several instances of the same service can be listed, separated by commas or
+whitespace, and apply() pushes to all of them concurrently. Requests share one
+keep-alive connection pool (stdlib http.client), carry a timeout, and are
+retried with exponential backoff on connection errors and 429/5xx answers.
+There is no file to stat for ETags, so change_token() rolls over every
+VAULT_ADAPTER_HTTP_TTL seconds: cached views pick up remote edits within that.
+"""
+import http.client
+import json
+import os
+import random
+import socket
+import threading
+import time
+from abc import abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import quote, urlsplit
+
+from .base import BaseAdapter, Endpoints, content_fingerprint
+
+# Fan-out pushes to several instances run here, apart from the adapter file I/O executor
+_HTTP_EXECUTOR = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("VAULT_ADAPTER_HTTP_WORKERS", "16")), thread_name_prefix="adapter-http",
+)
+
+_RETRY_STATUS = {429, 502, 503, 504}
+FINGERPRINT_TTL = float(os.environ.get("VAULT_ADAPTER_HTTP_TTL", "30"))
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, body: bytes = b""):
+        super().__init__(f"HTTP {status}")
+        self.status = status
+        self.body = body
+
+
+class ConnectionPool:
+    """Idle keep-alive connections per (scheme, host, port), shared across threads."""
+
+    def __init__(self, maxsize: int = 8):
+        self.maxsize = maxsize
+        self._idle: Dict[Tuple[str, str, int], List[http.client.HTTPConnection]] = {}
+        self._lock = threading.Lock()
+
+    def _checkout(self, key, timeout: float) -> Tuple[http.client.HTTPConnection, bool]:
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                conn = idle.pop()
+                conn.timeout = timeout
+                if conn.sock is not None:
+                    conn.sock.settimeout(timeout)
+                return conn, True
+        scheme, host, port = key
+        cls = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        conn = cls(host, port, timeout=timeout)
+        conn.connect()
+        # Small request/response pairs: don't let Nagle wait on delayed ACKs
+        conn.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return conn, False
+
+    def _checkin(self, key, conn: http.client.HTTPConnection):
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.maxsize:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def request(self, method: str, url: str, body: Optional[bytes] = None,
+                headers: Optional[Dict[str, str]] = None, timeout: float = 5.0) -> Tuple[int, bytes]:
+        """One request/response on a pooled connection. A reused connection the
+        server has meanwhile closed is replaced once, transparently."""
+        parts = urlsplit(url)
+        scheme = parts.scheme or "http"
+        key = (scheme, parts.hostname or "localhost", parts.port or (443 if scheme == "https" else 80))
+        target = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        while True:
+            conn, reused = self._checkout(key, timeout)
+            try:
+                conn.request(method, target, body=body, headers=headers or {})
+                resp = conn.getresponse()
+                data = resp.read()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                conn.close()
+                if reused:
+                    continue
+                raise
+            except Exception:
+                conn.close()
+                raise
+            if resp.will_close:
+                conn.close()
+            else:
+                self._checkin(key, conn)
+            return resp.status, data
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for conns in idle.values():
+            for conn in conns:
+                conn.close()
+
+
+POOL = ConnectionPool(maxsize=int(os.environ.get("VAULT_ADAPTER_HTTP_POOL", "8")))
+
+
+class HTTPAdapter(BaseAdapter):
+    """Base for adapters whose service exposes its provider config over HTTP.
+
+    Subclasses implement fetch_endpoints() and push_endpoint() for one instance
+    using self.call(); this class handles instance fan-out, retries and pooling."""
+
+    timeout: float = 5.0          # seconds per attempt
+    retries: int = 3              # extra attempts for writes
+    read_retries: int = 0         # reads back orphan checks and the topology; fail fast
+    backoff: float = 0.2          # first retry delay, doubled per attempt (plus jitter)
+    token_env: str = ""           # env var holding a bearer token for the admin API
+
+    def instances(self, config_path: str) -> List[str]:
+        raw = (config_path or self.default_config_path).replace(",", " ")
+        return [u.rstrip("/") for u in raw.split() if u]
+
+    def config_files(self, config_path: str) -> List[str]:
+        return []  # nothing on disk to snapshot
+
+    def change_token(self, config_path: str) -> str:
+        # The remote config can change at any time and asking would cost a request
+        # per ETag check, so the token just expires after FINGERPRINT_TTL
+        return f"ttl:{int(time.time() // FINGERPRINT_TTL)}"
+
+    def headers(self) -> Dict[str, str]:
+        h = {"Accept": "application/json"}
+        token = os.environ.get(self.token_env, "") if self.token_env else ""
+        if token:
+            h["Authorization"] = f"Bearer {token}"
+        return h
+
+    def call(self, instance: str, method: str, path: str, payload: Any = None,
+             retries: Optional[int] = None) -> Any:
+        """JSON request against one instance. Returns the decoded body (None if empty);
+        raises HTTPError on a non-2xx answer and OSError when the instance is unreachable."""
+        body = None
+        headers = self.headers()
+        if payload is not None:
+            body = json.dumps(payload, ensure_ascii=False).encode()
+            headers["Content-Type"] = "application/json"
+        attempts = 1 + (self.retries if retries is None else retries)
+        for attempt in range(attempts):
+            try:
+                status, data = POOL.request(method, instance + path, body, headers, self.timeout)
+            except (OSError, http.client.HTTPException):
+                if attempt + 1 == attempts:
+                    raise
+            else:
+                if 200 <= status < 300:
+                    return json.loads(data) if data.strip() else None
+                if status not in _RETRY_STATUS or attempt + 1 == attempts:
+                    raise HTTPError(status, data)
+            delay = self.backoff * (2 ** attempt)
+            time.sleep(delay + random.uniform(0, delay))
+
+    @staticmethod
+    def quote(segment: str) -> str:
+        return quote(segment, safe="")
+
+    @abstractmethod
+    def fetch_endpoints(self, instance: str) -> List[Dict[str, Any]]:
+        """Endpoints of one instance, shaped like read_current()'s providers
+        ({provider_name, base_url, api_key, ...})."""
+        ...
+
+    @abstractmethod
+    def push_endpoint(self, instance: str, base_url: str, api_key: str,
+                      provider_name: str, extra_fields: Dict[str, Any]) -> bool:
+        """Write one endpoint's connection config to one instance. False if the
+        target endpoint doesn't exist there."""
+        ...
+
+    def read_current(self, config_path: str) -> Optional[Dict[str, Any]]:
+        instances = self.instances(config_path)
+        if not instances:
+            return None
+        try:
+            providers = self.fetch_endpoints(instances[0])
+        except (OSError, http.client.HTTPException, HTTPError, ValueError):
+            return None
+        return {"providers": providers} if providers else None
+
+    def list_endpoints(self, config_path: str) -> Endpoints:
+        current = self.read_current(config_path)
+        names = [p["provider_name"] for p in (current or {}).get("providers", []) if p.get("provider_name")]
+        return Endpoints(names, content_fingerprint(*names) if names else "")
+
+    def push(self, config_path: str, base_url: str, api_key: str, **kwargs) -> Dict[str, Dict[str, Any]]:
+        """Push to every instance concurrently. Returns instance -> {ok, ms, error?}."""
+        provider_name = kwargs.get("provider_name", "")
+        extra = kwargs.get("extra_fields", {}) or {}
+
+        def one(instance: str) -> Dict[str, Any]:
+            t0 = time.perf_counter()
+            try:
+                ok = self.push_endpoint(instance, base_url, api_key, provider_name, extra)
+                result: Dict[str, Any] = {"ok": bool(ok)}
+            except HTTPError as e:
+                result = {"ok": False, "error": str(e)}
+            except (OSError, http.client.HTTPException, ValueError) as e:
+                result = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+            result["ms"] = round((time.perf_counter() - t0) * 1000, 1)
+            return result
+
+        instances = self.instances(config_path)
+        return dict(zip(instances, _HTTP_EXECUTOR.map(one, instances)))
+
+    def apply(self, config_path: str, base_url: str, api_key: str, **kwargs) -> bool:
+        results = self.push(config_path, base_url, api_key, **kwargs)
+        return bool(results) and all(r["ok"] for r in results.values())
+
+    def apply_locked(self, config_path: str, base_url: str, api_key: str, **kwargs) -> bool:
+        # The service serializes its own config writes; no file to lock
+        return self.apply(config_path, base_url, api_key, **kwargs)
@@ -0,0 +1,314 @@
+"""Targeted access to large JSON documents by character offset.
+
+Walks only the objects on the way to the keys asked for; every sibling value
+is skipped instead of decoded (by line indentation in pretty-printed files,
+else with a bracket-counting regex), and edits
+splice new text into the original string, so the rest of the document is
+neither parsed nor re-serialized. Duplicate keys resolve to the first
+occurrence (json.load keeps the last).
+
+The indentation shortcut (fast=True) is a guess that only holds for documents
+indented uniformly by a serializer: a mis-indented line can make a skip end
+early or swallow the following members. It is opt-in, for large
+machine-written files only (index_document(fast=True), which checks member
+indentation and where the document ends, and re-walks with the exact bracket
+scan when either is off). Every walk defaults to the exact scan. Callers that
+write with the shortcut should re-parse the patched text.
+"""
+import json
+import re
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+_WS = re.compile(r"[ \t\n\r]*")
+# Everything up to and including the next structural bracket, strings skipped whole.
+# Possessive quantifiers (3.11+) avoid backtracking bookkeeping on long runs.
+try:
+    _TO_BRACKET = re.compile(r'[^"\[\]{}]*+(?:"[^"\\]*+(?:\\.[^"\\]*+)*+"[^"\[\]{}]*+)*+([\[\]{}])', re.S)
+except re.error:
+    _TO_BRACKET = re.compile(r'[^"\[\]{}]*(?:"[^"\\]*(?:\\.[^"\\]*)*"[^"\[\]{}]*)*([\[\]{}])', re.S)
+_DECODER = json.JSONDecoder()
+_CLOSER = {"{": "}", "[": "]"}
+_LINE_AT_MOST: Dict[str, "re.Pattern"] = {}   # indent -> first line indented by at most that
+
+Edit = Tuple[int, int, str]   # (start, end, replacement)
+
+
+def _error(msg: str, text: str, pos: int):
+    return json.JSONDecodeError(msg, text, pos)
+
+
+def _ws(text: str, pos: int) -> int:
+    return _WS.match(text, pos).end()
+
+
+def _skip_indented(text: str, pos: int) -> Optional[int]:
+    """Fast path for pretty-printed documents. Strings can't hold raw newlines,
+    so a container opened at the end of a line indented by I closes at the
+    first later line indented by I or less; if that line isn't I plus the
+    closing bracket, the document isn't uniformly indented and None is returned.
+    An inner bracket closed at the outer indent is taken for the real one, so
+    this is only used on request (see the module docstring)."""
+    after = _ws(text, pos + 1)
+    if "\n" not in text[pos + 1:after]:
+        return None
+    line = text.rfind("\n", 0, pos) + 1
+    head = text[line:pos]
+    indent = head[:len(head) - len(head.lstrip())]
+    pattern = _LINE_AT_MOST.get(indent)
+    if pattern is None:
+        pattern = _LINE_AT_MOST[indent] = re.compile(r"\n(?!" + re.escape(indent) + r"[ \t])")
+    m = pattern.search(text, pos + 1)
+    if m is None:
+        return None
+    close = m.end() + len(indent)
+    if text.startswith(indent, m.end()) and text[close:close + 1] == _CLOSER[text[pos]]:
+        return close + 1
+    return None
+
+
+def skip(text: str, pos: int, fast: bool = False) -> int:
+    """Offset just past the JSON value starting at pos, without decoding it.
+    fast=True tries the indentation shortcut first (unchecked; see index_document)."""
+    c = text[pos:pos + 1]
+    if c not in ("{", "["):
+        return _DECODER.raw_decode(text, pos)[1]
+    end = _skip_indented(text, pos) if fast else None
+    if end is not None:
+        return end
+    depth = 0
+    while True:
+        m = _TO_BRACKET.match(text, pos)
+        if m is None:
+            raise _error("Unterminated container", text, pos)
+        depth += 1 if m.group(1) in "{[" else -1
+        pos = m.end()
+        if depth == 0:
+            return pos
+
+
+def decode(text: str, pos: int) -> Any:
+    """Decode the single JSON value starting at pos."""
+    return _DECODER.raw_decode(text, pos)[0]
+
+
+def iter_members(text: str, pos: int, descend: Optional[Dict[str, Any]] = None,
+                 fast: bool = False) -> Iterator[Tuple[str, int, int, Any]]:
+    """Yield (key, key_start, value_start, value_end) for the object at pos.
+
+    For keys in descend whose value is an object, value_end is that value's
+    Members index (built with the (keys, nested) pair descend maps it to).
+    With fast=True every key must sit at the indentation of the first one and
+    the closing brace on its own, shallower line; anything else means a skip
+    went astray and raises JSONDecodeError."""
+    if text[pos:pos + 1] != "{":
+        raise _error("Expecting object", text, pos)
+    pos = _ws(text, pos + 1)
+    if text[pos:pos + 1] == "}":
+        return
+    key_indent = _indent_of(text, pos) if fast else None
+    while True:
+        if text[pos:pos + 1] != '"':
+            raise _error("Expecting property name", text, pos)
+        if key_indent is not None and _indent_of(text, pos) != key_indent:
+            raise _error("Inconsistent indentation", text, pos)
+        key_start = pos
+        key, pos = json.decoder.scanstring(text, pos + 1)
+        pos = _ws(text, pos)
+        if text[pos:pos + 1] != ":":
+            raise _error("Expecting ':' delimiter", text, pos)
+        start = _ws(text, pos + 1)
+        if descend and key in descend and text[start:start + 1] == "{":
+            sub_keys, sub_nested = descend[key]
+            end = index_members(text, start, sub_keys, sub_nested, fast)
+            yield key, key_start, start, end
+            pos = _ws(text, end.end)
+        else:
+            end = skip(text, start, fast)
+            yield key, key_start, start, end
+            pos = _ws(text, end)
+        c = text[pos:pos + 1]
+        if c == "}":
+            if key_indent is not None:
+                closer = _indent_of(text, pos)
+                if closer is None or len(closer) >= len(key_indent):
+                    raise _error("Inconsistent indentation", text, pos)
+            return
+        if c != ",":
+            raise _error("Expecting ',' delimiter", text, pos)
+        pos = _ws(text, pos + 1)
+
+
+def iter_items(text: str, pos: int, fast: bool = False) -> Iterator[Tuple[int, int]]:
+    """Yield (value_start, value_end) for the array at pos."""
+    if text[pos:pos + 1] != "[":
+        raise _error("Expecting array", text, pos)
+    pos = _ws(text, pos + 1)
+    if text[pos:pos + 1] == "]":
+        return
+    while True:
+        end = skip(text, pos, fast)
+        yield pos, end
+        pos = _ws(text, end)
+        c = text[pos:pos + 1]
+        if c == "]":
+            return
+        if c != ",":
+            raise _error("Expecting ',' delimiter", text, pos)
+        pos = _ws(text, pos + 1)
+
+
+def root(text: str) -> int:
+    """Offset of the document's top-level value."""
+    return _ws(text, 0)
+
+
+class Members(NamedTuple):
+    """One pass over an object: where its wanted members are, and where to append."""
+    start: int                                  # offset of the object's "{"
+    end: int                                    # offset just past its "}"
+    spans: Dict[str, Tuple[int, int, int]]      # key -> (key_start, value_start, value_end)
+    first_key: Optional[int]                    # offset of the first key, None if empty
+    last_end: Optional[int]                     # end of the last value, None if empty
+    children: Dict[str, "Members"]              # indexes of the object members descended into
+
+
+def index_members(text: str, pos: int, keys: Optional[Iterable[str]] = None,
+                  nested: Optional[Dict[str, Any]] = None, fast: bool = False) -> Members:
+    """Index the object at pos in one pass, recording spans for keys (all when None).
+
+    nested maps a key to the (keys, nested) arguments for indexing that member's
+    value too; object values are then walked in place instead of skipped and
+    rescanned. The first occurrence of a key wins."""
+    wanted = None if keys is None else set(keys)
+    nested = nested or {}
+    spans: Dict[str, Tuple[int, int, int]] = {}
+    children: Dict[str, Members] = {}
+    first_key = last_end = None
+    for key, key_start, start, end in iter_members(text, pos, descend=nested, fast=fast):
+        if isinstance(end, Members):
+            if key not in children:
+                children[key] = end
+            end = end.end
+        if first_key is None:
+            first_key = key_start
+        if (wanted is None or key in wanted or key in nested) and key not in spans:
+            spans[key] = (key_start, start, end)
+        last_end = end
+    close = _ws(text, last_end) + 1 if last_end is not None else _ws(text, pos + 1) + 1
+    return Members(pos, close, spans, first_key, last_end, children)
+
+
+def index_document(text: str, keys: Optional[Iterable[str]] = None,
+                   nested: Optional[Dict[str, Any]] = None, fast: bool = False) -> Members:
+    """index_members for the top-level object, checked to span the whole document;
+    raises JSONDecodeError when the document is not a single valid object.
+    fast=True walks with the indentation shortcut first and re-walks with the
+    exact scan when that visibly went astray (it can't catch every mis-indent)."""
+    start = root(text)
+    if fast:
+        try:
+            top = index_members(text, start, keys, nested, fast=True)
+            if _ws(text, top.end) == len(text):
+                return top
+        except json.JSONDecodeError:
+            pass
+    top = index_members(text, start, keys, nested)
+    if _ws(text, top.end) != len(text):
+        raise _error("Extra data", text, _ws(text, top.end))
+    return top
+
+
+def find(text: str, path: Sequence[Union[str, int]], pos: Optional[int] = None,
+         fast: bool = False) -> Optional[Tuple[int, int]]:
+    """(start, end) of the value at path (object keys / array indexes), or None.
+
+    Without pos the walk starts at the document root; when that is an object
+    it is checked with index_document."""
+    if pos is None:
+        pos = root(text)
+        if path and isinstance(path[0], str) and text[pos:pos + 1] == "{":
+            top = index_document(text, (path[0],))
+            if path[0] not in top.spans:
+                return None
+            _, start, stop = top.spans[path[0]]
+            return find(text, path[1:], start, fast) if path[1:] else (start, stop)
+    end = None
+    for part in path:
+        hit = None
+        if isinstance(part, int):
+            if text[pos:pos + 1] == "[":
+                for i, span in enumerate(iter_items(text, pos, fast)):
+                    if i == part:
+                        hit = span
+                        break
+        elif text[pos:pos + 1] == "{":
+            for key, _, start, stop in iter_members(text, pos, fast=fast):
+                if key == part:
+                    hit = (start, stop)
+                    break
+        if hit is None:
+            return None
+        pos, end = hit
+    return (pos, end if end is not None else skip(text, pos, fast))
+
+
+def _indent_of(text: str, pos: int) -> Optional[str]:
+    """Whitespace between the line start and pos, or None if pos isn't on its own line."""
+    line = text.rfind("\n", 0, pos) + 1
+    prefix = text[line:pos]
+    return prefix if line and not prefix.strip() else None
+
+
+def _line_indent(text: str, pos: int) -> str:
+    line = text.rfind("\n", 0, pos) + 1
+    head = text[line:pos]
+    return head[:len(head) - len(head.lstrip())]
+
+
+def indent_unit(text: str, top: Members) -> Optional[str]:
+    """Indentation step of the document (from the top-level object's first key), None if compact."""
+    if top.first_key is None:
+        return None
+    return _indent_of(text, top.first_key) or None
+
+
+def _dumps(value: Any, base: Optional[str], unit: Optional[str]) -> str:
+    """Serialize value as a member of an object whose keys are indented by base."""
+    if base is None or unit is None:
+        return json.dumps(value, ensure_ascii=False)
+    return json.dumps(value, indent=unit, ensure_ascii=False).replace("\n", "\n" + base)
+
+
+def set_member(text: str, obj: Members, key: str, value: Any, unit: Optional[str]) -> Edit:
+    """Edit replacing key's value in an indexed object, or appending the member.
+
+    unit is the document's indent step (see indent_unit); new text follows the
+    indentation of the surrounding members."""
+    if key in obj.spans:
+        key_start, start, end = obj.spans[key]
+        return (start, end, _dumps(value, _indent_of(text, key_start), unit))
+    member = json.dumps(key, ensure_ascii=False) + ": "
+    if obj.last_end is None:
+        # Empty object: rebuild it with the single member
+        if unit is None:
+            return (obj.start, obj.end, "{" + member + _dumps(value, None, None) + "}")
+        outer = _line_indent(text, obj.start)
+        inner = outer + unit
+        return (obj.start, obj.end, "{\n" + inner + member + _dumps(value, inner, unit) + "\n" + outer + "}")
+    base = _indent_of(text, obj.first_key)
+    sep = ", " if base is None or unit is None else ",\n" + base
+    return (obj.last_end, obj.last_end, sep + member + _dumps(value, base, unit))
+
+
+def apply_edits(text: str, edits: List[Edit]) -> str:
+    """Splice non-overlapping edits into text. Insertions at the same offset keep their order."""
+    parts = []
+    pos = 0
+    for start, end, replacement in sorted(edits, key=lambda e: (e[0], e[1])):
+        if start < pos:
+            raise ValueError("Overlapping JSON edits")
+        parts.append(text[pos:start])
+        parts.append(replacement)
+        pos = end
+    parts.append(text[pos:])
+    return "".join(parts)
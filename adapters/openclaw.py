@@ -2,7 +2,8 @@
 import json
 import os
 from typing import Any, Dict, List, Optional
-from .base import BaseAdapter
+from . import json_edit
+from .base import BaseAdapter, Endpoints, content_fingerprint
 
 
 class OpenClawAdapter(BaseAdapter):
@@ -30,6 +31,19 @@ class OpenClawAdapter(BaseAdapter):
             })
         return {"providers": results}
 
+    def list_endpoints(self, config_path: str) -> Endpoints:
+        path = config_path or self.default_config_path
+        if not os.path.exists(path):
+            return Endpoints([], "")
+        with open(path, "r") as f:
+            text = f.read()
+        # Provider names are the keys of models.providers; their values (keys, models) stay undecoded
+        span = json_edit.find(text, ("models", "providers"))
+        if span is None or text[span[0]] != "{":
+            return Endpoints([], content_fingerprint(text))
+        names = [name for name, _, _, _ in json_edit.iter_members(text, span[0]) if name]
+        return Endpoints(names, content_fingerprint(text))
+
     def apply(self, config_path: str, base_url: str, api_key: str, **kwargs) -> bool:
         path = config_path or self.default_config_path
         if not os.path.exists(path):
@@ -54,6 +68,5 @@ class OpenClawAdapter(BaseAdapter):
                 providers[name]["apiKey"] = api_key
                 if "api" in extra:
                     providers[name]["api"] = extra["api"]
-        with open(path, "w") as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+        self.write_json(path, data)
         return True
@@ -1,10 +1,21 @@
-"""SillyTavern adapter — reads/writes secrets.json + settings.json."""
+"""SillyTavern adapter — reads/writes secrets.json + settings.json.
+
+settings.json carries every extension's settings and can run to many MB, so it
+is never fully parsed or re-serialized: json_edit locates the connection
+manager and the few top-level members we use, and writes splice just the
+changed values back in.
+"""
 import json
 import os
 import uuid
 from datetime import datetime
-from typing import Any, Dict, List, Optional
-from .base import BaseAdapter
+from typing import Any, Dict, List, Optional, Tuple
+from . import json_edit
+from .base import BaseAdapter, Endpoints, content_fingerprint
+
+# Top-level settings.json members read or written here
+_SETTINGS_KEYS = ("connectionManager", "extension_settings", "main_api", "selected_proxy")
+_SETTINGS_NESTED = {"extension_settings": (("connectionManager",), None)}
 
 
 class SillyTavernAdapter(BaseAdapter):
@@ -20,12 +31,75 @@ class SillyTavernAdapter(BaseAdapter):
         base = config_path or self.default_config_path
         return os.path.join(base, "settings.json")
 
-    def _get_key_by_secret_id(self, secrets: dict, secret_id: str) -> str:
-        """Look up api_key value by secret-id in api_key_custom list."""
-        for k in secrets.get("api_key_custom", []):
-            if k.get("id") == secret_id:
-                return k.get("value", "")
-        return ""
+    def config_files(self, config_path: str) -> List[str]:
+        return [self._secrets_path(config_path), self._settings_path(config_path)]
+
+    def _index_secrets(self, keys: List[dict]) -> Tuple[Dict[str, dict], Dict[str, dict]]:
+        """api_key_custom entries by id and by value, built once per call.
+        The first entry wins, matching a linear scan."""
+        by_id: Dict[str, dict] = {}
+        by_value: Dict[str, dict] = {}
+        for k in keys:
+            by_id.setdefault(k.get("id"), k)
+            by_value.setdefault(k.get("value"), k)
+        return by_id, by_value
+
+    def _read_settings(self, settings_p: str) -> Tuple[str, json_edit.Members]:
+        """settings.json text plus an index of the top-level members we use.
+        SillyTavern writes this file itself (JSON.stringify, 4-space indent), so
+        the indentation shortcut is used; apply() re-parses before writing."""
+        with open(settings_p, "r") as f:
+            text = f.read()
+        return text, json_edit.index_document(text, _SETTINGS_KEYS, _SETTINGS_NESTED, fast=True)
+
+    def _connection_manager(self, text: str, top: json_edit.Members) -> Tuple[dict, Optional[int]]:
+        """The connectionManager in effect and its offset — top-level, or nested
+        under extension_settings when the top-level one is missing or empty."""
+        if "connectionManager" in top.spans:
+            start = top.spans["connectionManager"][1]
+            cm = json_edit.decode(text, start)
+            if cm:
+                return cm, start
+        ext = top.children.get("extension_settings")
+        if ext and "connectionManager" in ext.spans:
+            start = ext.spans["connectionManager"][1]
+            return json_edit.decode(text, start) or {}, start
+        return {}, None
+
+    def _top_value(self, text: str, top: Optional[json_edit.Members], key: str, default: Any) -> Any:
+        if top is None or key not in top.spans:
+            return default
+        return json_edit.decode(text, top.spans[key][1])
+
+    def _profile_members(self, text: str, cm_start: int, provider_name: str) -> Optional[json_edit.Members]:
+        """Index of the first profile named provider_name inside the connectionManager at cm_start."""
+        span = json_edit.find(text, ("profiles",), cm_start)
+        if span is None or text[span[0]] != "[":
+            return None
+        for start, _ in json_edit.iter_items(text, span[0]):
+            p = json_edit.decode(text, start)
+            if isinstance(p, dict) and p.get("name") == provider_name:
+                return json_edit.index_members(text, start, ("api-url", "secret-id"))
+        return None
+
+    def _patch_landed(self, patched: str, provider_name: str, profile: Dict[str, str],
+                      proxy: Optional[dict]) -> bool:
+        """Re-parse patched settings.json and confirm the edits hit the members
+        they were meant for, before anything is written."""
+        try:
+            data = json.loads(patched)
+        except ValueError:
+            return False
+        if not isinstance(data, dict):
+            return False
+        if proxy is not None and data.get("selected_proxy") != proxy:
+            return False
+        if profile:
+            cm = data.get("connectionManager") or (data.get("extension_settings") or {}).get("connectionManager") or {}
+            p = next((p for p in cm.get("profiles", []) if isinstance(p, dict) and p.get("name") == provider_name), None)
+            if p is None or any(p.get(k) != v for k, v in profile.items()):
+                return False
+        return True
 
     def read_current(self, config_path: str) -> Optional[Dict[str, Any]]:
         secrets_p = self._secrets_path(config_path)
@@ -36,24 +110,22 @@ class SillyTavernAdapter(BaseAdapter):
             with open(secrets_p, "r") as f:
                 secrets = json.load(f)
 
-        settings = {}
+        text, top, cm = "", None, {}
         if os.path.exists(settings_p):
-            with open(settings_p, "r") as f:
-                settings = json.load(f)
+            text, top = self._read_settings(settings_p)
+            cm, _ = self._connection_manager(text, top)
 
         providers: List[Dict[str, Any]] = []
 
         # 1) Read connectionManager profiles (the primary source)
         #    May be at top-level or nested under extension_settings
-        cm = settings.get("connectionManager", {})
-        if not cm:
-            cm = settings.get("extension_settings", {}).get("connectionManager", {})
         profiles = cm.get("profiles", [])
+        by_id, _ = self._index_secrets(secrets.get("api_key_custom", [])) if profiles else ({}, {})
         for p in profiles:
             name = p.get("name", "")
             base_url = p.get("api-url", "")
             secret_id = p.get("secret-id", "")
-            api_key = self._get_key_by_secret_id(secrets, secret_id) if secret_id else ""
+            api_key = by_id[secret_id].get("value", "") if secret_id in by_id else ""
             providers.append({
                 "provider_name": name or "default",
                 "base_url": base_url,
@@ -71,13 +143,23 @@ class SillyTavernAdapter(BaseAdapter):
                 result["api_key"] = active[0].get("value", "")
             elif keys:
                 result["api_key"] = keys[0].get("value", "")
-            result["main_api"] = settings.get("main_api", "")
-            proxy = settings.get("selected_proxy", {})
+            result["main_api"] = self._top_value(text, top, "main_api", "")
+            proxy = self._top_value(text, top, "selected_proxy", {})
             result["base_url"] = proxy.get("url", "")
             return result if result.get("api_key") else None
 
         return {"providers": providers} if providers else None
 
+    def list_endpoints(self, config_path: str) -> Endpoints:
+        """Profile names from settings.json; secrets.json is never opened."""
+        settings_p = self._settings_path(config_path)
+        if not os.path.exists(settings_p):
+            return Endpoints([], "")
+        text, top = self._read_settings(settings_p)
+        cm, start = self._connection_manager(text, top)
+        names = [p.get("name", "") or "default" for p in cm.get("profiles", [])]
+        return Endpoints(names, content_fingerprint(text[start:json_edit.skip(text, start)]) if start is not None else "")
+
     def apply(self, config_path: str, base_url: str, api_key: str, **kwargs) -> bool:
         ok = True
         provider_name = kwargs.get("provider_name", "")
@@ -91,15 +173,12 @@ class SillyTavernAdapter(BaseAdapter):
 
         # If a specific provider_name is given, verify it exists in profiles
         settings_p = self._settings_path(config_path)
-        settings = {}
+        text, top, cm, cm_start = "", None, {}, None
         if os.path.exists(settings_p):
-            with open(settings_p, "r") as f:
-                settings = json.load(f)
+            text, top = self._read_settings(settings_p)
+            cm, cm_start = self._connection_manager(text, top)
 
         if provider_name:
-            cm = settings.get("connectionManager", {})
-            if not cm:
-                cm = settings.get("extension_settings", {}).get("connectionManager", {})
             profiles = cm.get("profiles", [])
             profile_names = {p.get("name", "") for p in profiles}
             if profiles and provider_name not in profile_names:
@@ -107,58 +186,85 @@ class SillyTavernAdapter(BaseAdapter):
                 return False
 
         # Update secrets.json — set active key
+        keys = secrets.get("api_key_custom", [])
+        _, by_value = self._index_secrets(keys)
         if os.path.exists(secrets_p):
-            keys = secrets.get("api_key_custom", [])
             for k in keys:
                 k["active"] = False
-            found = False
-            for k in keys:
-                if k["value"] == api_key:
-                    k["active"] = True
-                    found = True
-                    break
-            if not found:
-                keys.append({
+            entry = by_value.get(api_key)
+            if entry is None:
+                entry = {
                     "id": str(uuid.uuid4()),
                     "value": api_key,
                     "label": datetime.now().strftime("%m/%d/%Y %I:%M %p"),
                     "active": True,
-                })
+                }
+                keys.append(entry)
+                by_value[api_key] = entry
+            entry["active"] = True
             secrets["api_key_custom"] = keys
-            with open(secrets_p, "w") as f:
-                json.dump(secrets, f, indent=2, ensure_ascii=False)
+            self.write_json(secrets_p, secrets)
         else:
             ok = False
 
-        # Update settings.json
-        if os.path.exists(settings_p):
-            cm = settings.get("connectionManager", {})
-            if not cm:
-                cm = settings.get("extension_settings", {}).get("connectionManager", {})
-            profiles = cm.get("profiles", [])
+        # Update settings.json — patch only the changed values in place
+        if top is not None:
+            unit = json_edit.indent_unit(text, top)
+            edits: List[json_edit.Edit] = []
+            profile: Dict[str, str] = {}
+            proxy = None
             profile_updated = False
             if provider_name:
-                for p in profiles:
-                    if p.get("name") == provider_name:
-                        p["api-url"] = base_url
-                        secret_id = ""
-                        for k in secrets.get("api_key_custom", []):
-                            if k["value"] == api_key:
-                                secret_id = k["id"]
-                                break
-                        if secret_id:
-                            p["secret-id"] = secret_id
-                        profile_updated = True
-                        break
+                target = self._profile_members(text, cm_start, provider_name) if cm_start is not None else None
+                if target is not None:
+                    profile["api-url"] = base_url
+                    secret_id = by_value[api_key]["id"] if api_key in by_value else ""
+                    if secret_id:
+                        profile["secret-id"] = secret_id
+                    edits.extend(json_edit.set_member(text, target, k, v, unit) for k, v in profile.items())
+                    profile_updated = True
 
             if profile_updated or not provider_name:
                 if base_url:
-                    settings["selected_proxy"] = {
+                    proxy = {
                         "name": provider_name or "api-vault",
                         "url": base_url,
                         "password": api_key,
                     }
+                    edits.append(json_edit.set_member(text, top, "selected_proxy", proxy, unit))
 
-            with open(settings_p, "w") as f:
-                json.dump(settings, f, indent=2, ensure_ascii=False)
+            if edits:
+                patched = json_edit.apply_edits(text, edits)
+                if not self._patch_landed(patched, provider_name, profile, proxy):
+                    return False  # the splice missed its target; leave settings.json alone
+                self.write_text(settings_p, patched)
         return ok
+
+    def compact_secrets(self, config_path: str, dry_run: bool = True) -> Dict[str, Any]:
+        """Prune api_key_custom entries that are inactive and referenced by no
+        connection profile. Every rotation appends a secret, so without this
+        secrets.json grows forever. Only reports what would go unless dry_run
+        is False."""
+        secrets_p = self._secrets_path(config_path)
+        if not os.path.exists(secrets_p):
+            return {"dry_run": dry_run, "removed": [], "kept": 0}
+        with self.config_lock(config_path):
+            with open(secrets_p, "r") as f:
+                secrets = json.load(f)
+            settings_p = self._settings_path(config_path)
+            cm = {}
+            if os.path.exists(settings_p):
+                cm, _ = self._connection_manager(*self._read_settings(settings_p))
+            referenced = {p.get("secret-id") for p in cm.get("profiles", []) if p.get("secret-id")}
+            keys = secrets.get("api_key_custom", [])
+            kept, removed = [], []
+            for k in keys:
+                if k.get("active") or k.get("id") in referenced:
+                    kept.append(k)
+                else:
+                    removed.append({"id": k.get("id", ""), "label": k.get("label", ""),
+                                    "value_masked": self.mask_key(k.get("value", ""))})
+            if removed and not dry_run:
+                secrets["api_key_custom"] = kept
+                self.write_json(secrets_p, secrets)
+        return {"dry_run": dry_run, "removed": removed, "kept": len(kept)}
@@ -0,0 +1,104 @@
+"""Benchmark: daily usage over request_logs — SQLite scan vs Parquet archive.
+
+    python benchmarks/bench_archive.py [--rows 10000000] [--days 180]
+
+Builds a throwaway database with synthetic logs spread over --days days,
+exports closed days to Parquet, then times the /api/stats/usage query against
+SQLite and the archive path (services.archive.usage). Requires pyarrow.
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_SCHEMA = """
+CREATE TABLE request_logs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, vendor_id INTEGER, vendor_key_id INTEGER,
+    provider_id INTEGER, adapter_id TEXT DEFAULT '', model TEXT DEFAULT '',
+    input_tokens INTEGER DEFAULT 0, output_tokens INTEGER DEFAULT 0, cost REAL DEFAULT 0,
+    status_code INTEGER DEFAULT 200, latency_ms INTEGER DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX idx_request_logs_created_at ON request_logs(created_at);
+"""
+
+
+def populate(conn, rows: int, days: int):
+    rnd = random.Random(42)
+    models = ["gpt-4o", "claude-sonnet", "deepseek-chat", "qwen-max"]
+    now = time.time()
+    batch = []
+    for i in range(rows):
+        ts = now - rnd.random() * days * 86400 - 86400
+        batch.append((rnd.randint(1, 20), rnd.randint(1, 60), rnd.randint(1, 200), "openclaw",
+                      rnd.choice(models), rnd.randint(10, 4000), rnd.randint(10, 2000),
+                      rnd.random() / 100, 200 if rnd.random() > 0.02 else 500, rnd.randint(50, 5000),
+                      time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(ts))))
+        if len(batch) == 200_000:
+            conn.executemany("INSERT INTO request_logs (vendor_id, vendor_key_id, provider_id, adapter_id, model, "
+                             "input_tokens, output_tokens, cost, status_code, latency_ms, created_at) "
+                             "VALUES (?,?,?,?,?,?,?,?,?,?,?)", batch)
+            batch.clear()
+    if batch:
+        conn.executemany("INSERT INTO request_logs (vendor_id, vendor_key_id, provider_id, adapter_id, model, "
+                         "input_tokens, output_tokens, cost, status_code, latency_ms, created_at) "
+                         "VALUES (?,?,?,?,?,?,?,?,?,?,?)", batch)
+    conn.commit()
+
+
+def timed(label, fn, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    print(f"  {label:<36} {best * 1000:10.1f} ms  ({len(result)} days)")
+    return result
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=10_000_000)
+    ap.add_argument("--days", type=int, default=180)
+    args = ap.parse_args()
+
+    from services import archive
+
+    with tempfile.TemporaryDirectory() as tmp:
+        archive.ARCHIVE_DIR = os.path.join(tmp, "archive")
+        conn = sqlite3.connect(os.path.join(tmp, "bench.db"))
+        conn.row_factory = sqlite3.Row
+        conn.executescript(_SCHEMA)
+        t0 = time.perf_counter()
+        populate(conn, args.rows, args.days)
+        print(f"populated {args.rows:,} rows in {time.perf_counter() - t0:.1f}s")
+        t0 = time.perf_counter()
+        exported = archive.export_closed_days(conn)
+        print(f"exported {len(exported)} days to Parquet in {time.perf_counter() - t0:.1f}s")
+
+        def sqlite_usage(vendor_id=None):
+            w, p = "", []
+            if vendor_id is not None:
+                w, p = "WHERE vendor_id=?", [vendor_id]
+            return conn.execute(f"""
+                SELECT date(created_at) as day, COUNT(*) as requests,
+                       COALESCE(SUM(input_tokens),0), COALESCE(SUM(output_tokens),0), COALESCE(SUM(cost),0)
+                FROM request_logs {w} GROUP BY date(created_at) ORDER BY day""", p).fetchall()
+
+        print("all days, no filter:")
+        a = timed("sqlite GROUP BY", sqlite_usage)
+        b = timed("archive (parquet) + sqlite tail", lambda: archive.usage(conn, None, {}))
+        assert [r["requests"] for r in a] == [r["requests"] for r in b], "result mismatch"
+        print("all days, vendor_id=7:")
+        timed("sqlite GROUP BY", lambda: sqlite_usage(7))
+        timed("archive (parquet) + sqlite tail", lambda: archive.usage(conn, None, {"vendor_id": 7}))
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Benchmark: provider health probing against local stand-in servers.
+
+    python benchmarks/bench_health_probe.py [--providers 500] [--hosts 10] [--delay 0.05]
+
+Starts --hosts stand-in OpenAI-style APIs on loopback (GET /v1/models, bearer
+auth, HTTP/1.1 keep-alive, --delay seconds per answer), registers --providers
+providers spread over them in a throwaway database, and times one full
+health.check_all(). Every tenth provider has a wrong key (401), one host
+never answers in time and one base_url points at a closed port, so every
+status is exercised. Reports wall time, status counts and connections opened.
+"""
+import argparse
+import json
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def make_server(delay: float):
+    state = {"connections": 0, "requests": 0}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def setup(self):
+            super().setup()
+            self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            state["connections"] += 1
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            state["requests"] += 1
+            time.sleep(delay)
+            ok = self.headers.get("Authorization", "").startswith("Bearer sk-good-")
+            body = json.dumps({"data": [{"id": "model-a"}, {"id": "model-b"}]} if ok else {"error": "bad key"}).encode()
+            try:
+                self.send_response(200 if ok and self.path == "/v1/models" else 401 if not ok else 404)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            except BrokenPipeError:
+                pass  # the prober gave up on this one (timeout host)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state
+
+
+def closed_port() -> int:
+    s = socket.socket()
+    s.bind(("127.0.0.1", 0))
+    port = s.getsockname()[1]
+    s.close()
+    return port
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--providers", type=int, default=500)
+    ap.add_argument("--hosts", type=int, default=10)
+    ap.add_argument("--delay", type=float, default=0.05)
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    os.environ["VAULT_DB"] = os.path.join(tmp, "vault.db")
+    os.environ.setdefault("VAULT_LOCK_DIR", tmp)
+    if not os.environ.get("VAULT_KEY"):
+        from cryptography.fernet import Fernet
+        os.environ["VAULT_KEY"] = Fernet.generate_key().decode()
+    os.environ.setdefault("VAULT_HEALTH_TIMEOUT", "1")
+
+    import db
+    from services import health
+
+    servers = [make_server(args.delay) for _ in range(args.hosts)]
+    slow, _ = make_server(5)  # answers long after the probe timeout
+    urls = [f"http://127.0.0.1:{s.server_address[1]}/v1" for s, _ in servers]
+
+    db.init_db()
+    with db.get_db_ctx() as conn:
+        conn.execute("INSERT INTO vendors (name) VALUES ('bench')")
+        good = conn.execute("INSERT INTO vendor_keys (vendor_id, label, api_key_enc) VALUES (1, 'good', ?)",
+                            (db.encrypt("sk-good-0123456789"),)).lastrowid
+        bad = conn.execute("INSERT INTO vendor_keys (vendor_id, label, api_key_enc) VALUES (1, 'bad', ?)",
+                           (db.encrypt("sk-revoked-0123456789"),)).lastrowid
+        rows = [(f"p{i:04d}", urls[i % len(urls)], bad if i % 10 == 9 else good) for i in range(args.providers - 2)]
+        rows.append(("slow", f"http://127.0.0.1:{slow.server_address[1]}/v1", good))
+        rows.append(("gone", f"http://127.0.0.1:{closed_port()}/v1", good))
+        conn.executemany("INSERT INTO providers (vendor_id, name, base_url, vendor_key_id) VALUES (1, ?, ?, ?)", rows)
+        conn.commit()
+
+    t0 = time.perf_counter()
+    results = health.check_all()
+    elapsed = time.perf_counter() - t0
+
+    counts: dict = {}
+    for r in results:
+        counts[r["status"]] = counts.get(r["status"], 0) + 1
+    with db.get_db_ctx() as conn:
+        stored = conn.execute("SELECT COUNT(*) FROM provider_health").fetchone()[0]
+        by_name = dict(conn.execute("SELECT p.name, h.status FROM providers p JOIN provider_health h "
+                                    "ON h.provider_id=p.id WHERE p.name IN ('slow', 'gone', 'p0009')").fetchall())
+    assert stored == args.providers
+    assert by_name == {"slow": "timeout", "gone": "unreachable", "p0009": "auth_failed"}, by_name
+    latencies = sorted(r["latency_ms"] for r in results if r["status"] == "ok")
+
+    print(f"{args.providers} providers on {args.hosts} hosts ({args.delay * 1000:.0f} ms per answer, "
+          f"{health.PER_HOST} in flight per host)")
+    print(f"  wall time   {elapsed:6.2f} s")
+    print(f"  statuses    {counts}")
+    print(f"  ok latency  median {latencies[len(latencies) // 2]} ms")
+    print(f"  connections opened: {sum(state['connections'] for _, state in servers)} "
+          f"for {sum(state['requests'] for _, state in servers)} requests")
+    for server, _ in servers:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Benchmark: HTTP admin-API adapter against local stand-in servers.
+
+    python benchmarks/bench_http_adapter.py [--instances 4] [--pushes 200]
+
+Starts --instances stand-in admin APIs (the HTTPAdminAdapter contract, HTTP/1.1
+keep-alive) on loopback, then times apply() fanning one endpoint's config out
+to all of them. One instance answers 503 to every fifth PUT so the retry path
+is exercised. Reports per-push latency, connections opened (pooling) and
+checks every instance ends up with the last pushed config.
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def make_server(flaky: bool):
+    state = {"providers": {"main": {"name": "main", "base_url": "", "api_key": ""}}, "connections": 0, "puts": 0}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def setup(self):
+            super().setup()
+            self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            state["connections"] += 1
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status, payload=None):
+            body = json.dumps(payload).encode() if payload is not None else b""
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/providers":
+                self._send(200, {"providers": list(state["providers"].values())})
+            else:
+                self._send(404)
+
+        def do_PUT(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            name = self.path.rsplit("/", 1)[-1]
+            state["puts"] += 1
+            if flaky and state["puts"] % 5 == 0:
+                return self._send(503)
+            if name not in state["providers"]:
+                return self._send(404)
+            state["providers"][name].update(body)
+            self._send(200, state["providers"][name])
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--instances", type=int, default=4)
+    ap.add_argument("--pushes", type=int, default=200)
+    args = ap.parse_args()
+
+    from adapters.http_admin import HTTPAdminAdapter
+
+    servers = [make_server(flaky=(i == 0)) for i in range(args.instances)]
+    config_path = ",".join(f"http://127.0.0.1:{s.server_address[1]}" for s, _ in servers)
+    adapter = HTTPAdminAdapter()
+    adapter.backoff = 0.01
+
+    assert adapter.list_endpoints(config_path).names == ["main"]
+    assert not adapter.apply(config_path, "https://x", "sk-x", provider_name="missing")
+
+    times = []
+    for i in range(args.pushes):
+        t0 = time.perf_counter()
+        ok = adapter.apply(config_path, f"https://api{i}.example.com/v1", f"sk-{i:06d}", provider_name="main")
+        times.append((time.perf_counter() - t0) * 1000)
+        assert ok, f"push {i} failed"
+
+    last = args.pushes - 1
+    for _, state in servers:
+        assert state["providers"]["main"]["api_key"] == f"sk-{last:06d}"
+    times.sort()
+    print(f"{args.pushes} pushes to {args.instances} instances (instance 0 answers 503 to every 5th PUT)")
+    print(f"  per push   median {statistics.median(times):6.2f} ms   p95 {times[int(len(times) * 0.95)]:6.2f} ms")
+    print(f"  connections opened: {[state['connections'] for _, state in servers]}")
+    for server, _ in servers:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""Benchmark: SillyTavern read_current/apply against a large settings.json.
+
+    python benchmarks/bench_sillytavern_settings.py [--mb 20] [--profiles 20]
+
+Builds a settings.json of the given size (bulky extension_settings with the
+connection manager at the end, 4-space indent as SillyTavern writes it) and
+compares the previous full json.load / json.dump(indent=2) path with the
+adapter's in-place patching, config snapshots included (a throwaway vault and
+snapshot store are used; after the first run the pre-write content is already
+stored, so each snapshot costs one hash). Also checks that the patched
+document decodes to the same settings the full rewrite would have produced.
+"""
+import argparse
+import json
+import os
+import random
+import string
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def best_of(fn, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000
+
+
+def build_settings(target_bytes: int, profiles: int) -> dict:
+    rnd = random.Random(7)
+    alphabet = string.ascii_letters + string.digits + ' "\\\n'
+
+    def text(n):
+        return "".join(rnd.choices(alphabet, k=n))
+
+    ext, size, i = {}, 0, 0
+    while size < target_bytes:
+        blob = {
+            "enabled": True,
+            "scripts": [{"id": j, "findRegex": text(40), "replaceString": text(200), "placement": [1, 2]}
+                        for j in range(50)],
+            "notes": {"prompt": text(500)},
+        }
+        ext[f"extension_{i}"] = blob
+        size += len(json.dumps(blob, indent=4))
+        i += 1
+    ext["connectionManager"] = {
+        "selectedProfile": None,
+        "profiles": [{"id": f"profile-{p}", "mode": "cc", "name": f"profile-{p}", "api": "custom",
+                      "api-url": f"https://old{p}.example.com/v1", "secret-id": f"secret-{p}",
+                      "model": "gpt-4o", "preset": "Default"} for p in range(profiles)],
+    }
+    return {"firstRun": False, "main_api": "openai", "power_user": {"theme": "Dark"},
+            "extension_settings": ext, "selected_proxy": {"name": "None", "url": "", "password": ""}}
+
+
+def legacy_read(settings_p):
+    with open(settings_p) as f:
+        settings = json.load(f)
+    cm = settings.get("connectionManager", {}) or settings.get("extension_settings", {}).get("connectionManager", {})
+    return cm.get("profiles", [])
+
+
+def legacy_apply(settings_p, provider_name, base_url, api_key, secret_id):
+    with open(settings_p) as f:
+        settings = json.load(f)
+    cm = settings.get("connectionManager", {}) or settings.get("extension_settings", {}).get("connectionManager", {})
+    for p in cm.get("profiles", []):
+        if p.get("name") == provider_name:
+            p["api-url"] = base_url
+            p["secret-id"] = secret_id
+            break
+    settings["selected_proxy"] = {"name": provider_name, "url": base_url, "password": api_key}
+    with open(settings_p, "w") as f:
+        json.dump(settings, f, indent=2, ensure_ascii=False)
+    return settings
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--mb", type=float, default=20)
+    ap.add_argument("--profiles", type=int, default=20)
+    args = ap.parse_args()
+
+    from cryptography.fernet import Fernet
+    vault = tempfile.mkdtemp()
+    os.environ["VAULT_DB"] = os.path.join(vault, "vault.db")
+    os.environ["VAULT_KEY"] = Fernet.generate_key().decode()
+    os.environ.setdefault("VAULT_LOCK_DIR", vault)
+    os.environ["VAULT_SNAPSHOT_DIR"] = os.path.join(vault, "snapshots")
+
+    from adapters.sillytavern import SillyTavernAdapter
+
+    adapter = SillyTavernAdapter()
+    settings = build_settings(int(args.mb * 1_000_000), args.profiles)
+    body = json.dumps(settings, indent=4, ensure_ascii=False)
+    target = f"profile-{args.profiles - 1}"
+    api_key = "sk-bench-0123456789abcdef"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        settings_p = os.path.join(tmp, "settings.json")
+        secrets = {"api_key_custom": [{"id": "secret-new", "value": api_key, "label": "bench", "active": False}]}
+
+        def reset():
+            with open(settings_p, "w") as f:
+                f.write(body)
+            with open(os.path.join(tmp, "secrets.json"), "w") as f:
+                json.dump(secrets, f)
+
+        reset()
+        print(f"settings.json {os.path.getsize(settings_p) / 1e6:.1f} MB, {args.profiles} profiles")
+
+        old_read = best_of(lambda: legacy_read(settings_p))
+        new_read = best_of(lambda: adapter.read_current(tmp))
+        print(f"  read_current   full parse {old_read:8.1f} ms   targeted {new_read:8.1f} ms   "
+              f"({old_read / new_read:.1f}x)")
+
+        def run_legacy():
+            reset()
+            t0 = time.perf_counter()
+            legacy_apply(settings_p, target, "https://new.example.com/v1", api_key, "secret-new")
+            return time.perf_counter() - t0
+
+        def run_patch():
+            reset()
+            t0 = time.perf_counter()
+            assert adapter.apply(tmp, "https://new.example.com/v1", api_key, provider_name=target)
+            return time.perf_counter() - t0
+
+        old_apply = min(run_legacy() for _ in range(3)) * 1000
+        expected = legacy_apply(settings_p, target, "https://new.example.com/v1", api_key, "secret-new")
+        new_apply = min(run_patch() for _ in range(3)) * 1000
+        print(f"  apply          full rewrite {old_apply:6.1f} ms   in-place patch {new_apply:6.1f} ms   "
+              f"({old_apply / new_apply:.1f}x)")
+
+        with open(settings_p) as f:
+            patched = f.read()
+        assert json.loads(patched) == expected, "patched settings differ from a full rewrite"
+        changed = sum(1 for a, b in zip(body.splitlines(), patched.splitlines()) if a != b)
+        print(f"  parity ok; {changed} lines changed of {body.count(chr(10)) + 1:,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Benchmark: boot time (import main + startup hooks) against a budget.
+
+    python benchmarks/bench_startup.py [--runs 5] [--budget-ms 1000]
+
+Each run is a fresh interpreter. The first boot creates the schema; the rest
+are warm boots against a current schema, which is what container restarts hit.
+Exits non-zero when the median warm boot exceeds the budget.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_PROBE = """
+import time
+t0 = time.perf_counter()
+import main
+t1 = time.perf_counter()
+main.startup()
+t2 = time.perf_counter()
+import sys
+loaded = [m for m in ("cryptography", "adapters.openclaw", "adapters.sillytavern") if m in sys.modules]
+print(f"{(t1 - t0) * 1000:.1f} {(t2 - t1) * 1000:.1f} {','.join(loaded) or '-'}")
+"""
+
+
+def boot(env) -> tuple:
+    out = subprocess.run([sys.executable, "-c", _PROBE], cwd=ROOT, env=env,
+                         capture_output=True, text=True, check=True).stdout.split()
+    return float(out[0]), float(out[1]), out[2]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--budget-ms", type=float, default=1000)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, VAULT_DB=os.path.join(tmp, "boot.db"), VAULT_KEY="")
+        env.pop("VAULT_ARCHIVE_DIR", None)
+        imp, start, loaded = boot(env)
+        print(f"cold boot   import {imp:7.1f} ms   startup {start:7.1f} ms   eager: {loaded}")
+        totals = []
+        for _ in range(args.runs):
+            imp, start, loaded = boot(env)
+            totals.append(imp + start)
+            print(f"warm boot   import {imp:7.1f} ms   startup {start:7.1f} ms   eager: {loaded}")
+        median = statistics.median(totals)
+        print(f"median warm boot {median:.1f} ms (budget {args.budget_ms:.0f} ms)")
+        if median > args.budget_ms:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
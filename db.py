@@ -1,41 +1,228 @@
 """SQLite database + Fernet encryption for API keys."""
+import asyncio
+import functools
 import os
 import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
-from cryptography.fernet import Fernet
 
 DB_PATH = os.environ.get("VAULT_DB", os.path.join(os.path.dirname(__file__), "vault.db"))
 _MASTER_KEY = os.environ.get("VAULT_KEY", "")
 
+# Bump whenever the CREATE script or the migrations in init_db change; boots
+# with a current schema skip straight past them.
+SCHEMA_VERSION = 5
+
+KEY_FILE = os.path.join(os.path.dirname(__file__), ".vault_key")
+
+# Master keys: VAULT_KEY (comma-separated) or .vault_key (one per line), primary
+# first. New tokens are encrypted with the primary; decryption tries every key,
+# so a new primary can be added while old tokens are re-encrypted
+# (services.rekey) and the old keys retired afterwards.
+
+def _master_keys() -> list:
+    if _MASTER_KEY:
+        return [k.strip() for k in _MASTER_KEY.split(",") if k.strip()]
+    if not os.path.exists(KEY_FILE):
+        from cryptography.fernet import Fernet
+        # Locked so concurrently starting workers can't each mint their own key
+        from locks import file_lock
+        with file_lock("vault-key"):
+            if not os.path.exists(KEY_FILE):
+                with open(KEY_FILE, "w") as f:
+                    f.write(Fernet.generate_key().decode())
+                os.chmod(KEY_FILE, 0o600)
+    with open(KEY_FILE) as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
 def _get_fernet():
-    key = _MASTER_KEY
-    if not key:
-        key_file = os.path.join(os.path.dirname(__file__), ".vault_key")
-        if os.path.exists(key_file):
-            key = open(key_file).read().strip()
-        else:
-            key = Fernet.generate_key().decode()
-            with open(key_file, "w") as f:
-                f.write(key)
-            os.chmod(key_file, 0o600)
-    return Fernet(key.encode() if isinstance(key, str) else key)
-
-_fernet = _get_fernet()
+    """(MultiFernet over every master key, Fernet of the primary alone)."""
+    from cryptography.fernet import Fernet, MultiFernet  # deferred: only needed once a key is en/decrypted
+    fernets = [Fernet(k.encode()) for k in _master_keys()]
+    return MultiFernet(fernets), fernets[0]
+
+def _key_file_stamp():
+    if _MASTER_KEY:
+        return None
+    try:
+        st = os.stat(KEY_FILE)
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+_fernet = None
+_primary = None
+_fernet_stamp = None
+_fernet_checked = 0.0
+
+def _fernet_instance():
+    # .vault_key is re-read when it changes (checked at most once a second), so a
+    # primary key added by one worker reaches the others without a restart
+    global _fernet, _primary, _fernet_stamp, _fernet_checked
+    now = time.monotonic()
+    if _fernet is None or now - _fernet_checked > 1.0:
+        stamp = _key_file_stamp()  # taken first: a change during the load still triggers a reload
+        _fernet_checked = now
+        if _fernet is None or stamp != _fernet_stamp:
+            _fernet_stamp = stamp
+            _fernet, _primary = _get_fernet()
+    return _fernet
 
 def encrypt(plain: str) -> str:
-    return _fernet.encrypt(plain.encode()).decode()
+    return _fernet_instance().encrypt(plain.encode()).decode()
 
 def decrypt(token: str) -> str:
-    return _fernet.decrypt(token.encode()).decode()
+    return _fernet_instance().decrypt(token.encode()).decode()
+
+def rotate_token(token: str) -> str:
+    """Re-encrypt a token under the primary master key."""
+    return _fernet_instance().rotate(token.encode()).decode()
+
+def on_primary_key(token: str) -> bool:
+    """Whether token is encrypted with the primary master key."""
+    from cryptography.fernet import InvalidToken
+    _fernet_instance()
+    try:
+        _primary.decrypt(token.encode())
+        return True
+    except InvalidToken:
+        return False
+
+def master_key_count() -> int:
+    return len(_master_keys())
+
+def add_master_key() -> int:
+    """Generate a new primary key at the top of .vault_key (older keys stay for
+    decryption). Returns the number of keys. Not available with VAULT_KEY."""
+    global _fernet
+    if _MASTER_KEY:
+        raise RuntimeError("Master keys come from VAULT_KEY; prepend the new key there and restart")
+    from cryptography.fernet import Fernet
+    from locks import file_lock
+    with file_lock("vault-key"):
+        keys = [Fernet.generate_key().decode()] + _master_keys()
+        tmp = f"{KEY_FILE}.{os.getpid()}.tmp"
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            f.write("\n".join(keys) + "\n")
+        os.replace(tmp, KEY_FILE)
+    _fernet = None
+    return len(keys)
+
+# Dedicated, bounded pool for SQLite work from async routes, so DB calls never
+# queue behind (or starve) the default threadpool used by sync routes.
+_DB_EXECUTOR = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("VAULT_DB_WORKERS", "4")), thread_name_prefix="sqlite",
+)
+
+
+async def run_db(fn, *args, **kwargs):
+    """Run a blocking DB function on the SQLite executor."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_DB_EXECUTOR, functools.partial(fn, *args, **kwargs))
+
 
 def get_db() -> sqlite3.Connection:
     conn = sqlite3.connect(DB_PATH, check_same_thread=False)
     conn.row_factory = sqlite3.Row
     conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")  # durable in WAL mode, far fewer fsyncs on ingest
     conn.execute("PRAGMA foreign_keys=ON")
     return conn
 
 
+# ── Data version ──
+# Monotonic counter bumped by every write path that changes what the list /
+# topology endpoints return. Persisted in `meta`, which also makes it the
+# invalidation channel between worker processes: readers keep an in-memory copy
+# and only re-read it when SQLite's PRAGMA data_version says another connection
+# has committed since the last look.
+# Key spend (services.key_usage) changes every few seconds during ingest and only
+# shows in key/vendor listings, so it has its own counter, spend_version, rather
+# than invalidating every cache through data_version. Probe results
+# (services.health) only show in provider listings: health_version.
+
+_data_version = 0
+_spend_version = 0
+_health_version = 0
+_version_conn = None
+_version_seen = None
+_version_lock = threading.Lock()
+
+
+def _refresh_versions():
+    global _data_version, _spend_version, _health_version, _version_conn, _version_seen
+    with _version_lock:
+        try:
+            if _version_conn is None:
+                _version_conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+            seen = _version_conn.execute("PRAGMA data_version").fetchone()[0]
+            if seen != _version_seen:
+                rows = dict(_version_conn.execute(
+                    "SELECT key, value FROM meta WHERE key IN ('data_version', 'spend_version', 'health_version')"
+                ).fetchall())
+                if "data_version" in rows:
+                    _data_version = max(_data_version, int(rows["data_version"]))
+                if "spend_version" in rows:
+                    _spend_version = max(_spend_version, int(rows["spend_version"]))
+                if "health_version" in rows:
+                    _health_version = max(_health_version, int(rows["health_version"]))
+                _version_seen = seen
+        except sqlite3.OperationalError:  # schema not created yet
+            pass
+
+
+def data_version() -> int:
+    _refresh_versions()
+    return _data_version
+
+
+def spend_version() -> int:
+    _refresh_versions()
+    return _spend_version
+
+
+def health_version() -> int:
+    _refresh_versions()
+    return _health_version
+
+
+def bump_data_version(conn: sqlite3.Connection) -> int:
+    """Increment the data version inside the caller's transaction (caller commits)."""
+    global _data_version
+    conn.execute("UPDATE meta SET value=CAST(value AS INTEGER)+1 WHERE key='data_version'")
+    _data_version = int(conn.execute("SELECT value FROM meta WHERE key='data_version'").fetchone()[0])
+    return _data_version
+
+
+def _bump_counter(conn: sqlite3.Connection, key: str) -> int:
+    conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES (?, '0')", (key,))
+    conn.execute("UPDATE meta SET value=CAST(value AS INTEGER)+1 WHERE key=?", (key,))
+    return int(conn.execute("SELECT value FROM meta WHERE key=?", (key,)).fetchone()[0])
+
+
+def bump_spend_version(conn: sqlite3.Connection) -> int:
+    """Increment the key spend version inside the caller's transaction (caller commits)."""
+    global _spend_version
+    _spend_version = _bump_counter(conn, "spend_version")
+    return _spend_version
+
+
+def bump_health_version(conn: sqlite3.Connection) -> int:
+    """Increment the probe result version inside the caller's transaction (caller commits)."""
+    global _health_version
+    _health_version = _bump_counter(conn, "health_version")
+    return _health_version
+
+
+def _load_data_version(conn: sqlite3.Connection):
+    global _data_version
+    conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('data_version', '0')")
+    _data_version = int(conn.execute("SELECT value FROM meta WHERE key='data_version'").fetchone()[0])
+
+
 @contextmanager
 def get_db_ctx():
     """Context manager for manual use: with get_db_ctx() as db: ..."""
@@ -54,9 +241,51 @@ def get_db_dep():
     finally:
         conn.close()
 
+def _schema_version(conn: sqlite3.Connection) -> int:
+    try:
+        row = conn.execute("SELECT value FROM meta WHERE key='schema_version'").fetchone()
+    except sqlite3.OperationalError:  # pre-meta database
+        return 0
+    return int(row[0]) if row else 0
+
+
+# table -> (topology entity, columns the topology view depends on)
+_TOPOLOGY_TABLES = {
+    "vendors": ("vendors", "name, domain, icon"),
+    "vendor_keys": ("keys", "vendor_id, label"),
+    "providers": ("providers", "vendor_id, vendor_key_id, name"),
+    "adapters": ("adapters", "label, icon, enabled, config_path"),
+    "bindings": ("bindings", "provider_id, adapter_id, target_provider_name, auto_sync"),
+}
+
+
+# fts table -> (content table, indexed columns); services.search queries these
+FTS_TABLES = {
+    "vendors_fts": ("vendors", ("name", "domain", "notes")),
+    "providers_fts": ("providers", ("name", "base_url", "notes")),
+    "vendor_keys_fts": ("vendor_keys", ("label",)),
+}
+
+
 def init_db():
+    # Workers booting together must not run the migrations concurrently
+    from locks import file_lock
+    with file_lock("init-db"):
+        _init_db()
+
+
+def _init_db():
     conn = get_db()
+    if _schema_version(conn) == SCHEMA_VERSION:
+        _load_data_version(conn)
+        conn.commit()
+        conn.close()
+        return
     conn.executescript("""
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL DEFAULT ''
+        );
         CREATE TABLE IF NOT EXISTS vendors (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             name TEXT NOT NULL UNIQUE,
@@ -73,12 +302,27 @@ def init_db():
             api_key_enc TEXT NOT NULL,
             balance REAL DEFAULT NULL,
             quota REAL DEFAULT NULL,
+            spent REAL NOT NULL DEFAULT 0,
             status TEXT NOT NULL DEFAULT 'active',
+            fallback_key_id INTEGER DEFAULT NULL,
             notes TEXT DEFAULT '',
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             FOREIGN KEY (vendor_id) REFERENCES vendors(id) ON DELETE CASCADE
         );
+        CREATE TABLE IF NOT EXISTS key_rotations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            key_id INTEGER NOT NULL,
+            new_key_enc TEXT NOT NULL,
+            state TEXT NOT NULL DEFAULT 'registered',
+            verify INTEGER DEFAULT 1,
+            max_failures INTEGER DEFAULT 0,
+            progress TEXT NOT NULL DEFAULT '{}',
+            error TEXT DEFAULT '',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (key_id) REFERENCES vendor_keys(id) ON DELETE CASCADE
+        );
         CREATE TABLE IF NOT EXISTS providers (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             vendor_id INTEGER NOT NULL,
@@ -92,6 +336,16 @@ def init_db():
             FOREIGN KEY (vendor_id) REFERENCES vendors(id) ON DELETE CASCADE,
             FOREIGN KEY (vendor_key_id) REFERENCES vendor_keys(id) ON DELETE SET NULL
         );
+        CREATE INDEX IF NOT EXISTS idx_providers_name ON providers(name, id);
+        CREATE TABLE IF NOT EXISTS provider_health (
+            provider_id INTEGER PRIMARY KEY,
+            status TEXT NOT NULL,
+            http_status INTEGER DEFAULT NULL,
+            latency_ms INTEGER DEFAULT NULL,
+            error TEXT DEFAULT '',
+            checked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (provider_id) REFERENCES providers(id) ON DELETE CASCADE
+        );
         CREATE TABLE IF NOT EXISTS adapters (
             id TEXT PRIMARY KEY,
             label TEXT NOT NULL,
@@ -128,6 +382,24 @@ def init_db():
             FOREIGN KEY (vendor_key_id) REFERENCES vendor_keys(id) ON DELETE SET NULL,
             FOREIGN KEY (provider_id) REFERENCES providers(id) ON DELETE SET NULL
         );
+        CREATE INDEX IF NOT EXISTS idx_request_logs_created_at ON request_logs(created_at);
+        CREATE TABLE IF NOT EXISTS anomaly_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            scope TEXT NOT NULL,
+            entity_id INTEGER NOT NULL,
+            kind TEXT NOT NULL,
+            value REAL DEFAULT 0,
+            baseline REAL DEFAULT 0,
+            started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            resolved_at TIMESTAMP DEFAULT NULL
+        );
+        CREATE TABLE IF NOT EXISTS topology_changes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            version INTEGER NOT NULL,
+            entity TEXT NOT NULL,
+            entity_id TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_topology_changes_version ON topology_changes(version);
         CREATE TABLE IF NOT EXISTS model_pricing (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             vendor_id INTEGER,
@@ -151,6 +423,12 @@ def init_db():
     adapter_cols = [r[1] for r in cur.fetchall()]
     if "icon" not in adapter_cols:
         conn.execute("ALTER TABLE adapters ADD COLUMN icon TEXT DEFAULT ''")
+    cur = conn.execute("PRAGMA table_info(vendor_keys)")
+    key_cols = [r[1] for r in cur.fetchall()]
+    if "spent" not in key_cols:
+        conn.execute("ALTER TABLE vendor_keys ADD COLUMN spent REAL NOT NULL DEFAULT 0")
+    if "fallback_key_id" not in key_cols:
+        conn.execute("ALTER TABLE vendor_keys ADD COLUMN fallback_key_id INTEGER DEFAULT NULL")
     cur = conn.execute("PRAGMA table_info(providers)")
     provider_cols = [r[1] for r in cur.fetchall()]
     if "vendor_key_id" not in provider_cols:
@@ -192,5 +470,63 @@ def init_db():
         except Exception:
             pass  # index may already exist under different name
 
+    # Topology change log: every write to a table the topology view shows is
+    # recorded against the data version it will be published under. Changes made
+    # before the log existed are unknown, so the log starts at the current version.
+    conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('data_version', '0')")
+    conn.execute("INSERT OR IGNORE INTO meta (key, value) "
+                 "SELECT 'topology_floor', value FROM meta WHERE key='data_version'")
+    for table, (entity, columns) in _TOPOLOGY_TABLES.items():
+        for event, ref in (("INSERT", "NEW"), (f"UPDATE OF {columns}", "NEW"), ("DELETE", "OLD")):
+            name = f"trg_topology_{table}_{event.split()[0].lower()}"
+            conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {name} AFTER {event} ON {table} BEGIN
+                    INSERT INTO topology_changes (version, entity, entity_id) VALUES (
+                        COALESCE((SELECT CAST(value AS INTEGER) FROM meta WHERE key='data_version'), 0) + 1,
+                        '{entity}', {ref}.id);
+                END""")
+    # The topology shows each provider's health status: log status changes against the provider
+    conn.executescript("""
+        CREATE TRIGGER IF NOT EXISTS trg_topology_provider_health_insert AFTER INSERT ON provider_health BEGIN
+            INSERT INTO topology_changes (version, entity, entity_id) VALUES (
+                COALESCE((SELECT CAST(value AS INTEGER) FROM meta WHERE key='data_version'), 0) + 1,
+                'providers', NEW.provider_id);
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_topology_provider_health_update AFTER UPDATE OF status ON provider_health
+        WHEN OLD.status IS NOT NEW.status BEGIN
+            INSERT INTO topology_changes (version, entity, entity_id) VALUES (
+                COALESCE((SELECT CAST(value AS INTEGER) FROM meta WHERE key='data_version'), 0) + 1,
+                'providers', NEW.provider_id);
+        END;
+    """)
+
+    # Full-text search indexes (external content, synced by triggers). Optional:
+    # SQLite builds without FTS5 fall back to LIKE filtering in services.search.
+    for fts, (table, columns) in FTS_TABLES.items():
+        cols = ", ".join(columns)
+        new_cols = ", ".join(f"new.{c}" for c in columns)
+        old_cols = ", ".join(f"old.{c}" for c in columns)
+        exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (fts,)).fetchone()
+        try:
+            conn.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({cols}, content='{table}', content_rowid='id')")
+        except sqlite3.OperationalError:
+            break  # no FTS5 in this SQLite build
+        conn.executescript(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{fts}_insert AFTER INSERT ON {table} BEGIN
+                INSERT INTO {fts} (rowid, {cols}) VALUES (new.id, {new_cols});
+            END;
+            CREATE TRIGGER IF NOT EXISTS trg_{fts}_delete AFTER DELETE ON {table} BEGIN
+                INSERT INTO {fts} ({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_cols});
+            END;
+            CREATE TRIGGER IF NOT EXISTS trg_{fts}_update AFTER UPDATE OF {cols} ON {table} BEGIN
+                INSERT INTO {fts} ({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_cols});
+                INSERT INTO {fts} (rowid, {cols}) VALUES (new.id, {new_cols});
+            END;
+        """)
+        if not exists:
+            conn.execute(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')")
+
+    conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('schema_version', ?)", (str(SCHEMA_VERSION),))
+    _load_data_version(conn)
     conn.commit()
     conn.close()
@@ -0,0 +1,49 @@
+"""Cross-process advisory locks, so several uvicorn workers can share one host.
+
+Locks are flock()ed files under VAULT_LOCK_DIR (default: a `.locks` directory
+next to the database). They guard adapter config read-modify-write cycles,
+schema setup and the archive exporter. Advisory only: other programs editing
+the same config files are not blocked. On platforms without fcntl the lock
+degrades to an in-process one.
+"""
+import hashlib
+import os
+import threading
+from contextlib import contextmanager
+
+from db import DB_PATH
+
+try:
+    import fcntl
+except ImportError:  # Windows: in-process locking only
+    fcntl = None
+
+LOCK_DIR = os.environ.get("VAULT_LOCK_DIR", os.path.join(os.path.dirname(os.path.abspath(DB_PATH)), ".locks"))
+
+_thread_locks: dict = {}
+_thread_locks_guard = threading.Lock()
+
+
+def _lock_file(name: str) -> str:
+    # Names may be arbitrary paths; hash them into flat, filesystem-safe names
+    safe = "".join(c if c.isalnum() or c in "-_" else "_" for c in name)[-40:]
+    digest = hashlib.sha1(name.encode()).hexdigest()[:12]
+    return os.path.join(LOCK_DIR, f"{safe}.{digest}.lock")
+
+
+@contextmanager
+def file_lock(name: str):
+    """Hold an exclusive lock named `name` across threads and processes."""
+    with _thread_locks_guard:
+        tlock = _thread_locks.setdefault(name, threading.Lock())
+    with tlock:
+        if fcntl is None:
+            yield
+            return
+        os.makedirs(LOCK_DIR, exist_ok=True)
+        fd = os.open(_lock_file(name), os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(fd)  # closing the descriptor releases the flock
@@ -1,8 +1,8 @@
 """ClawAdapter — lightweight API key management service."""
-from fastapi import FastAPI
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, Request
+from fastapi.middleware.gzip import GZipMiddleware
 import db
+from services import static_assets
 from routes.vendors import router as vendors_router
 from routes.providers import router as providers_router
 from routes.keys import router as keys_router
@@ -11,24 +11,45 @@ from routes.bindings import router as bindings_router
 from routes.sync import router as sync_router
 from routes.stats import router as stats_router
 from routes.logs import router as logs_router
-from routes.upload import router as upload_router
+from routes.upload import router as upload_router, UploadFiles
+from routes.vault import router as vault_router
 
 app = FastAPI(title="ClawAdapter", version="0.1.0")
 
 @app.on_event("startup")
 def startup():
     db.init_db()
+    static_assets.build()
     # Ensure built-in adapters are registered in DB
     conn = db.get_db()
-    from adapters import all_adapters
-    for aid, adapter in all_adapters().items():
+    from adapters import adapter_meta
+    for aid, meta in adapter_meta().items():
         conn.execute(
-            "INSERT OR IGNORE INTO adapters (id, label, config_path, enabled) VALUES (?,?,?,1)",
-            (aid, adapter.label, adapter.default_config_path),
+            "INSERT OR IGNORE INTO adapters (id, label, config_path, enabled) VALUES (?,?,?,?)",
+            (aid, meta.label, meta.default_config_path, int(meta.enabled)),
         )
+    db.bump_data_version(conn)
     conn.commit()
     conn.close()
+    from services.archive import start_background_export
+    from services.health import start_background_probe
+    from services.key_usage import start_background_flush
+    from services.rekey import resume_background
+    from services.topology import start_background_prune
+    start_background_export()
+    start_background_flush()
+    start_background_probe()
+    start_background_prune()
+    resume_background()
 
+
+@app.on_event("shutdown")
+def shutdown():
+    from services import key_usage
+    with db.get_db_ctx() as conn:
+        key_usage.flush(conn)
+
+app.add_middleware(GZipMiddleware, minimum_size=1024)
 app.include_router(vendors_router)
 app.include_router(providers_router)
 app.include_router(keys_router)
@@ -38,13 +59,32 @@ app.include_router(sync_router)
 app.include_router(stats_router)
 app.include_router(logs_router)
 app.include_router(upload_router)
-app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
-app.mount("/static", StaticFiles(directory="static"), name="static")
+app.include_router(vault_router)
+app.mount("/uploads", UploadFiles(directory="uploads"), name="uploads")
+app.mount("/static", static_assets.AssetFiles(directory="static"), name="static")
 
 @app.get("/")
-def index():
-    return FileResponse("static/index.html")
+def index(request: Request):
+    return static_assets.index_response(request)
 
 if __name__ == "__main__":
+    import argparse
+    import os
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8900)
+    parser = argparse.ArgumentParser(description="Run the ClawAdapter server.")
+    parser.add_argument("--host", default=os.environ.get("VAULT_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("VAULT_PORT", "8900")))
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("VAULT_WORKERS", "1")),
+                        help="worker processes; 0 = one per CPU core")
+    args = parser.parse_args()
+    workers = args.workers or os.cpu_count() or 1
+    from services import live_stats
+    if workers > 1 and live_stats.ENABLED:
+        # Live counters and anomaly detectors are per process; each worker would see 1/N of the traffic
+        parser.error("live stats and anomaly detection need a single worker; "
+                     "set VAULT_LIVE_STATS=0 to run several workers without them")
+    if workers == 1:
+        uvicorn.run(app, host=args.host, port=args.port)
+    else:
+        # Multi-process mode needs an import string so each worker builds its own app
+        uvicorn.run("main:app", host=args.host, port=args.port, workers=workers)
@@ -22,13 +22,24 @@ class VendorKeyCreate(BaseModel):
     vendor_id: int
     label: str = "default"
     api_key: str
+    balance: Optional[float] = None
+    quota: Optional[float] = None
+    fallback_key_id: Optional[int] = None
     notes: str = ""
 
 class VendorKeyUpdate(BaseModel):
     label: Optional[str] = None
     api_key: Optional[str] = None
+    balance: Optional[float] = None
+    quota: Optional[float] = None
+    fallback_key_id: Optional[int] = None
     notes: Optional[str] = None
 
+class KeyRotationCreate(BaseModel):
+    api_key: str
+    verify: bool = True
+    max_failures: int = 0
+
 class VendorKeyOut(BaseModel):
     id: int
     vendor_id: int
@@ -36,7 +47,9 @@ class VendorKeyOut(BaseModel):
     api_key_masked: str
     balance: Optional[float] = None
     quota: Optional[float] = None
+    spent: float = 0
     status: str = "active"
+    fallback_key_id: Optional[int] = None
     notes: str = ""
 
 class VendorKeyNested(BaseModel):
@@ -45,7 +58,9 @@ class VendorKeyNested(BaseModel):
     api_key_masked: str
     balance: Optional[float] = None
     quota: Optional[float] = None
+    spent: float = 0
     status: str = "active"
+    fallback_key_id: Optional[int] = None
     notes: str = ""
 
 class ProviderNested(BaseModel):
@@ -83,6 +98,13 @@ class ProviderUpdate(BaseModel):
     extra_config: Optional[dict] = None
     notes: Optional[str] = None
 
+class ProviderHealth(BaseModel):
+    status: str
+    http_status: Optional[int] = None
+    latency_ms: Optional[int] = None
+    error: str = ""
+    checked_at: Optional[str] = None
+
 class ProviderOut(BaseModel):
     id: int
     vendor_id: int
@@ -94,6 +116,7 @@ class ProviderOut(BaseModel):
     api_key_masked: str
     extra_config: dict = {}
     notes: str
+    health: Optional[ProviderHealth] = None
 
 # ── Bindings ──
 
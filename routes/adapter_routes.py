@@ -3,8 +3,10 @@ import sqlite3
 from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
 from typing import Optional
-from db import get_db_dep
-from adapters import get_adapter, all_adapters
+from db import get_db_dep, bump_data_version
+from adapters import get_adapter, adapter_meta
+from services import snapshots
+from services.etag import conditional
 from utils import mask_key
 
 router = APIRouter(prefix="/api/sync", tags=["adapters"])
@@ -17,15 +19,15 @@ class AdapterUpdate(BaseModel):
 
 
 @router.get("/adapters")
-def list_adapters(db: sqlite3.Connection = Depends(get_db_dep)):
+def list_adapters(_=Depends(conditional("adapters")), db: sqlite3.Connection = Depends(get_db_dep)):
     db_rows = {r["id"]: dict(r) for r in db.execute("SELECT * FROM adapters").fetchall()}
     result = []
-    for aid, adapter in all_adapters().items():
+    for aid, meta in adapter_meta().items():
         db_info = db_rows.get(aid, {})
         result.append({
             "id": aid,
-            "label": adapter.label,
-            "config_path": db_info.get("config_path", adapter.default_config_path),
+            "label": meta.label,
+            "config_path": db_info.get("config_path", meta.default_config_path),
             "icon": db_info.get("icon", ""),
             "enabled": bool(db_info.get("enabled", 1)),
         })
@@ -34,7 +36,7 @@ def list_adapters(db: sqlite3.Connection = Depends(get_db_dep)):
 
 @router.put("/adapters/{adapter_id}")
 def update_adapter(adapter_id: str, body: AdapterUpdate, db: sqlite3.Connection = Depends(get_db_dep)):
-    adapter = get_adapter(adapter_id)
+    adapter = adapter_meta().get(adapter_id)
     if not adapter:
         raise HTTPException(404, "Adapter not found")
     row = db.execute("SELECT * FROM adapters WHERE id=?", (adapter_id,)).fetchone()
@@ -46,6 +48,7 @@ def update_adapter(adapter_id: str, body: AdapterUpdate, db: sqlite3.Connection
         "ON CONFLICT(id) DO UPDATE SET config_path=excluded.config_path, icon=excluded.icon, enabled=excluded.enabled",
         (adapter_id, adapter.label, config_path, icon, int(enabled)),
     )
+    bump_data_version(db)
     db.commit()
     return {"ok": True}
 
@@ -69,3 +72,40 @@ def read_adapter_current(adapter_id: str, db: sqlite3.Connection = Depends(get_d
                 p["api_key_masked"] = mask_key(p["api_key"])
                 del p["api_key"]
     return current
+
+
+@router.post("/adapters/{adapter_id}/compact-secrets")
+def compact_adapter_secrets(adapter_id: str, dry_run: bool = True, db: sqlite3.Connection = Depends(get_db_dep)):
+    """Prune stored secrets no endpoint references. Dry run unless dry_run=false."""
+    adapter = get_adapter(adapter_id)
+    if not adapter:
+        raise HTTPException(404, "Adapter not found")
+    compact = getattr(adapter, "compact_secrets", None)
+    if compact is None:
+        raise HTTPException(400, f"{adapter.label} does not store secrets separately")
+    row = db.execute("SELECT config_path FROM adapters WHERE id=?", (adapter_id,)).fetchone()
+    return compact(row["config_path"] if row else "", dry_run=dry_run)
+
+
+@router.get("/adapters/{adapter_id}/snapshots")
+def list_adapter_snapshots(adapter_id: str):
+    """Snapshots taken before each write to the adapter's config files, newest first."""
+    if not adapter_meta().get(adapter_id):
+        raise HTTPException(404, "Adapter not found")
+    return snapshots.history(adapter_id)
+
+
+@router.post("/adapters/{adapter_id}/snapshots/{snapshot_id}/restore")
+def restore_adapter_snapshot(adapter_id: str, snapshot_id: str, db: sqlite3.Connection = Depends(get_db_dep)):
+    """Put a snapshotted config file back in place (atomic; the replaced file is snapshotted too)."""
+    adapter = get_adapter(adapter_id)
+    if not adapter:
+        raise HTTPException(404, "Adapter not found")
+    row = db.execute("SELECT config_path FROM adapters WHERE id=?", (adapter_id,)).fetchone()
+    try:
+        entry = snapshots.restore(adapter, row["config_path"] if row else "", snapshot_id)
+    except snapshots.SnapshotUnavailable as e:
+        raise HTTPException(409, str(e))
+    if entry is None:
+        raise HTTPException(404, "Snapshot not found")
+    return {"ok": True, "restored": entry}
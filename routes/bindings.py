@@ -1,18 +1,20 @@
 """Binding CRUD + topology routes."""
+import asyncio
 import sqlite3
 from fastapi import APIRouter, HTTPException, Depends
 from typing import Optional, List
-from db import get_db_dep
+from db import get_db_ctx, get_db_dep, bump_data_version, data_version, run_db
 from adapters import get_adapter, all_adapters
 from models import BindingCreate, BindingOut
+from utils import fast_json
+from services import sankey, topology
+from services.etag import adapters_fingerprint, conditional
 
 router = APIRouter(prefix="/api/sync", tags=["bindings"])
 
 
-@router.get("/bindings")
-def list_bindings(provider_id: Optional[int] = None, adapter_id: Optional[str] = None,
-                  db: sqlite3.Connection = Depends(get_db_dep)):
-    sql = """SELECT b.*, p.name as p_name, a.label as a_label
+def _bindings_rows(provider_id: Optional[int], adapter_id: Optional[str]):
+    sql = """SELECT b.*, p.name as p_name, a.label as a_label, a.config_path as a_config_path
              FROM bindings b
              LEFT JOIN providers p ON b.provider_id = p.id
              LEFT JOIN adapters a ON b.adapter_id = a.id
@@ -24,24 +26,21 @@ def list_bindings(provider_id: Optional[int] = None, adapter_id: Optional[str] =
     if adapter_id is not None:
         sql += " AND b.adapter_id=?"
         params.append(adapter_id)
-    rows = db.execute(sql, params).fetchall()
+    with get_db_ctx() as db:
+        return db.execute(sql, params).fetchall()
 
-    # Collect live endpoints per adapter for orphan detection
-    adapter_live: dict[str, set[str]] = {}
-    for r in rows:
-        aid = r["adapter_id"]
-        if aid not in adapter_live:
-            adapter = get_adapter(aid)
-            if adapter:
-                arow = db.execute("SELECT config_path FROM adapters WHERE id=?", (aid,)).fetchone()
-                config_path = arow["config_path"] if arow else ""
-                current = adapter.read_current(config_path)
-                names = set()
-                if current and "providers" in current:
-                    names = {p.get("provider_name", "") for p in current["providers"] if p.get("provider_name")}
-                adapter_live[aid] = names
-            else:
-                adapter_live[aid] = set()
+
+@router.get("/bindings")
+async def list_bindings(provider_id: Optional[int] = None, adapter_id: Optional[str] = None,
+                        _=Depends(conditional("bindings", with_adapters=True))):
+    rows = await run_db(_bindings_rows, provider_id, adapter_id)
+
+    # Collect live endpoints per adapter for orphan detection (adapters read concurrently)
+    config_paths = {r["adapter_id"]: r["a_config_path"] or "" for r in rows}
+    adapters = {aid: get_adapter(aid) for aid in config_paths}
+    present = [aid for aid, a in adapters.items() if a]
+    endpoints = await asyncio.gather(*(adapters[aid].list_endpoints_async(config_paths[aid]) for aid in present))
+    adapter_live: dict[str, set[str]] = {aid: set(ep.names) for aid, ep in zip(present, endpoints)}
 
     result = []
     for r in rows:
@@ -81,18 +80,15 @@ def create_binding(b: BindingCreate, db: sqlite3.Connection = Depends(get_db_dep
     warning = ""
     arow = db.execute("SELECT config_path FROM adapters WHERE id=?", (b.adapter_id,)).fetchone()
     config_path = arow["config_path"] if arow else ""
-    current = adapter.read_current(config_path)
-    if current:
-        live_names = set()
-        if "providers" in current:
-            live_names = {p.get("provider_name", "") for p in current["providers"] if p.get("provider_name")}
-        if b.target_provider_name and live_names and b.target_provider_name not in live_names:
-            warning = f"服务内端点 '{b.target_provider_name}' 在 {b.adapter_id} 的配置文件中不存在，绑定已创建但推送可能无效"
+    live_names = set(adapter.list_endpoints(config_path).names)
+    if b.target_provider_name and live_names and b.target_provider_name not in live_names:
+        warning = f"服务内端点 '{b.target_provider_name}' 在 {b.adapter_id} 的配置文件中不存在，绑定已创建但推送可能无效"
     try:
         cur = db.execute(
             "INSERT INTO bindings (provider_id, adapter_id, target_provider_name, auto_sync) VALUES (?,?,?,?)",
             (b.provider_id, b.adapter_id, b.target_provider_name, int(b.auto_sync)),
         )
+        bump_data_version(db)
         db.commit()
         bid = cur.lastrowid
     except Exception as e:
@@ -115,6 +111,7 @@ def create_binding(b: BindingCreate, db: sqlite3.Connection = Depends(get_db_dep
 @router.delete("/bindings/{binding_id}")
 def delete_binding(binding_id: int, db: sqlite3.Connection = Depends(get_db_dep)):
     db.execute("DELETE FROM bindings WHERE id=?", (binding_id,))
+    bump_data_version(db)
     db.commit()
     return {"ok": True}
 
@@ -122,60 +119,157 @@ def delete_binding(binding_id: int, db: sqlite3.Connection = Depends(get_db_dep)
 @router.patch("/bindings/{binding_id}")
 def update_binding(binding_id: int, auto_sync: bool, db: sqlite3.Connection = Depends(get_db_dep)):
     db.execute("UPDATE bindings SET auto_sync=? WHERE id=?", (int(auto_sync), binding_id))
+    bump_data_version(db)
     db.commit()
     return {"ok": True}
 
 
 # ── Topology ──
 
-@router.get("/topology")
-def get_topology(db: sqlite3.Connection = Depends(get_db_dep)):
-    """Return full topology data for visualization."""
-    vendors_rows = db.execute("SELECT id, name, domain, icon FROM vendors ORDER BY name").fetchall()
-    keys_rows = db.execute("SELECT id, vendor_id, label FROM vendor_keys ORDER BY id").fetchall()
-    providers_rows = db.execute("SELECT id, vendor_id, vendor_key_id, name, base_url FROM providers ORDER BY name").fetchall()
-    adapter_rows = {r["id"]: dict(r) for r in db.execute("SELECT * FROM adapters").fetchall()}
-    bindings_rows = db.execute(
-        """SELECT b.id, b.provider_id, b.adapter_id, b.target_provider_name, b.auto_sync,
-                  p.name as provider_name, p.vendor_id
-           FROM bindings b LEFT JOIN providers p ON b.provider_id=p.id"""
-    ).fetchall()
-
-    # Build adapter list + collect live service endpoints per adapter
-    adapter_list = []
-    adapter_live_endpoints: dict[str, set[str]] = {}
-    for aid, adapter in all_adapters().items():
-        db_info = adapter_rows.get(aid, {})
-        config_path = db_info.get("config_path", adapter.default_config_path)
-        current = adapter.read_current(config_path)
-        service_names = []
-        if current and "providers" in current:
-            service_names = [p.get("provider_name", "") for p in current["providers"] if p.get("provider_name")]
-        adapter_live_endpoints[aid] = set(service_names)
-        adapter_list.append({
-            "id": aid,
-            "label": adapter.label,
-            "icon": db_info.get("icon", ""),
-            "enabled": bool(db_info.get("enabled", 1)),
-            "services": service_names,
-        })
+def _topology_rows():
+    with get_db_ctx() as db:
+        return topology.snapshot_rows(db)
+
+
+async def _read_services(adapters: dict, adapter_rows: dict) -> dict:
+    """adapter_id -> live endpoint names, configs read concurrently on the adapter I/O executor.
+    Disabled adapters are not read and have no entry."""
+    adapters = {aid: a for aid, a in adapters.items() if adapter_rows.get(aid, {}).get("enabled", 1)}
+    endpoints = await asyncio.gather(*(
+        adapter.list_endpoints_async(adapter_rows.get(aid, {}).get("config_path", adapter.default_config_path))
+        for aid, adapter in adapters.items()
+    ))
+    return {aid: ep.names for aid, ep in zip(adapters, endpoints)}
 
-    # Mark orphaned bindings
-    bindings_out = []
-    for r in bindings_rows:
-        live = adapter_live_endpoints.get(r["adapter_id"], set())
-        orphaned = bool(r["target_provider_name"] and r["target_provider_name"] not in live)
-        bindings_out.append({
-            "id": r["id"], "provider_id": r["provider_id"], "adapter_id": r["adapter_id"],
-            "target_provider_name": r["target_provider_name"], "auto_sync": bool(r["auto_sync"]),
-            "provider_name": r["provider_name"] or "", "vendor_id": r["vendor_id"],
-            "orphaned": orphaned,
-        })
 
+def _live(services: dict, adapter_id: str):
+    names = services.get(adapter_id)
+    return None if names is None else set(names)
+
+
+async def _full_topology() -> dict:
+    rows = await run_db(_topology_rows)
+    adapter_rows = {r["id"]: dict(r) for r in rows["adapters"]}
+    adapters = all_adapters(include_disabled=True)  # disabled ones stay on the graph, unread
+    services = await _read_services(adapters, adapter_rows)
     return {
-        "vendors": [{"id": r["id"], "name": r["name"], "domain": r["domain"], "icon": r["icon"] or ""} for r in vendors_rows],
-        "keys": [{"id": r["id"], "vendor_id": r["vendor_id"], "label": r["label"]} for r in keys_rows],
-        "providers": [{"id": r["id"], "vendor_id": r["vendor_id"], "vendor_key_id": r["vendor_key_id"], "name": r["name"]} for r in providers_rows],
-        "adapters": adapter_list,
-        "bindings": bindings_out,
+        "vendors": [topology.vendor_out(r) for r in rows["vendors"]],
+        "keys": [topology.key_out(r) for r in rows["keys"]],
+        "providers": [topology.provider_out(r) for r in rows["providers"]],
+        "adapters": [topology.adapter_out(aid, adapter, adapter_rows.get(aid, {}), services.get(aid, []))
+                     for aid, adapter in adapters.items()],
+        "bindings": [topology.binding_out(r, _live(services, r["adapter_id"]))
+                     for r in rows["bindings"]],
     }
+
+
+@router.get("/topology")
+async def get_topology(_=Depends(conditional("topology", with_adapters=True))):
+    """Return full topology data for visualization."""
+    return await _full_topology()
+
+
+@router.get("/topology/sankey")
+async def get_topology_sankey(threshold: int = sankey.DEFAULT_THRESHOLD, expand: str = "",
+                              vendor_id: Optional[int] = None, adapter_id: Optional[str] = None,
+                              cache=Depends(conditional("sankey", with_adapters=True))):
+    """Sankey nodes and flow-weighted links for the topology view.
+
+    Vendors with more than `threshold` keys + providers are collapsed into
+    summary nodes (0 disables); `expand` is a comma-separated list of vendor ids
+    to show in full. `vendor_id` / `adapter_id` return only that subgraph.
+    Built graphs are cached per data version and adapter fingerprint."""
+    try:
+        expand_ids = tuple(sorted({int(x) for x in expand.split(",") if x.strip()}))
+    except ValueError:
+        raise HTTPException(400, "expand must be a comma-separated list of vendor ids")
+    version, fp = data_version(), adapters_fingerprint()
+    topo_key = ("topology", version, fp)
+    graph_key = ("sankey", version, fp, threshold, expand_ids, vendor_id, adapter_id)
+    graph = sankey.cache_get(graph_key)
+    if graph is None:
+        topo = sankey.cache_get(topo_key)
+        if topo is None:
+            topo = await _patched_topology(fp) or await _full_topology()
+            sankey.cache_put(topo_key, topo)
+            sankey.set_latest(version, fp, topo)
+        graph = sankey.build(topo, threshold, expand_ids, vendor_id, adapter_id)
+        graph.update(version=version, adapters_fp=fp)
+        sankey.cache_put(graph_key, graph)
+    return fast_json(graph, headers=cache)
+
+
+def _delta_rows(since: int, all_bindings: bool):
+    with get_db_ctx() as db:
+        changed = topology.changed_since(db, since)
+        if changed is None:
+            return None
+        if changed["providers"]:
+            # Bindings carry their provider's name and vendor, so re-send them too
+            marks = ",".join("?" * len(changed["providers"]))
+            changed["bindings"] = list({*changed["bindings"], *(r[0] for r in db.execute(
+                f"SELECT id FROM bindings WHERE provider_id IN ({marks})", changed["providers"]))})
+        rows = {entity: topology.load_rows(db, entity, ids) for entity, ids in changed.items()
+                if ids and entity != "bindings"}
+        rows["bindings"] = topology.load_rows(db, "bindings", None if all_bindings else changed["bindings"])
+        adapter_rows = {r["id"]: dict(r) for r in db.execute("SELECT * FROM adapters")}
+        return changed, rows, adapter_rows
+
+
+async def _changes(since: int, fp: str, current_fp: str):
+    """(upsert, remove) for the entities changed after data version `since`,
+    None when a full snapshot is needed."""
+    delta = await run_db(_delta_rows, since, fp != current_fp)
+    if delta is None:
+        return None
+    changed, rows, adapter_rows = delta
+
+    registry = all_adapters(include_disabled=True)
+    if fp != current_fp:
+        changed["adapters"] = list(registry)
+    to_read = set(changed["adapters"]) | {r["adapter_id"] for r in rows["bindings"]}
+    services = await _read_services({aid: registry[aid] for aid in to_read if aid in registry}, adapter_rows)
+
+    builders = {"vendors": topology.vendor_out, "keys": topology.key_out, "providers": topology.provider_out}
+    upsert = {entity: [] for entity in topology.ENTITIES}
+    remove = {entity: [] for entity in topology.ENTITIES}
+    for entity, build in builders.items():
+        upsert[entity] = [build(r) for r in rows.get(entity, ())]
+    for aid in changed["adapters"]:
+        if aid in registry:
+            upsert["adapters"].append(topology.adapter_out(aid, registry[aid], adapter_rows.get(aid, {}),
+                                                           services.get(aid, [])))
+    upsert["bindings"] = [topology.binding_out(r, _live(services, r["adapter_id"])) for r in rows["bindings"]]
+    for entity in topology.ENTITIES:
+        present = {item["id"] for item in upsert[entity]}
+        remove[entity] = [i for i in changed[entity] if i not in present]
+    return upsert, remove
+
+
+async def _patched_topology(current_fp: str) -> Optional[dict]:
+    """The newest built topology with the changes since its version applied, None if
+    there is none yet or the change log can't bridge the gap."""
+    latest = sankey.latest()
+    if latest is None:
+        return None
+    since, fp, topo = latest
+    delta = await _changes(since, fp, current_fp)
+    return None if delta is None else topology.apply_delta(topo, *delta)
+
+
+@router.get("/topology/changes")
+async def get_topology_changes(since: Optional[int] = None, fp: str = ""):
+    """Topology changes since data version `since`.
+
+    Returns `{version, full: false, adapters_fp, upsert: {entity: [...]}, remove: {entity: [ids]}}`
+    with the same item shapes as /topology, or `{version, full: true, adapters_fp, topology}`
+    when `since` is missing or older than the retained change log. Pass back
+    `adapters_fp` as `fp`: when adapter config files changed on disk, every adapter
+    and binding is re-sent so live endpoints and orphan flags stay current."""
+    version = data_version()
+    current_fp = adapters_fingerprint()
+    delta = None if since is None else await _changes(since, fp, current_fp)
+    if delta is None:
+        return {"version": version, "full": True, "adapters_fp": current_fp, "topology": await _full_topology()}
+    upsert, remove = delta
+    return {"version": version, "full": False, "adapters_fp": current_fp, "upsert": upsert, "remove": remove}
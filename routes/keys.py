@@ -1,23 +1,52 @@
 """Vendor Key CRUD routes."""
 import sqlite3
 from fastapi import APIRouter, HTTPException, Depends
-from typing import List
-from db import get_db_dep, encrypt, decrypt
-from models import VendorKeyCreate, VendorKeyUpdate, VendorKeyOut
-from utils import mask_key_enc
+from typing import List, Optional
+from db import get_db_dep, encrypt, decrypt, bump_data_version
+from models import KeyRotationCreate, VendorKeyCreate, VendorKeyUpdate, VendorKeyOut
+from services import key_usage, rotation, search
+from services.etag import conditional
+from utils import fast_json, mask_key_enc
 
 router = APIRouter(prefix="/api", tags=["keys"])
 
 
+def _key_dict(row) -> dict:
+    live = key_usage.live_values(row)
+    return {
+        "id": row["id"], "vendor_id": row["vendor_id"], "label": row["label"],
+        "api_key_masked": mask_key_enc(row["api_key_enc"]),
+        "balance": live["balance"], "quota": row["quota"], "spent": live["spent"],
+        "status": live["status"], "fallback_key_id": row["fallback_key_id"],
+        "notes": row["notes"] or "",
+    }
+
+
+def _key_out(row) -> VendorKeyOut:
+    return VendorKeyOut(**_key_dict(row))
+
+
+def _check_fallback(db, fallback_key_id, vendor_id, kid=None):
+    if fallback_key_id is None:
+        return
+    if fallback_key_id == kid:
+        raise HTTPException(400, "A key cannot be its own fallback")
+    row = db.execute("SELECT vendor_id FROM vendor_keys WHERE id=?", (fallback_key_id,)).fetchone()
+    if not row:
+        raise HTTPException(404, "Fallback key not found")
+    if row["vendor_id"] != vendor_id:
+        raise HTTPException(400, "Fallback key must belong to the same vendor")
+
+
 @router.get("/vendors/{vid}/keys", response_model=List[VendorKeyOut])
-def list_vendor_keys(vid: int, db: sqlite3.Connection = Depends(get_db_dep)):
-    rows = db.execute("SELECT * FROM vendor_keys WHERE vendor_id=? ORDER BY id", (vid,)).fetchall()
-    return [VendorKeyOut(
-        id=r["id"], vendor_id=r["vendor_id"], label=r["label"],
-        api_key_masked=mask_key_enc(r["api_key_enc"]),
-        balance=r["balance"], quota=r["quota"], status=r["status"],
-        notes=r["notes"] or "",
-    ) for r in rows]
+def list_vendor_keys(vid: int, q: str = "", limit: Optional[int] = None, cursor: Optional[str] = None,
+                     cache=Depends(conditional("keys", with_spend=True)), db: sqlite3.Connection = Depends(get_db_dep)):
+    """`q` searches key labels. With `limit`, the cursor for the next page is
+    returned in the X-Next-Cursor header."""
+    rows, next_cursor = search.fetch_page(
+        db, "SELECT * FROM vendor_keys", ["vendor_id=?"], [vid], alias="vendor_keys", fts="vendor_keys_fts",
+        q=q, order=("id",), limit=search.check_limit(limit), cursor=cursor)
+    return fast_json([_key_dict(r) for r in rows], headers=search.page_headers(cache, next_cursor))
 
 
 @router.post("/keys", response_model=VendorKeyOut)
@@ -25,22 +54,20 @@ def create_key(k: VendorKeyCreate, db: sqlite3.Connection = Depends(get_db_dep))
     vendor = db.execute("SELECT id FROM vendors WHERE id=?", (k.vendor_id,)).fetchone()
     if not vendor:
         raise HTTPException(404, "Vendor not found")
+    _check_fallback(db, k.fallback_key_id, k.vendor_id)
     try:
         cur = db.execute(
-            "INSERT INTO vendor_keys (vendor_id, label, api_key_enc, notes) VALUES (?,?,?,?)",
-            (k.vendor_id, k.label, encrypt(k.api_key), k.notes),
+            "INSERT INTO vendor_keys (vendor_id, label, api_key_enc, balance, quota, fallback_key_id, notes) "
+            "VALUES (?,?,?,?,?,?,?)",
+            (k.vendor_id, k.label, encrypt(k.api_key), k.balance, k.quota, k.fallback_key_id, k.notes),
         )
+        bump_data_version(db)
         db.commit()
         kid = cur.lastrowid
     except Exception as e:
         raise HTTPException(400, str(e))
     row = db.execute("SELECT * FROM vendor_keys WHERE id=?", (kid,)).fetchone()
-    return VendorKeyOut(
-        id=row["id"], vendor_id=row["vendor_id"], label=row["label"],
-        api_key_masked=mask_key_enc(row["api_key_enc"]),
-        balance=row["balance"], quota=row["quota"], status=row["status"],
-        notes=row["notes"] or "",
-    )
+    return _key_out(row)
 
 
 @router.put("/keys/{kid}", response_model=VendorKeyOut)
@@ -55,23 +82,33 @@ def update_key(kid: int, k: VendorKeyUpdate, db: sqlite3.Connection = Depends(ge
     if k.api_key is not None:
         updates.append("api_key_enc=?"); params.append(encrypt(k.api_key))
         key_changed = True
+    if k.balance is not None:
+        updates.append("balance=?"); params.append(k.balance)
+    if k.quota is not None:
+        updates.append("quota=?"); params.append(k.quota)
+    if k.fallback_key_id is not None:
+        _check_fallback(db, k.fallback_key_id, row["vendor_id"], kid)
+        updates.append("fallback_key_id=?"); params.append(k.fallback_key_id)
     if k.notes is not None:
         updates.append("notes=?"); params.append(k.notes)
     if updates:
         updates.append("updated_at=CURRENT_TIMESTAMP")
         params.append(kid)
         db.execute(f"UPDATE vendor_keys SET {','.join(updates)} WHERE id=?", params)
+        if k.balance is not None or k.quota is not None:
+            # Topping up or raising the quota re-activates an exhausted key (and vice versa)
+            db.execute(
+                "UPDATE vendor_keys SET status=CASE "
+                "WHEN (quota IS NULL OR spent < quota) AND (balance IS NULL OR balance > 0) THEN 'active' "
+                "ELSE 'exhausted' END WHERE id=? AND status IN ('active','exhausted')", (kid,),
+            )
+        bump_data_version(db)
         db.commit()
     row = db.execute("SELECT * FROM vendor_keys WHERE id=?", (kid,)).fetchone()
     if key_changed:
         from services.sync_engine import sync_key_to_bindings
         sync_key_to_bindings(kid)
-    return VendorKeyOut(
-        id=row["id"], vendor_id=row["vendor_id"], label=row["label"],
-        api_key_masked=mask_key_enc(row["api_key_enc"]),
-        balance=row["balance"], quota=row["quota"], status=row["status"],
-        notes=row["notes"] or "",
-    )
+    return _key_out(row)
 
 
 @router.delete("/keys/{kid}")
@@ -84,7 +121,9 @@ def delete_key(kid: int, db: sqlite3.Connection = Depends(get_db_dep)):
     ).fetchone()["c"]
     if providers_using > 0:
         raise HTTPException(400, f"该密钥正被 {providers_using} 个 Provider 使用，请先解绑或更换密钥")
+    db.execute("UPDATE vendor_keys SET fallback_key_id=NULL WHERE fallback_key_id=?", (kid,))
     db.execute("DELETE FROM vendor_keys WHERE id=?", (kid,))
+    bump_data_version(db)
     db.commit()
     return {"ok": True}
 
@@ -95,3 +134,37 @@ def reveal_key(kid: int, db: sqlite3.Connection = Depends(get_db_dep)):
     if not row:
         raise HTTPException(404, "Key not found")
     return {"api_key": decrypt(row["api_key_enc"])}
+
+
+# ── Staged rotation ──
+
+@router.post("/keys/{kid}/rotate")
+def rotate_key(kid: int, body: KeyRotationCreate):
+    """Rotate a key across all its bindings: verify the new key, push it concurrently,
+    then commit — or restore the previous configs if more than max_failures pushes fail."""
+    try:
+        return rotation.start(kid, body.api_key, verify=body.verify, max_failures=body.max_failures)
+    except rotation.RotationError as e:
+        raise HTTPException(404 if "not found" in str(e) else 409, str(e))
+
+
+@router.get("/keys/rotations")
+def list_key_rotations(key_id: Optional[int] = None, db: sqlite3.Connection = Depends(get_db_dep)):
+    return rotation.list_rotations(db, key_id)
+
+
+@router.get("/keys/rotations/{rid}")
+def get_key_rotation(rid: int, db: sqlite3.Connection = Depends(get_db_dep)):
+    try:
+        return rotation.get_rotation(db, rid)
+    except rotation.RotationError as e:
+        raise HTTPException(404, str(e))
+
+
+@router.post("/keys/rotations/{rid}/resume")
+def resume_key_rotation(rid: int):
+    """Continue an interrupted rotation from its last recorded step."""
+    try:
+        return rotation.resume(rid)
+    except rotation.RotationError as e:
+        raise HTTPException(404, str(e))
@@ -1,54 +1,233 @@
-"""Request log ingestion route."""
+"""Request log ingestion route.
+
+Ingest handlers are async and do their SQLite work on the dedicated DB
+executor (db.run_db), so slow adapter/config routes on the default threadpool
+can't delay log ingestion.
+"""
+import json
+import math
 import sqlite3
-from fastapi import APIRouter, Depends
-from pydantic import BaseModel
+from fastapi import APIRouter, HTTPException, Request
+from pydantic import BaseModel, Field
 from typing import Optional
-from db import get_db_dep
+from db import get_db, get_db_ctx, run_db
+from services import anomaly, key_usage, live_stats
 
 router = APIRouter(prefix="/api/logs", tags=["logs"])
 
+_INSERT_SQL = """INSERT INTO request_logs
+                 (vendor_id, vendor_key_id, provider_id, adapter_id, model,
+                  input_tokens, output_tokens, cost, status_code, latency_ms)
+                 VALUES (?,?,?,?,?,?,?,?,?,?)"""
+
+STREAM_BATCH_SIZE = 500
+STREAM_MAX_LINE = 64 * 1024
+
+# SQLite INTEGER range; larger values raise OverflowError on insert
+INT_MIN, INT_MAX = -2 ** 63, 2 ** 63 - 1
+
 
 class LogEntry(BaseModel):
-    vendor_id: Optional[int] = None
-    vendor_key_id: Optional[int] = None
-    provider_id: Optional[int] = None
+    vendor_id: Optional[int] = Field(None, ge=INT_MIN, le=INT_MAX)
+    vendor_key_id: Optional[int] = Field(None, ge=INT_MIN, le=INT_MAX)
+    provider_id: Optional[int] = Field(None, ge=INT_MIN, le=INT_MAX)
     adapter_id: str = ""
     model: str = ""
-    input_tokens: int = 0
-    output_tokens: int = 0
-    cost: float = 0
-    status_code: int = 200
-    latency_ms: int = 0
+    input_tokens: int = Field(0, ge=INT_MIN, le=INT_MAX)
+    output_tokens: int = Field(0, ge=INT_MIN, le=INT_MAX)
+    cost: float = Field(0, allow_inf_nan=False)
+    status_code: int = Field(200, ge=INT_MIN, le=INT_MAX)
+    latency_ms: int = Field(0, ge=INT_MIN, le=INT_MAX)
+
+
+def _row(e: LogEntry) -> tuple:
+    return (e.vendor_id, e.vendor_key_id, e.provider_id, e.adapter_id, e.model,
+            e.input_tokens, e.output_tokens, e.cost, e.status_code, e.latency_ms)
+
+
+def _observe(db, rows):
+    """Feed inserted rows to the in-memory live counters, key spend tracker
+    and anomaly detectors; anomaly transitions (rare) are persisted."""
+    transitions = []
+    live = live_stats.ENABLED
+    for (vid, kid, pid, _aid, _model, inp, out, cost, status, latency) in rows:
+        key_usage.record(kid, cost)
+        if live:
+            live_stats.record(vid, kid, inp, out, cost, status)
+            transitions.extend(anomaly.observe(kid, pid, status, latency))
+    if transitions:
+        anomaly.persist(db, transitions)
+        db.commit()
+
+
+# ── Fast-path validation for streamed rows (mirrors LogEntry, no pydantic) ──
+
+def _int(v):
+    if type(v) is int:
+        n = v
+    elif isinstance(v, float) and v.is_integer():
+        n = int(v)
+    elif isinstance(v, str):
+        n = int(v)
+    else:
+        raise ValueError(v)
+    if not INT_MIN <= n <= INT_MAX:
+        raise ValueError(v)
+    return n
+
+
+def _opt_int(v):
+    return None if v is None else _int(v)
+
+
+def _float(v):
+    if isinstance(v, (int, float)) and not isinstance(v, bool) or isinstance(v, str):
+        f = float(v)  # OverflowError for ints beyond float range
+        if math.isfinite(f):
+            return f
+    raise ValueError(v)
+
+
+def _str(v):
+    if isinstance(v, str):
+        return v
+    raise ValueError(v)
+
+
+_FIELDS = (
+    ("vendor_id", _opt_int, None), ("vendor_key_id", _opt_int, None), ("provider_id", _opt_int, None),
+    ("adapter_id", _str, ""), ("model", _str, ""), ("input_tokens", _int, 0), ("output_tokens", _int, 0),
+    ("cost", _float, 0.0), ("status_code", _int, 200), ("latency_ms", _int, 0),
+)
+
+
+def _fast_row(obj) -> Optional[tuple]:
+    """Validate one decoded object into an insert tuple, or None if invalid."""
+    if not isinstance(obj, dict):
+        return None
+    try:
+        return tuple(conv(obj[name]) if name in obj else default for name, conv, default in _FIELDS)
+    except (ValueError, TypeError, OverflowError):
+        return None
+
+
+def _write_rows(db, rows: list) -> int:
+    """Insert a batch in one transaction; falls back to per-row inserts when a
+    row violates a constraint (or can't be stored) so one bad row doesn't
+    reject the batch. Returns the number of rows written."""
+    try:
+        db.executemany(_INSERT_SQL, rows)
+        db.commit()
+        _observe(db, rows)
+        return len(rows)
+    except (sqlite3.IntegrityError, OverflowError):
+        db.rollback()
+    ok = []
+    for r in rows:
+        try:
+            db.execute(_INSERT_SQL, r)
+            ok.append(r)
+        except (sqlite3.IntegrityError, OverflowError):
+            pass
+    db.commit()
+    _observe(db, ok)
+    return len(ok)
+
+
+def _insert(rows: list):
+    with get_db_ctx() as db:
+        db.executemany(_INSERT_SQL, rows)
+        db.commit()
+        _observe(db, rows)
 
 
 @router.post("/ingest")
-def ingest_log(entry: LogEntry, db: sqlite3.Connection = Depends(get_db_dep)):
+async def ingest_log(entry: LogEntry):
     """Receive a request log entry from external services."""
-    db.execute(
-        """INSERT INTO request_logs
-           (vendor_id, vendor_key_id, provider_id, adapter_id, model,
-            input_tokens, output_tokens, cost, status_code, latency_ms)
-           VALUES (?,?,?,?,?,?,?,?,?,?)""",
-        (entry.vendor_id, entry.vendor_key_id, entry.provider_id,
-         entry.adapter_id, entry.model, entry.input_tokens, entry.output_tokens,
-         entry.cost, entry.status_code, entry.latency_ms),
-    )
-    db.commit()
+    await run_db(_insert, [_row(entry)])
     return {"ok": True}
 
 
 @router.post("/ingest/batch")
-def ingest_batch(entries: list[LogEntry], db: sqlite3.Connection = Depends(get_db_dep)):
+async def ingest_batch(entries: list[LogEntry]):
     """Receive multiple log entries at once."""
-    for e in entries:
-        db.execute(
-            """INSERT INTO request_logs
-               (vendor_id, vendor_key_id, provider_id, adapter_id, model,
-                input_tokens, output_tokens, cost, status_code, latency_ms)
-               VALUES (?,?,?,?,?,?,?,?,?,?)""",
-            (e.vendor_id, e.vendor_key_id, e.provider_id,
-             e.adapter_id, e.model, e.input_tokens, e.output_tokens,
-             e.cost, e.status_code, e.latency_ms),
-        )
-    db.commit()
+    await run_db(_insert, [_row(e) for e in entries])
     return {"ok": True, "count": len(entries)}
+
+
+@router.post("/ingest/stream")
+async def ingest_stream(request: Request):
+    """Streaming ingest: chunked NDJSON (default) or msgpack body
+    (Content-Type: application/x-msgpack). Objects are parsed as they arrive
+    and written in batches of STREAM_BATCH_SIZE, so memory stays bounded
+    regardless of upload size."""
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    if content_type in ("application/x-msgpack", "application/msgpack"):
+        try:
+            import msgpack
+        except ImportError:
+            raise HTTPException(415, "msgpack is not installed on the server; send NDJSON instead")
+        unpacker = msgpack.Unpacker(raw=False, max_buffer_size=STREAM_MAX_LINE * 16)
+    else:
+        unpacker = None
+
+    db = await run_db(get_db)
+    accepted = rejected = 0
+    batch: list = []
+
+    async def flush():
+        nonlocal accepted, rejected
+        n = await run_db(_write_rows, db, batch[:])
+        accepted += n
+        rejected += len(batch) - n
+        batch.clear()
+
+    def take(obj):
+        nonlocal rejected
+        row = _fast_row(obj)
+        if row is None:
+            rejected += 1
+        else:
+            batch.append(row)
+
+    try:
+        buf = b""
+        skipping = False  # inside an over-long line, discard until the next newline
+        async for chunk in request.stream():
+            if unpacker is not None:
+                try:
+                    unpacker.feed(chunk)
+                    for obj in unpacker:
+                        take(obj)
+                except (ValueError, msgpack.BufferFull):
+                    rejected += 1  # corrupt or oversized object: the stream can't be resynced
+                    break
+            else:
+                buf += chunk
+                lines = buf.split(b"\n")
+                buf = lines.pop()
+                for line in lines:
+                    if skipping:
+                        skipping = False
+                        continue
+                    if line.strip():
+                        try:
+                            take(json.loads(line))
+                        except ValueError:
+                            rejected += 1
+                if len(buf) > STREAM_MAX_LINE:
+                    if not skipping:
+                        rejected += 1
+                    buf, skipping = b"", True
+            if len(batch) >= STREAM_BATCH_SIZE:
+                await flush()
+        if buf.strip() and not skipping:
+            try:
+                take(json.loads(buf))
+            except ValueError:
+                rejected += 1
+        if batch:
+            await flush()
+    finally:
+        await run_db(db.close)
+    return {"ok": True, "accepted": accepted, "rejected": rejected}
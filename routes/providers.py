@@ -2,10 +2,12 @@
 import json
 import sqlite3
 from fastapi import APIRouter, HTTPException, Depends
-from typing import List
-from db import get_db_dep
+from typing import List, Optional
+from db import get_db_ctx, get_db_dep, bump_data_version, run_db
 from models import ProviderCreate, ProviderUpdate, ProviderOut
-from utils import mask_key_enc
+from services import health, search
+from services.etag import conditional
+from utils import fast_json, mask_key_enc
 
 router = APIRouter(prefix="/api", tags=["providers"])
 
@@ -31,22 +33,63 @@ def _parse_extra(raw) -> dict:
 
 
 @router.get("/providers", response_model=List[ProviderOut])
-def list_providers(db: sqlite3.Connection = Depends(get_db_dep)):
-    rows = db.execute(
-        "SELECT p.*, v.name as v_name, vk.label as key_label, vk.api_key_enc "
+def list_providers(q: str = "", limit: Optional[int] = None, cursor: Optional[str] = None,
+                   cache=Depends(conditional("providers", with_health=True)), db: sqlite3.Connection = Depends(get_db_dep)):
+    """`q` searches name, base_url and notes. With `limit`, the cursor for the
+    next page is returned in the X-Next-Cursor header."""
+    rows, next_cursor = search.fetch_page(
+        db,
+        f"SELECT p.*, v.name as v_name, vk.label as key_label, vk.api_key_enc, {health.HEALTH_COLUMNS} "
         "FROM providers p "
         "LEFT JOIN vendors v ON p.vendor_id=v.id "
         "LEFT JOIN vendor_keys vk ON p.vendor_key_id=vk.id "
-        "ORDER BY p.name"
-    ).fetchall()
-    return [ProviderOut(
-        id=r["id"], vendor_id=r["vendor_id"], vendor_name=r["v_name"] or "",
-        vendor_key_id=r["vendor_key_id"], vendor_key_label=r["key_label"] or "",
-        name=r["name"], base_url=r["base_url"],
-        api_key_masked=mask_key_enc(r["api_key_enc"]) if r["api_key_enc"] else "****",
-        extra_config=_parse_extra(r["extra_config"]),
-        notes=r["notes"] or "",
-    ) for r in rows]
+        "LEFT JOIN provider_health h ON h.provider_id=p.id",
+        [], [], alias="p", fts="providers_fts",
+        q=q, order=("p.name", "p.id"), limit=search.check_limit(limit), cursor=cursor)
+    # Providers usually share a handful of keys: decrypt+mask each key once.
+    masked: dict = {}
+    out = []
+    for r in rows:
+        kid = r["vendor_key_id"]
+        if kid not in masked:
+            masked[kid] = mask_key_enc(r["api_key_enc"]) if r["api_key_enc"] else "****"
+        out.append({
+            "id": r["id"], "vendor_id": r["vendor_id"], "vendor_name": r["v_name"] or "",
+            "vendor_key_id": kid, "vendor_key_label": r["key_label"] or "",
+            "name": r["name"], "base_url": r["base_url"],
+            "api_key_masked": masked[kid],
+            "extra_config": _parse_extra(r["extra_config"]),
+            "notes": r["notes"] or "",
+            "health": health.health_out(r),
+        })
+    return fast_json(out, headers=search.page_headers(cache, next_cursor))
+
+
+def _load_targets(ids):
+    with get_db_ctx() as db:
+        return health.load_targets(db, ids)
+
+
+def _save_results(results):
+    with get_db_ctx() as db:
+        health.save(db, results)
+
+
+@router.post("/providers/health")
+async def check_provider_health(ids: str = ""):
+    """Probe providers (all, or the comma-separated `ids`) with a cheap authenticated
+    request and record status and latency. Returns per-provider results."""
+    try:
+        wanted = [int(i) for i in ids.split(",") if i.strip()] or None
+    except ValueError:
+        raise HTTPException(400, "ids must be comma-separated provider ids")
+    targets = await run_db(_load_targets, wanted)
+    results = await health.probe(targets)
+    await run_db(_save_results, results)
+    counts: dict = {}
+    for r in results:
+        counts[r["status"]] = counts.get(r["status"], 0) + 1
+    return {"checked": len(results), "counts": counts, "results": results}
 
 
 @router.post("/providers", response_model=ProviderOut)
@@ -59,6 +102,7 @@ def create_provider(p: ProviderCreate, db: sqlite3.Connection = Depends(get_db_d
             "INSERT INTO providers (vendor_id, vendor_key_id, name, base_url, extra_config, notes) VALUES (?,?,?,?,?,?)",
             (p.vendor_id, p.vendor_key_id, p.name, p.base_url, json.dumps(p.extra_config, ensure_ascii=False), p.notes),
         )
+        bump_data_version(db)
         db.commit()
         pid = cur.lastrowid
     except Exception as e:
@@ -100,6 +144,7 @@ def update_provider(pid: int, p: ProviderUpdate, db: sqlite3.Connection = Depend
         updates.append("updated_at=CURRENT_TIMESTAMP")
         params.append(pid)
         db.execute(f"UPDATE providers SET {','.join(updates)} WHERE id=?", params)
+        bump_data_version(db)
         db.commit()
     row = db.execute("SELECT * FROM providers WHERE id=?", (pid,)).fetchone()
     vendor = db.execute("SELECT * FROM vendors WHERE id=?", (row["vendor_id"],)).fetchone()
@@ -114,11 +159,15 @@ def update_provider(pid: int, p: ProviderUpdate, db: sqlite3.Connection = Depend
         api_key_masked=_get_key_masked(db, row["vendor_key_id"]),
         extra_config=_parse_extra(row["extra_config"]),
         notes=row["notes"] or "",
+        health=health.health_out(db.execute(
+            f"SELECT {health.HEALTH_COLUMNS} FROM providers p LEFT JOIN provider_health h ON h.provider_id=p.id "
+            "WHERE p.id=?", (pid,)).fetchone()),
     )
 
 
 @router.delete("/providers/{pid}")
 def delete_provider(pid: int, db: sqlite3.Connection = Depends(get_db_dep)):
     db.execute("DELETE FROM providers WHERE id=?", (pid,))
+    bump_data_version(db)
     db.commit()
     return {"ok": True}
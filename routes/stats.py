@@ -1,8 +1,12 @@
 """Stats & request log routes."""
+import asyncio
+import json
 import sqlite3
-from fastapi import APIRouter, Query, Depends
+from fastapi import APIRouter, HTTPException, Query, Depends, Request
+from fastapi.responses import StreamingResponse
 from typing import Optional
 from db import get_db_dep
+from services import anomaly, archive, live_stats
 
 router = APIRouter(prefix="/api/stats", tags=["stats"])
 
@@ -20,10 +24,14 @@ def get_overview(db: sqlite3.Connection = Depends(get_db_dep)):
         "SELECT COALESCE(SUM(input_tokens),0) as inp, COALESCE(SUM(output_tokens),0) as out FROM request_logs"
     ).fetchone()
     total_cost = db.execute("SELECT COALESCE(SUM(cost),0) as c FROM request_logs").fetchone()["c"]
-    # Key status summary
-    keys_active = db.execute("SELECT COUNT(*) as c FROM vendor_keys WHERE status='active'").fetchone()["c"]
+    # Key status summary (balance/spent are maintained by services.key_usage)
+    key_summary = db.execute(
+        "SELECT COALESCE(SUM(status='active'),0) as active, COALESCE(SUM(status='exhausted'),0) as exhausted, "
+        "COALESCE(SUM(balance),0) as balance FROM vendor_keys"
+    ).fetchone()
     return {
-        "vendors": vendors, "keys": keys, "keys_active": keys_active,
+        "vendors": vendors, "keys": keys, "keys_active": key_summary["active"],
+        "keys_exhausted": key_summary["exhausted"], "total_balance": round(key_summary["balance"], 4),
         "providers": providers, "bindings": bindings, "adapters": adapters,
         "total_requests": total_requests,
         "total_input_tokens": total_tokens["inp"],
@@ -32,6 +40,51 @@ def get_overview(db: sqlite3.Connection = Depends(get_db_dep)):
     }
 
 
+def _require_live():
+    if not live_stats.ENABLED:
+        raise HTTPException(404, "Live stats are disabled (VAULT_LIVE_STATS=0)")
+
+
+@router.get("/live")
+async def live_usage(request: Request):
+    """Server-Sent Events stream of sliding-window counters, pushed every second.
+    Served from in-memory counters only — never queries request_logs."""
+    _require_live()
+    async def events():
+        while not await request.is_disconnected():
+            yield f"data: {json.dumps(live_stats.snapshot())}\n\n"
+            await asyncio.sleep(1)
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@router.get("/anomalies")
+def list_anomalies():
+    """Error-rate / latency spikes open right now (in-memory detectors)."""
+    _require_live()
+    return anomaly.current()
+
+
+@router.get("/anomalies/events")
+def list_anomaly_events(
+    limit: int = Query(100, ge=1, le=1000),
+    scope: Optional[str] = Query(None, pattern="^(key|provider)$"),
+    entity_id: Optional[int] = None,
+    db: sqlite3.Connection = Depends(get_db_dep),
+):
+    """Persisted anomaly history, newest first."""
+    where, params = [], []
+    if scope is not None:
+        where.append("scope=?"); params.append(scope)
+    if entity_id is not None:
+        where.append("entity_id=?"); params.append(entity_id)
+    w = ("WHERE " + " AND ".join(where)) if where else ""
+    rows = db.execute(f"SELECT * FROM anomaly_events {w} ORDER BY id DESC LIMIT ?", params + [limit]).fetchall()
+    return [{"id": r["id"], "scope": r["scope"], "entity_id": r["entity_id"], "kind": r["kind"],
+             "value": round(r["value"], 4), "baseline": round(r["baseline"], 4),
+             "started_at": r["started_at"], "resolved_at": r["resolved_at"]} for r in rows]
+
+
 @router.get("/usage")
 def get_usage(
     range: str = Query("7d", pattern="^(1d|7d|30d|all)$"),
@@ -72,6 +125,34 @@ def get_usage(
              "cost": round(r["cost"], 4)} for r in rows]
 
 
+@router.get("/usage/history")
+def get_usage_history(
+    range: str = Query("90d", pattern="^(7d|30d|90d|365d|all)$"),
+    vendor_id: Optional[int] = None,
+    vendor_key_id: Optional[int] = None,
+    provider_id: Optional[int] = None,
+    adapter_id: Optional[str] = None,
+    db: sqlite3.Connection = Depends(get_db_dep),
+):
+    """Long-range daily usage: Parquet archive for closed days + SQLite for the open tail."""
+    days = None if range == "all" else int(range[:-1])
+    try:
+        return archive.usage(db, days, {"vendor_id": vendor_id, "vendor_key_id": vendor_key_id,
+                                        "provider_id": provider_id, "adapter_id": adapter_id})
+    except archive.ArchiveUnavailable as e:
+        raise HTTPException(400, str(e))
+
+
+@router.post("/archive")
+def run_archive(db: sqlite3.Connection = Depends(get_db_dep)):
+    """Export closed days to the Parquet archive now (normally runs periodically)."""
+    try:
+        exported = archive.export_closed_days(db)
+    except archive.ArchiveUnavailable as e:
+        raise HTTPException(400, str(e))
+    return {"ok": True, "exported_days": exported, "watermark": archive.watermark()}
+
+
 @router.get("/by-vendor")
 def stats_by_vendor(db: sqlite3.Connection = Depends(get_db_dep)):
     rows = db.execute("""
@@ -1,26 +1,192 @@
-"""Icon upload routes."""
+"""Icon upload routes.
+
+Uploads are parsed straight off the request stream: the file part is hashed
+and written to a temp file chunk by chunk, and the request is rejected as soon
+as it passes MAX_SIZE. Files are stored under their SHA-256, so re-uploading an
+icon reuses the existing file. When Pillow is installed, small PNG thumbnails
+(THUMB_SIZES) are generated next to it, and images Pillow flags as
+decompression bombs are rejected. File I/O runs on the threadpool. Everything
+under /uploads is content-addressed or uniquely named, so it is served with
+immutable caching.
+"""
+import hashlib
 import os
-import uuid
-from fastapi import APIRouter, UploadFile, File, HTTPException
+import tempfile
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.staticfiles import StaticFiles
+from starlette.concurrency import run_in_threadpool
+
+try:
+    from python_multipart.exceptions import MultipartParseError
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:  # python-multipart < 0.0.13
+    from multipart.exceptions import MultipartParseError
+    from multipart.multipart import MultipartParser, parse_options_header
 
 router = APIRouter(prefix="/api/upload", tags=["upload"])
 
 UPLOAD_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "uploads")
+THUMB_DIR = os.path.join(UPLOAD_DIR, "thumbs")
 ALLOWED_EXT = {".png", ".jpg", ".jpeg", ".gif", ".svg", ".webp"}
 MAX_SIZE = 2 * 1024 * 1024  # 2MB
+THUMB_SIZES = (64, 128)
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+class _Rejected(Exception):
+    pass
+
+
+class _IconPart:
+    """MultipartParser callbacks that stream the `file` part into a temp file."""
+
+    def __init__(self, out):
+        self.out = out
+        self.sha = hashlib.sha256()
+        self.size = 0
+        self.ext = None
+        self.complete = False   # closing boundary seen; finalize() doesn't check it
+        self._in_file = False
+        self._field = b""
+        self._value = b""
+        self._headers = {}
+
+    def callbacks(self) -> dict:
+        return {
+            "on_part_begin": self.part_begin,
+            "on_header_field": lambda d, s, e: setattr(self, "_field", self._field + d[s:e]),
+            "on_header_value": lambda d, s, e: setattr(self, "_value", self._value + d[s:e]),
+            "on_header_end": self.header_end,
+            "on_headers_finished": self.headers_finished,
+            "on_part_data": self.part_data,
+            "on_end": lambda: setattr(self, "complete", True),
+        }
+
+    def part_begin(self):
+        self._headers, self._in_file = {}, False
+
+    def header_end(self):
+        self._headers[self._field.lower()] = self._value
+        self._field = self._value = b""
+
+    def headers_finished(self):
+        _, params = parse_options_header(self._headers.get(b"content-disposition", b""))
+        if params.get(b"name") != b"file" or self.ext is not None:
+            return
+        filename = params.get(b"filename", b"").decode("utf-8", "replace")
+        ext = os.path.splitext(filename)[1].lower()
+        if ext not in ALLOWED_EXT:
+            raise _Rejected(f"Unsupported format. Allowed: {', '.join(ALLOWED_EXT)}")
+        self.ext, self._in_file = ext, True
+
+    def part_data(self, data, start, end):
+        if not self._in_file:
+            return
+        self.size += end - start
+        if self.size > MAX_SIZE:
+            raise _Rejected("File too large (max 2MB)")
+        chunk = data[start:end]
+        self.sha.update(chunk)
+        self.out.write(chunk)
+
+
+def _make_thumbnails(path: str, digest: str) -> dict:
+    """size -> URL of PNG thumbnails (empty without Pillow or for unreadable images).
+    Raises _Rejected for decompression bombs."""
+    try:
+        from PIL import Image
+    except ImportError:  # optional
+        return {}
+    urls = {}
+    try:
+        with Image.open(path) as img:
+            img.seek(0)  # first frame of animations
+            img = img.convert("RGBA")
+            os.makedirs(THUMB_DIR, exist_ok=True)
+            for size in THUMB_SIZES:
+                name = f"{digest}-{size}.png"
+                out = os.path.join(THUMB_DIR, name)
+                if not os.path.exists(out):
+                    thumb = img.copy()
+                    thumb.thumbnail((size, size), Image.LANCZOS)
+                    tmp = out + ".tmp"
+                    thumb.save(tmp, "PNG", optimize=True)
+                    os.replace(tmp, out)
+                urls[str(size)] = f"/uploads/thumbs/{name}"
+    except Image.DecompressionBombError:
+        raise _Rejected("Image dimensions too large")
+    except (OSError, ValueError):
+        return {}
+    return urls
+
+
+def _open_temp():
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    return tempfile.NamedTemporaryFile(dir=UPLOAD_DIR, prefix=".upload-", delete=False)
+
+
+def _store(tmp_name: str, path: str) -> bool:
+    """Move a finished upload into place. False if that content was stored already."""
+    if os.path.exists(path):
+        os.unlink(tmp_name)  # duplicate content: keep the stored copy
+        return False
+    os.chmod(tmp_name, 0o644)
+    os.replace(tmp_name, path)
+    return True
+
+
+def _discard(path: str):
+    if os.path.exists(path):
+        os.unlink(path)
 
 
 @router.post("/icon")
-async def upload_icon(file: UploadFile = File(...)):
-    ext = os.path.splitext(file.filename or "")[1].lower()
-    if ext not in ALLOWED_EXT:
-        raise HTTPException(400, f"Unsupported format. Allowed: {', '.join(ALLOWED_EXT)}")
-    data = await file.read()
-    if len(data) > MAX_SIZE:
+async def upload_icon(request: Request):
+    ctype, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if ctype != b"multipart/form-data" or not boundary:
+        raise HTTPException(400, "Expected a multipart/form-data upload with a `file` field")
+    length = request.headers.get("content-length", "")
+    if length.isdigit() and int(length) > MAX_SIZE + 64 * 1024:  # file + generous multipart overhead
         raise HTTPException(400, "File too large (max 2MB)")
-    os.makedirs(UPLOAD_DIR, exist_ok=True)
-    fname = f"{uuid.uuid4().hex[:12]}{ext}"
-    path = os.path.join(UPLOAD_DIR, fname)
-    with open(path, "wb") as f:
-        f.write(data)
-    return {"url": f"/uploads/{fname}"}
+
+    tmp = await run_in_threadpool(_open_temp)
+    try:
+        with tmp:
+            part = _IconPart(tmp)
+            parser = MultipartParser(boundary, part.callbacks())
+            async for chunk in request.stream():
+                await run_in_threadpool(parser.write, chunk)  # the callbacks write to disk
+            await run_in_threadpool(parser.finalize)
+        if not part.complete:
+            raise HTTPException(400, "Malformed multipart body")
+        if part.ext is None:
+            raise HTTPException(400, "No file uploaded")
+        digest = part.sha.hexdigest()[:32]
+        fname = f"{digest}{part.ext}"
+        path = os.path.join(UPLOAD_DIR, fname)
+        created = await run_in_threadpool(_store, tmp.name, path)
+    except _Rejected as e:
+        raise HTTPException(400, str(e))
+    except MultipartParseError:
+        raise HTTPException(400, "Malformed multipart body")
+    finally:
+        await run_in_threadpool(_discard, tmp.name)
+    thumbnails = {}
+    if part.ext != ".svg":
+        try:
+            thumbnails = await run_in_threadpool(_make_thumbnails, path, digest)
+        except _Rejected as e:
+            if created:
+                await run_in_threadpool(_discard, path)
+            raise HTTPException(400, str(e))
+    return {"url": f"/uploads/{fname}", "thumbnails": thumbnails}
+
+
+class UploadFiles(StaticFiles):
+    """StaticFiles for /uploads with long-lived cache headers (names never get reused)."""
+
+    def file_response(self, *args, **kwargs):
+        response = super().file_response(*args, **kwargs)
+        response.headers["Cache-Control"] = IMMUTABLE
+        return response
@@ -0,0 +1,46 @@
+"""Master-key routes — add a primary key and re-encrypt stored secrets under it."""
+import sqlite3
+from fastapi import APIRouter, HTTPException, Depends
+import db
+from db import get_db_dep
+from services import rekey
+
+router = APIRouter(prefix="/api/vault", tags=["vault"])
+
+
+def _rekey_out(st: dict) -> dict:
+    total = st.get("total") or 0
+    return dict(st, progress=round(st.get("done", 0) / total, 4) if total else (1.0 if st.get("state") == "completed" else 0.0))
+
+
+@router.get("/master-keys")
+def master_keys(conn: sqlite3.Connection = Depends(get_db_dep)):
+    """How many master keys are active (the first one encrypts new secrets) and the re-encryption status."""
+    return {"keys": db.master_key_count(), "source": "env" if db._MASTER_KEY else "file",
+            "rekey": _rekey_out(rekey.status(conn))}
+
+
+@router.post("/master-keys")
+def add_master_key(reencrypt: bool = True, conn: sqlite3.Connection = Depends(get_db_dep)):
+    """Generate a new primary master key; older keys stay active for decryption.
+    With reencrypt (default), stored secrets are moved onto it in the background."""
+    try:
+        count = db.add_master_key()
+    except RuntimeError as e:
+        raise HTTPException(400, str(e))
+    result = {"keys": count}
+    if reencrypt:
+        result["rekey"] = _rekey_out(rekey.start(conn))
+    return result
+
+
+@router.get("/rekey")
+def rekey_status(conn: sqlite3.Connection = Depends(get_db_dep)):
+    return _rekey_out(rekey.status(conn))
+
+
+@router.post("/rekey")
+def start_rekey(conn: sqlite3.Connection = Depends(get_db_dep)):
+    """Re-encrypt every stored secret under the primary master key, in the background.
+    A pass that is already running is continued rather than restarted."""
+    return _rekey_out(rekey.start(conn))
@@ -1,18 +1,34 @@
 """Vendor CRUD routes."""
 import sqlite3
 from fastapi import APIRouter, HTTPException, Depends
-from typing import List
-from db import get_db_dep
+from typing import List, Optional
+from db import get_db_dep, bump_data_version
 from models import VendorCreate, VendorUpdate, VendorOut
-from services.vendor_service import build_vendor_out
+from services.vendor_service import build_vendor_dicts, build_vendor_out
+from services import search
+from services.etag import conditional
+from utils import fast_json
 
 router = APIRouter(prefix="/api", tags=["vendors"])
 
 
 @router.get("/vendors", response_model=List[VendorOut])
-def list_vendors(db: sqlite3.Connection = Depends(get_db_dep)):
-    rows = db.execute("SELECT * FROM vendors ORDER BY name").fetchall()
-    return [build_vendor_out(db, v) for v in rows]
+def list_vendors(q: str = "", limit: Optional[int] = None, cursor: Optional[str] = None,
+                 cache=Depends(conditional("vendors", with_spend=True)), db: sqlite3.Connection = Depends(get_db_dep)):
+    """`q` searches name, domain and notes. With `limit`, the cursor for the
+    next page is returned in the X-Next-Cursor header."""
+    rows, next_cursor = search.fetch_page(
+        db, "SELECT * FROM vendors", [], [], alias="vendors", fts="vendors_fts",
+        q=q, order=("name", "id"), limit=search.check_limit(limit), cursor=cursor)
+    return fast_json(build_vendor_dicts(db, rows), headers=search.page_headers(cache, next_cursor))
+
+
+@router.get("/vendors/{vid}", response_model=VendorOut)
+def get_vendor(vid: int, db: sqlite3.Connection = Depends(get_db_dep)):
+    row = db.execute("SELECT * FROM vendors WHERE id=?", (vid,)).fetchone()
+    if not row:
+        raise HTTPException(404, "Vendor not found")
+    return build_vendor_out(db, row)
 
 
 @router.post("/vendors", response_model=VendorOut)
@@ -22,6 +38,7 @@ def create_vendor(v: VendorCreate, db: sqlite3.Connection = Depends(get_db_dep))
             "INSERT INTO vendors (name, domain, icon, notes) VALUES (?,?,?,?)",
             (v.name, v.domain, v.icon, v.notes),
         )
+        bump_data_version(db)
         db.commit()
         vid = cur.lastrowid
     except Exception as e:
@@ -48,6 +65,7 @@ def update_vendor(vid: int, v: VendorUpdate, db: sqlite3.Connection = Depends(ge
         updates.append("updated_at=CURRENT_TIMESTAMP")
         params.append(vid)
         db.execute(f"UPDATE vendors SET {','.join(updates)} WHERE id=?", params)
+        bump_data_version(db)
         db.commit()
     row = db.execute("SELECT * FROM vendors WHERE id=?", (vid,)).fetchone()
     return build_vendor_out(db, row)
@@ -56,5 +74,6 @@ def update_vendor(vid: int, v: VendorUpdate, db: sqlite3.Connection = Depends(ge
 @router.delete("/vendors/{vid}")
 def delete_vendor(vid: int, db: sqlite3.Connection = Depends(get_db_dep)):
     db.execute("DELETE FROM vendors WHERE id=?", (vid,))
+    bump_data_version(db)
     db.commit()
     return {"ok": True}
@@ -0,0 +1,150 @@
+"""Streaming anomaly detection — error-rate and latency spikes per key / provider.
+
+Every tracked key and provider keeps two EWMAs per signal: a fast one that
+follows the last few dozen requests and a slow baseline. A signal is anomalous
+when the fast average breaks away from the baseline. Updates are O(1); the
+tracker is an LRU bounded by MAX_TRACKED and idle entries expire after IDLE_TTL;
+anomalies still open on an evicted entry are closed in anomaly_events.
+Per-process state: off with live_stats.ENABLED (VAULT_LIVE_STATS=0).
+"""
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+MAX_TRACKED = int(os.environ.get("VAULT_ANOMALY_MAX_TRACKED", "5000"))
+IDLE_TTL = int(os.environ.get("VAULT_ANOMALY_IDLE_TTL", "3600"))
+
+FAST_ALPHA = 0.1       # ~ last 20 requests
+SLOW_ALPHA = 0.005     # ~ last 400 requests
+MIN_SAMPLES = 30       # no verdicts before the baseline has warmed up
+ERR_FACTOR = 3.0       # error rate must triple the baseline ...
+ERR_MIN_DELTA = 0.2    # ... and be at least 20 points above it
+LAT_SIGMAS = 4.0       # latency must sit 4 sigma above the baseline ...
+LAT_FACTOR = 2.0       # ... and be at least double it
+
+
+class _State:
+    __slots__ = ("n", "last_seen", "err_fast", "err_slow", "lat_fast", "lat_slow", "lat_var", "open")
+
+    def __init__(self, now: float, err: float, lat: float):
+        self.n = 0
+        self.last_seen = now
+        self.err_fast = self.err_slow = err
+        self.lat_fast = self.lat_slow = lat
+        self.lat_var = 0.0
+        self.open: Dict[str, float] = {}   # kind -> started_at
+
+    def update(self, err: float, lat: float):
+        self.n += 1
+        self.err_fast += FAST_ALPHA * (err - self.err_fast)
+        self.lat_fast += FAST_ALPHA * (lat - self.lat_fast)
+        # Freeze the baseline while a spike is open so it isn't absorbed
+        if not self.open:
+            self.err_slow += SLOW_ALPHA * (err - self.err_slow)
+            diff = lat - self.lat_slow
+            self.lat_slow += SLOW_ALPHA * diff
+            self.lat_var = (1 - SLOW_ALPHA) * (self.lat_var + SLOW_ALPHA * diff * diff)
+
+    def verdicts(self) -> Dict[str, Tuple[bool, float, float]]:
+        """kind -> (is_anomalous, current, baseline)"""
+        warm = self.n >= MIN_SAMPLES
+        err_bad = warm and self.err_fast > max(self.err_slow * ERR_FACTOR, self.err_slow + ERR_MIN_DELTA)
+        sigma = math.sqrt(self.lat_var)
+        lat_bad = warm and self.lat_fast > max(self.lat_slow + LAT_SIGMAS * sigma, self.lat_slow * LAT_FACTOR)
+        return {
+            "error_rate": (err_bad, self.err_fast, self.err_slow),
+            "latency": (lat_bad, self.lat_fast, self.lat_slow),
+        }
+
+
+_lock = threading.Lock()
+_states: "OrderedDict[Tuple[str, int], _State]" = OrderedDict()
+
+
+def _evict(now: float) -> List[dict]:
+    """Drop at most a couple of stale entries; returns an "expired" transition for
+    every anomaly an evicted entry still had open, so its event gets closed."""
+    # LRU order: the head is the least recently seen entry, so at most a couple
+    # of pops per event keep the map bounded and free of idle keys.
+    expired = []
+    for _ in range(2):
+        if not _states:
+            break
+        (scope, sid), st = next(iter(_states.items()))
+        if len(_states) > MAX_TRACKED or now - st.last_seen > IDLE_TTL:
+            _states.popitem(last=False)
+            verdicts = st.verdicts()
+            for kind in st.open:
+                _, value, baseline = verdicts[kind]
+                expired.append({"action": "expired", "scope": scope, "entity_id": sid,
+                                "kind": kind, "value": value, "baseline": baseline})
+        else:
+            break
+    return expired
+
+
+def observe(vendor_key_id, provider_id, status_code: int, latency_ms: int) -> List[dict]:
+    """Feed one request; returns anomaly transitions (opened / resolved / expired), usually empty."""
+    now = time.time()
+    err = 1.0 if status_code >= 400 else 0.0
+    lat = float(latency_ms or 0)
+    transitions = []
+    with _lock:
+        for scope, sid in (("key", vendor_key_id), ("provider", provider_id)):
+            if sid is None:
+                continue
+            st = _states.get((scope, sid))
+            if st is None:
+                st = _states[(scope, sid)] = _State(now, err, lat)
+            else:
+                _states.move_to_end((scope, sid))
+            st.last_seen = now
+            st.update(err, lat)
+            for kind, (bad, value, baseline) in st.verdicts().items():
+                if bad and kind not in st.open:
+                    st.open[kind] = now
+                    transitions.append({"action": "opened", "scope": scope, "entity_id": sid,
+                                        "kind": kind, "value": value, "baseline": baseline})
+                elif not bad and kind in st.open:
+                    del st.open[kind]
+                    transitions.append({"action": "resolved", "scope": scope, "entity_id": sid,
+                                        "kind": kind, "value": value, "baseline": baseline})
+        transitions.extend(_evict(now))
+    return transitions
+
+
+def persist(db, transitions: List[dict]):
+    """Record transitions in anomaly_events (caller commits). Expired ones (the
+    tracker dropped the entry while the anomaly was open) are closed like resolved ones."""
+    for t in transitions:
+        if t["action"] == "opened":
+            db.execute(
+                "INSERT INTO anomaly_events (scope, entity_id, kind, value, baseline) VALUES (?,?,?,?,?)",
+                (t["scope"], t["entity_id"], t["kind"], t["value"], t["baseline"]),
+            )
+        else:
+            db.execute(
+                "UPDATE anomaly_events SET resolved_at=CURRENT_TIMESTAMP "
+                "WHERE scope=? AND entity_id=? AND kind=? AND resolved_at IS NULL",
+                (t["scope"], t["entity_id"], t["kind"]),
+            )
+
+
+def current() -> List[dict]:
+    """Anomalies that are open right now."""
+    now = time.time()
+    result = []
+    with _lock:
+        for (scope, sid), st in _states.items():
+            if now - st.last_seen > IDLE_TTL:
+                continue
+            verdicts = st.verdicts()
+            for kind, started in st.open.items():
+                _, value, baseline = verdicts[kind]
+                result.append({"scope": scope, "entity_id": sid, "kind": kind,
+                               "value": round(value, 4), "baseline": round(baseline, 4),
+                               "since": int(started)})
+    return result
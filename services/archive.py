@@ -0,0 +1,190 @@
+"""Columnar archive tier — closed days of request_logs exported to Parquet.
+
+Enabled by setting VAULT_ARCHIVE_DIR. Each closed (UTC) day is written once to
+<dir>/day=YYYY-MM-DD/part-0.parquet; the newest partition is the watermark, so
+analytics read history from Parquet and only the open tail from SQLite.
+Requires pyarrow (optional dependency).
+"""
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+from locks import file_lock
+
+log = logging.getLogger(__name__)
+
+ARCHIVE_DIR = os.environ.get("VAULT_ARCHIVE_DIR", "")
+ARCHIVE_INTERVAL = int(os.environ.get("VAULT_ARCHIVE_INTERVAL", "3600"))
+# Delete archived rows from SQLite after export (history is then served from Parquet only)
+ARCHIVE_PRUNE = os.environ.get("VAULT_ARCHIVE_PRUNE", "") == "1"
+
+_EXPORT_BATCH = 100_000
+_COLUMNS = ["id", "vendor_id", "vendor_key_id", "provider_id", "adapter_id", "model",
+            "input_tokens", "output_tokens", "cost", "status_code", "latency_ms", "created_at"]
+FILTER_COLUMNS = ("vendor_id", "vendor_key_id", "provider_id", "adapter_id")
+
+_export_lock = threading.Lock()
+
+
+class ArchiveUnavailable(RuntimeError):
+    pass
+
+
+def enabled() -> bool:
+    return bool(ARCHIVE_DIR)
+
+
+def _pa():
+    if not ARCHIVE_DIR:
+        raise ArchiveUnavailable("Archive tier disabled (set VAULT_ARCHIVE_DIR)")
+    try:
+        import pyarrow
+        import pyarrow.parquet  # noqa: F401
+        import pyarrow.dataset  # noqa: F401
+    except ImportError:
+        raise ArchiveUnavailable("pyarrow is required for the archive tier (pip install pyarrow)")
+    return pyarrow
+
+
+def _schema(pa):
+    return pa.schema([
+        ("id", pa.int64()), ("vendor_id", pa.int64()), ("vendor_key_id", pa.int64()),
+        ("provider_id", pa.int64()), ("adapter_id", pa.string()), ("model", pa.string()),
+        ("input_tokens", pa.int64()), ("output_tokens", pa.int64()), ("cost", pa.float64()),
+        ("status_code", pa.int32()), ("latency_ms", pa.int64()), ("created_at", pa.string()),
+    ])
+
+
+def watermark() -> Optional[str]:
+    """Last archived day (YYYY-MM-DD), or None if nothing is archived yet."""
+    if not ARCHIVE_DIR or not os.path.isdir(ARCHIVE_DIR):
+        return None
+    days = [d[4:] for d in os.listdir(ARCHIVE_DIR)
+            if d.startswith("day=") and os.path.exists(os.path.join(ARCHIVE_DIR, d, "part-0.parquet"))]
+    return max(days) if days else None
+
+
+def export_closed_days(db) -> list:
+    """Export every closed day newer than the watermark. Returns exported days."""
+    pa = _pa()
+    import pyarrow.parquet as pq
+    schema = _schema(pa)
+    # The file lock keeps exporters in other worker processes off the same partitions
+    with _export_lock, file_lock("archive-export"):
+        since = watermark() or ""
+        # One ordered pass over the unarchived closed range, rolling to a new
+        # partition file whenever the day changes.
+        cur = db.execute(
+            f"SELECT date(created_at) as day, {','.join(_COLUMNS)} FROM request_logs "
+            "WHERE date(created_at) < date('now') AND date(created_at) > ? ORDER BY created_at, id",
+            (since,),
+        )
+        days, writer, day, tmp, pending = [], None, None, None, []
+
+        def flush():
+            if pending:
+                cols = list(zip(*pending))
+                writer.write_table(pa.Table.from_arrays(
+                    [pa.array(c, type=f.type) for c, f in zip(cols, schema)], schema=schema))
+                pending.clear()
+
+        def close():
+            flush()
+            writer.close()
+            os.replace(tmp, os.path.join(ARCHIVE_DIR, f"day={day}", "part-0.parquet"))
+            days.append(day)
+
+        while True:
+            rows = cur.fetchmany(_EXPORT_BATCH)
+            if not rows:
+                break
+            for r in rows:
+                if r[0] != day:
+                    if writer is not None:
+                        close()
+                    day = r[0]
+                    part_dir = os.path.join(ARCHIVE_DIR, f"day={day}")
+                    os.makedirs(part_dir, exist_ok=True)
+                    tmp = os.path.join(part_dir, ".part-0.parquet.tmp")  # dot-files are skipped by dataset discovery
+                    writer = pq.ParquetWriter(tmp, schema, compression="zstd")
+                pending.append(tuple(r)[1:])
+            flush()
+        if writer is not None:
+            close()
+        if ARCHIVE_PRUNE and days:
+            db.execute("DELETE FROM request_logs WHERE date(created_at) BETWEEN ? AND ?", (days[0], days[-1]))
+            db.commit()
+    return days
+
+
+def _archive_usage(start_day: Optional[str], end_day: str, filters: dict) -> dict:
+    pa = _pa()
+    import pyarrow.dataset as ds
+    part = ds.partitioning(pa.schema([("day", pa.string())]), flavor="hive")
+    dataset = ds.dataset(ARCHIVE_DIR, format="parquet", partitioning=part)
+    expr = ds.field("day") <= end_day
+    if start_day:
+        expr = expr & (ds.field("day") >= start_day)
+    for col, val in filters.items():
+        expr = expr & (ds.field(col) == val)
+    table = dataset.to_table(columns=["day", "id", "input_tokens", "output_tokens", "cost"], filter=expr)
+    agg = table.group_by("day").aggregate([
+        ("id", "count"), ("input_tokens", "sum"), ("output_tokens", "sum"), ("cost", "sum"),
+    ]).to_pydict()
+    return {
+        day: {"requests": agg["id_count"][i], "input_tokens": agg["input_tokens_sum"][i] or 0,
+              "output_tokens": agg["output_tokens_sum"][i] or 0, "cost": agg["cost_sum"][i] or 0}
+        for i, day in enumerate(agg["day"])
+    }
+
+
+def usage(db, days: Optional[int], filters: dict) -> list:
+    """Daily usage over archive + SQLite tail, same shape as /api/stats/usage."""
+    filters = {k: v for k, v in filters.items() if k in FILTER_COLUMNS and v is not None}
+    # SQLite CURRENT_TIMESTAMP is UTC, so day boundaries are UTC too
+    start_day = (datetime.utcnow().date() - timedelta(days=days)).isoformat() if days else None
+    mark = watermark()
+    merged = _archive_usage(start_day, mark, filters) if mark else {}
+
+    # Plain comparisons on created_at (not date(created_at)) so the tail is an index range scan
+    where, params = [], []
+    if mark:
+        where.append("created_at >= ?"); params.append((datetime.fromisoformat(mark) + timedelta(days=1)).strftime("%Y-%m-%d"))
+    if start_day:
+        where.append("created_at >= ?"); params.append(start_day)
+    for col, val in filters.items():
+        where.append(f"{col}=?"); params.append(val)
+    w = ("WHERE " + " AND ".join(where)) if where else ""
+    for r in db.execute(f"""
+        SELECT date(created_at) as day, COUNT(*) as requests,
+               COALESCE(SUM(input_tokens),0) as input_tokens,
+               COALESCE(SUM(output_tokens),0) as output_tokens,
+               COALESCE(SUM(cost),0) as cost
+        FROM request_logs {w} GROUP BY date(created_at)
+    """, params).fetchall():
+        merged[r["day"]] = {"requests": r["requests"], "input_tokens": r["input_tokens"],
+                            "output_tokens": r["output_tokens"], "cost": r["cost"]}
+    return [{"day": day, "requests": v["requests"], "input_tokens": v["input_tokens"],
+             "output_tokens": v["output_tokens"], "cost": round(v["cost"], 4)}
+            for day, v in sorted(merged.items())]
+
+
+def start_background_export():
+    """Spawn the periodic exporter thread (no-op when the archive is disabled)."""
+    if not ARCHIVE_DIR:
+        return
+
+    def loop():
+        from db import get_db_ctx
+        while True:
+            try:
+                with get_db_ctx() as db:
+                    export_closed_days(db)
+            except Exception:
+                log.exception("archive export failed")
+            time.sleep(ARCHIVE_INTERVAL)
+
+    threading.Thread(target=loop, name="archive-export", daemon=True).start()
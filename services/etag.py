@@ -0,0 +1,82 @@
+"""Conditional GET support — ETags from the data version + adapter file fingerprints
+(and the key spend / probe result versions for views that show them; spend
+views also carry this process's unflushed spend, key_usage.pending_token()).
+
+`conditional(scope)` is a FastAPI dependency placed *before* the DB dependency:
+on an If-None-Match hit it answers 304 before any connection is opened or any
+adapter file is read.
+"""
+import hashlib
+from typing import Dict
+
+from fastapi import HTTPException, Request, Response
+
+import db
+from adapters import all_adapters, get_adapter
+from services import key_usage
+
+_paths_cache: Dict = {"version": None, "paths": {}}
+
+
+def _adapter_paths() -> Dict[str, str]:
+    """adapter_id -> config_path, re-read from the DB only when the data version moves."""
+    version = db.data_version()
+    if _paths_cache["version"] != version:
+        with db.get_db_ctx() as conn:
+            rows = {r["id"]: r["config_path"] for r in conn.execute("SELECT id, config_path FROM adapters")}
+        _paths_cache["paths"] = rows
+        _paths_cache["version"] = version
+    return _paths_cache["paths"]
+
+
+def adapter_fingerprint(adapter_id: str, config_path: str) -> str:
+    """Cheap per-adapter config fingerprint (BaseAdapter.change_token), no reads."""
+    adapter = get_adapter(adapter_id)
+    if not adapter:
+        return ""
+    return adapter.change_token(config_path)
+
+
+def adapters_fingerprint() -> str:
+    """Change tokens of the enabled adapters that load; disabled and broken ones
+    are left out by all_adapters() and only change the ETag via the data version."""
+    paths = _adapter_paths()
+    adapters = all_adapters()
+    raw = "|".join(f"{aid}={adapters[aid].change_token(paths.get(aid, ''))}" for aid in sorted(adapters))
+    return hashlib.sha1(raw.encode()).hexdigest()[:12]
+
+
+def current_etag(scope: str, with_adapters: bool = False, with_spend: bool = False,
+                 with_health: bool = False) -> str:
+    tag = f"{scope}-{db.data_version()}"
+    if with_spend:
+        tag += f".{db.spend_version()}"
+        pending = key_usage.pending_token()
+        if pending:
+            tag += f".p{pending}"
+    if with_health:
+        tag += f".h{db.health_version()}"
+    if with_adapters:
+        tag += "-" + adapters_fingerprint()
+    return f'W/"{tag}"'
+
+
+def _matches(header: str, etag: str) -> bool:
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return etag in [t.strip() for t in header.split(",")]
+
+
+def conditional(scope: str, with_adapters: bool = False, with_spend: bool = False,
+                with_health: bool = False):
+    """Dependency factory: sets ETag on the response, or raises 304 on a match.
+    Returns the cache headers so routes that build their own Response can pass them on."""
+    def dep(request: Request, response: Response) -> dict:
+        headers = {"ETag": current_etag(scope, with_adapters, with_spend, with_health), "Cache-Control": "no-cache"}
+        if _matches(request.headers.get("if-none-match", ""), headers["ETag"]):
+            raise HTTPException(304, headers=headers)
+        response.headers.update(headers)
+        return headers
+    return dep
@@ -0,0 +1,301 @@
+"""Provider health probing — does a provider's base_url + key actually answer?
+
+Each provider gets one cheap authenticated request, GET {base_url}/models
+(extra_config["health_path"] overrides the path), sent concurrently on
+asyncio. A small HTTP/1.1 client keeps idle keep-alive connections per host
+and caps in-flight probes per host (VAULT_HEALTH_PER_HOST) and overall
+(VAULT_HEALTH_CONCURRENCY); each probe is bounded by VAULT_HEALTH_TIMEOUT.
+Interim 1xx answers are skipped, and bodies over VAULT_HEALTH_MAX_BODY are cut
+off with the connection closed (a probe only needs the status). The blocking
+adapters.http_base pool isn't reused: it would need a thread per in-flight
+probe, and http.client also only skips 100 Continue.
+Results land in provider_health (status, HTTP status, latency). With
+VAULT_HEALTH_INTERVAL > 0 every provider is also probed in the background.
+"""
+import asyncio
+import json
+import logging
+import os
+import ssl
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+log = logging.getLogger(__name__)
+
+TIMEOUT = float(os.environ.get("VAULT_HEALTH_TIMEOUT", "5"))
+PER_HOST = int(os.environ.get("VAULT_HEALTH_PER_HOST", "8"))
+CONCURRENCY = int(os.environ.get("VAULT_HEALTH_CONCURRENCY", "200"))
+INTERVAL = int(os.environ.get("VAULT_HEALTH_INTERVAL", "0"))
+MAX_BODY = int(os.environ.get("VAULT_HEALTH_MAX_BODY", str(64 * 1024)))
+
+# ok: 2xx · auth_failed: 401/403 · error: other HTTP status · timeout · unreachable · no_key
+STATUSES = ("ok", "auth_failed", "error", "timeout", "unreachable", "no_key")
+
+
+class AsyncPool:
+    """Minimal asyncio HTTP/1.1 client: keep-alive connections per (scheme, host, port),
+    at most `per_host` requests in flight per host and `limit` overall."""
+
+    def __init__(self, per_host: int = PER_HOST, limit: int = CONCURRENCY):
+        self.per_host = per_host
+        self._idle: Dict[Tuple[str, str, int], List[Tuple[asyncio.StreamReader, asyncio.StreamWriter]]] = {}
+        self._hosts: Dict[Tuple[str, str, int], asyncio.Semaphore] = {}
+        self._total = asyncio.Semaphore(limit)
+        self._ssl: Optional[ssl.SSLContext] = None
+        self.connections = 0  # opened so far, for benchmarks
+
+    async def _connect(self, key):
+        scheme, host, port = key
+        if scheme == "https" and self._ssl is None:
+            self._ssl = ssl.create_default_context()
+        self.connections += 1
+        return await asyncio.open_connection(host, port, ssl=self._ssl if scheme == "https" else None)
+
+    async def request(self, method: str, url: str, headers: Optional[Dict[str, str]] = None,
+                      timeout: float = TIMEOUT) -> Tuple[int, bytes, float]:
+        """(status, body, ms); ms excludes time spent queued for a host or global slot."""
+        parts = urlsplit(url)
+        scheme = parts.scheme or "http"
+        key = (scheme, parts.hostname or "localhost", parts.port or (443 if scheme == "https" else 80))
+        target = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        lines = [f"{method} {target} HTTP/1.1", f"Host: {parts.netloc}", "Accept: application/json"]
+        lines += [f"{k}: {v}" for k, v in (headers or {}).items()]
+        head = ("\r\n".join(lines) + "\r\n\r\n").encode()
+        host_limit = self._hosts.setdefault(key, asyncio.Semaphore(self.per_host))
+        # Host slot first, so probes queued behind one slow host don't hold global slots
+        async with host_limit, self._total:
+            t0 = time.perf_counter()
+            status, body = await asyncio.wait_for(self._exchange(key, method, head), timeout)
+            return status, body, (time.perf_counter() - t0) * 1000
+
+    async def _exchange(self, key, method: str, head: bytes) -> Tuple[int, bytes]:
+        while True:
+            idle = self._idle.get(key)
+            reused = bool(idle)
+            reader, writer = idle.pop() if idle else await self._connect(key)
+            try:
+                writer.write(head)
+                await writer.drain()
+                status, body, keep = await _read_response(reader, method)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                writer.close()
+                if reused:
+                    continue  # the server closed an idle connection; retry on a fresh one
+                raise
+            except BaseException:
+                writer.close()  # timed out or cancelled mid-response: never reuse
+                raise
+            if keep:
+                self._idle.setdefault(key, []).append((reader, writer))
+            else:
+                writer.close()
+            return status, body
+
+    def close(self):
+        idle, self._idle = self._idle, {}
+        for conns in idle.values():
+            for _, writer in conns:
+                writer.close()
+
+
+async def _read_head(reader: asyncio.StreamReader) -> Tuple[bytes, int, Dict[str, str]]:
+    line = await reader.readline()
+    if not line:
+        raise ConnectionResetError("connection closed before response")
+    version, status = line.split(None, 2)[:2]
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    return version, int(status), headers
+
+
+async def _read_response(reader: asyncio.StreamReader, method: str) -> Tuple[int, bytes, bool]:
+    """(status, body, keep_alive) of the final response. A body over MAX_BODY is
+    cut short and keep_alive is False, so the rest is never read as a response."""
+    while True:
+        version, status, headers = await _read_head(reader)
+        if status == 101:
+            raise ValueError("unexpected 101 Switching Protocols")
+        if not 100 <= status < 200:
+            break  # 100 Continue / 103 Early Hints are followed by the real answer
+    keep = version == b"HTTP/1.1" and headers.get("connection", "").lower() != "close"
+    if method == "HEAD" or status in (204, 304):
+        body = b""
+    elif "chunked" in headers.get("transfer-encoding", "").lower():
+        chunks, total = [], 0
+        while True:
+            size = int((await reader.readline()).split(b";")[0], 16)
+            if size == 0:
+                while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    pass  # trailers
+                break
+            if total + size > MAX_BODY:
+                return status, b"".join(chunks), False
+            chunks.append(await reader.readexactly(size))
+            total += size
+            await reader.readexactly(2)
+        body = b"".join(chunks)
+    elif "content-length" in headers:
+        length = int(headers["content-length"])
+        if length > MAX_BODY:
+            return status, b"", False
+        body = await reader.readexactly(length)
+    else:
+        chunks, total = [], 0
+        while total < MAX_BODY:
+            chunk = await reader.read(MAX_BODY - total)
+            if not chunk:
+                break
+            chunks.append(chunk)
+            total += len(chunk)
+        body, keep = b"".join(chunks), False
+    return status, body, keep
+
+
+def auth_headers(api: str, api_key: str) -> Dict[str, str]:
+    if "anthropic" in (api or ""):
+        return {"x-api-key": api_key, "anthropic-version": "2023-06-01"}
+    return {"Authorization": f"Bearer {api_key}"}
+
+
+async def probe_one(pool: AsyncPool, target: Dict[str, Any], timeout: float = TIMEOUT) -> Dict[str, Any]:
+    """Probe one provider. target: {provider_id, base_url, api_key, extra_config}."""
+    result: Dict[str, Any] = {"provider_id": target["provider_id"], "http_status": None, "latency_ms": None, "error": ""}
+    if not target.get("api_key"):
+        result["status"] = "no_key"
+        return result
+    extra = target.get("extra_config") or {}
+    url = target["base_url"].rstrip("/") + extra.get("health_path", "/models")
+    try:
+        status, _, ms = await pool.request("GET", url, auth_headers(extra.get("api", ""), target["api_key"]), timeout)
+    except asyncio.TimeoutError:
+        result.update(status="timeout", latency_ms=round(timeout * 1000), error=f"no answer within {timeout:g}s")
+    except (OSError, ValueError, asyncio.IncompleteReadError) as e:
+        result.update(status="unreachable", error=f"{type(e).__name__}: {e}")
+    else:
+        result.update(http_status=status, latency_ms=round(ms))
+        if 200 <= status < 300:
+            result["status"] = "ok"
+        else:
+            result.update(status="auth_failed" if status in (401, 403) else "error", error=f"HTTP {status}")
+    return result
+
+
+async def probe(targets: List[Dict[str, Any]], timeout: float = TIMEOUT,
+                per_host: int = PER_HOST, limit: int = CONCURRENCY) -> List[Dict[str, Any]]:
+    """Probe every target concurrently; results in target order."""
+    pool = AsyncPool(per_host, limit)
+    try:
+        return list(await asyncio.gather(*(probe_one(pool, t, timeout) for t in targets)))
+    finally:
+        pool.close()
+
+
+# ── Storage ──
+
+def load_targets(db, ids: Optional[List[int]] = None) -> List[Dict[str, Any]]:
+    """Probe targets for all providers (or `ids`), each key decrypted once."""
+    from db import decrypt
+    sql = ("SELECT p.id, p.base_url, p.extra_config, p.vendor_key_id, vk.api_key_enc "
+           "FROM providers p LEFT JOIN vendor_keys vk ON p.vendor_key_id=vk.id")
+    params: list = []
+    if ids:
+        sql += f" WHERE p.id IN ({','.join('?' * len(ids))})"
+        params = list(ids)
+    keys: Dict[Any, str] = {}
+    targets = []
+    for r in db.execute(sql, params).fetchall():
+        kid = r["vendor_key_id"]
+        if kid not in keys:
+            try:
+                keys[kid] = decrypt(r["api_key_enc"]) if r["api_key_enc"] else ""
+            except Exception:
+                keys[kid] = ""
+        try:
+            extra = json.loads(r["extra_config"] or "{}")
+        except ValueError:
+            extra = {}
+        targets.append({"provider_id": r["id"], "base_url": r["base_url"], "api_key": keys[kid],
+                        "extra_config": extra if isinstance(extra, dict) else {}})
+    return targets
+
+
+def save(db, results: List[Dict[str, Any]]):
+    """Upsert probe results. Every stored result moves the health version (provider
+    listings); a new data version is published only when a provider's status
+    changed (the topology_changes triggers log exactly those rows)."""
+    if not results:
+        return
+    from db import bump_data_version, bump_health_version
+    logged = db.execute("SELECT MAX(id) FROM topology_changes").fetchone()[0]
+    cur = db.executemany(
+        "INSERT INTO provider_health (provider_id, status, http_status, latency_ms, error, checked_at) "
+        "SELECT :provider_id, :status, :http_status, :latency_ms, :error, CURRENT_TIMESTAMP "
+        "WHERE EXISTS (SELECT 1 FROM providers WHERE id=:provider_id) "
+        "ON CONFLICT(provider_id) DO UPDATE SET status=excluded.status, http_status=excluded.http_status, "
+        "latency_ms=excluded.latency_ms, error=excluded.error, checked_at=excluded.checked_at",
+        results,
+    )
+    if cur.rowcount > 0:
+        bump_health_version(db)
+    if db.execute("SELECT MAX(id) FROM topology_changes").fetchone()[0] != logged:
+        bump_data_version(db)
+    db.commit()
+
+
+# Select list for "LEFT JOIN provider_health h", read back by health_out()
+HEALTH_COLUMNS = ("h.status AS h_status, h.http_status AS h_http_status, h.latency_ms AS h_latency_ms, "
+                  "h.error AS h_error, h.checked_at AS h_checked_at")
+
+
+def health_out(r, prefix: str = "h_") -> Optional[Dict[str, Any]]:
+    """ProviderOut.health from a row joined with provider_health (columns aliased with prefix)."""
+    if r[f"{prefix}status"] is None:
+        return None
+    return {
+        "status": r[f"{prefix}status"], "http_status": r[f"{prefix}http_status"],
+        "latency_ms": r[f"{prefix}latency_ms"], "error": r[f"{prefix}error"] or "",
+        "checked_at": r[f"{prefix}checked_at"],
+    }
+
+
+def check_all(ids: Optional[List[int]] = None) -> List[Dict[str, Any]]:
+    """Blocking probe + save, for the background thread."""
+    from db import get_db_ctx
+    with get_db_ctx() as db:
+        targets = load_targets(db, ids)
+    results = asyncio.run(probe(targets))
+    with get_db_ctx() as db:
+        save(db, results)
+    return results
+
+
+def start_background_probe():
+    """Spawn the periodic prober thread (no-op unless VAULT_HEALTH_INTERVAL is set)."""
+    if INTERVAL <= 0:
+        return
+
+    def loop():
+        from db import get_db_ctx
+        from locks import file_lock
+        while True:
+            try:
+                # One worker probes per interval; the others see fresh results and skip
+                with file_lock("health-probe"):
+                    with get_db_ctx() as db:
+                        last = db.execute(
+                            "SELECT CAST(strftime('%s', 'now') - strftime('%s', MAX(checked_at)) AS INTEGER) "
+                            "FROM provider_health").fetchone()[0]
+                    if last is None or last >= INTERVAL // 2:
+                        check_all()
+            except Exception:
+                log.exception("background health probe failed")
+            time.sleep(INTERVAL)
+
+    threading.Thread(target=loop, name="health-probe", daemon=True).start()
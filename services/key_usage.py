@@ -0,0 +1,139 @@
+"""Key spend tracking — running per-key spend from ingested logs.
+
+Ingestion only bumps an in-memory counter; a background flusher applies the
+accumulated spend to vendor_keys (spent, balance, status) in one batched
+UPDATE. A key whose quota or balance runs out is marked 'exhausted' and, if it
+has a fallback_key_id, its providers are moved to the fallback and re-synced.
+Flushes bump db.spend_version, not the global data version, so topology and
+other cached views stay valid while logs stream in. Listings add this
+process's unflushed spend (live_values), so their ETags also carry
+pending_token().
+"""
+import logging
+import os
+import threading
+import time
+import uuid
+from typing import Dict
+from db import bump_data_version, bump_spend_version
+
+log = logging.getLogger(__name__)
+
+FLUSH_INTERVAL = float(os.environ.get("VAULT_KEY_FLUSH_INTERVAL", "5"))
+
+_lock = threading.Lock()
+_pending: Dict[int, float] = {}
+_generation = 0                  # bumped by every record()
+_NONCE = uuid.uuid4().hex[:8]    # tells workers' (and restarts') generations apart
+_flush_lock = threading.Lock()
+
+
+def record(vendor_key_id, cost: float):
+    if vendor_key_id is None or not cost:
+        return
+    global _generation
+    with _lock:
+        _pending[vendor_key_id] = _pending.get(vendor_key_id, 0.0) + cost
+        _generation += 1
+
+
+def pending_token() -> str:
+    """ETag part for views built with live_values: empty while nothing is pending
+    (the DB holds everything), else unique to this process and pending state."""
+    with _lock:
+        return f"{_NONCE}.{_generation}" if _pending else ""
+
+
+def pending(vendor_key_id: int) -> float:
+    """Spend recorded for a key but not flushed to the DB yet."""
+    return _pending.get(vendor_key_id, 0.0)
+
+
+def live_values(row) -> dict:
+    """spent/balance/status for a vendor_keys row, including unflushed spend."""
+    extra = pending(row["id"])
+    balance = row["balance"]
+    return {
+        "spent": round((row["spent"] or 0) + extra, 6),
+        "balance": round(balance - extra, 6) if balance is not None else None,
+        "status": row["status"],
+    }
+
+
+def flush(db) -> list:
+    """Apply pending spend in one batched UPDATE. Returns ids of keys that became exhausted."""
+    with _flush_lock:
+        with _lock:
+            batch = dict(_pending)
+            _pending.clear()
+        if not batch:
+            return []
+        ids = list(batch)
+        marks = ",".join("?" * len(ids))
+        was_active = {r["id"] for r in db.execute(
+            f"SELECT id FROM vendor_keys WHERE status='active' AND id IN ({marks})", ids)}
+        try:
+            db.executemany(
+                """UPDATE vendor_keys SET
+                       spent = spent + ?1,
+                       balance = CASE WHEN balance IS NULL THEN NULL ELSE balance - ?1 END,
+                       status = CASE WHEN status = 'active' AND (
+                                    (quota IS NOT NULL AND spent + ?1 >= quota) OR
+                                    (balance IS NOT NULL AND balance - ?1 <= 0))
+                                THEN 'exhausted' ELSE status END
+                   WHERE id = ?2""",
+                [(cost, kid) for kid, cost in batch.items()],
+            )
+            bump_spend_version(db)
+            db.commit()
+        except Exception:
+            # Put the spend back so it's retried on the next flush
+            with _lock:
+                for kid, cost in batch.items():
+                    _pending[kid] = _pending.get(kid, 0.0) + cost
+            raise
+        exhausted = [r["id"] for r in db.execute(
+            f"SELECT id FROM vendor_keys WHERE status='exhausted' AND id IN ({marks})", ids)
+            if r["id"] in was_active]
+    for kid in exhausted:
+        fail_over(db, kid)
+    return exhausted
+
+
+def fail_over(db, key_id: int) -> list:
+    """Move providers off an exhausted key onto its designated fallback and push them."""
+    row = db.execute(
+        "SELECT k.fallback_key_id, f.status as fallback_status FROM vendor_keys k "
+        "LEFT JOIN vendor_keys f ON k.fallback_key_id=f.id WHERE k.id=?", (key_id,)
+    ).fetchone()
+    if not row or not row["fallback_key_id"] or row["fallback_status"] != "active":
+        return []
+    providers = [r["id"] for r in db.execute(
+        "SELECT id FROM providers WHERE vendor_key_id=?", (key_id,)).fetchall()]
+    if not providers:
+        return []
+    db.execute(
+        "UPDATE providers SET vendor_key_id=?, updated_at=CURRENT_TIMESTAMP WHERE vendor_key_id=?",
+        (row["fallback_key_id"], key_id),
+    )
+    bump_data_version(db)
+    db.commit()
+    from services.sync_engine import sync_provider_to_bindings
+    results = []
+    for pid in providers:
+        results.extend(sync_provider_to_bindings(pid))
+    return results
+
+
+def start_background_flush():
+    def loop():
+        from db import get_db_ctx
+        while True:
+            time.sleep(FLUSH_INTERVAL)
+            try:
+                with get_db_ctx() as db:
+                    flush(db)
+            except Exception:
+                log.exception("key spend flush failed")
+
+    threading.Thread(target=loop, name="key-usage-flush", daemon=True).start()
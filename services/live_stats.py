@@ -0,0 +1,99 @@
+"""Live usage counters — in-memory sliding windows fed by log ingestion.
+
+Each vendor and key gets a ring of one-second buckets plus running totals,
+so recording an event is O(1) and reading a window never touches the DB.
+
+The counters (and services.anomaly's detectors) live in one process, so with
+several workers each would see only its share of the traffic: main.py refuses
+--workers > 1 unless VAULT_LIVE_STATS=0 switches both off.
+"""
+import os
+import threading
+import time
+from typing import Dict, Tuple
+
+ENABLED = os.environ.get("VAULT_LIVE_STATS", "1") != "0"
+WINDOW_SECONDS = 60
+
+# Bucket / totals layout: [requests, input_tokens, output_tokens, cost, errors]
+_FIELDS = 5
+
+
+class _Window:
+    __slots__ = ("buckets", "totals", "last_sec")
+
+    def __init__(self, now_sec: int):
+        self.buckets = [[0, 0, 0, 0.0, 0] for _ in range(WINDOW_SECONDS)]
+        self.totals = [0, 0, 0, 0.0, 0]
+        self.last_sec = now_sec
+
+    def advance(self, now_sec: int):
+        """Expire buckets that fell out of the window since the last touch."""
+        gap = now_sec - self.last_sec
+        if gap <= 0:
+            return
+        for s in range(self.last_sec + 1, self.last_sec + 1 + min(gap, WINDOW_SECONDS)):
+            b = self.buckets[s % WINDOW_SECONDS]
+            for i in range(_FIELDS):
+                self.totals[i] -= b[i]
+                b[i] = 0
+        self.last_sec = now_sec
+
+    def add(self, now_sec: int, inp: int, out: int, cost: float, error: bool):
+        self.advance(now_sec)
+        b = self.buckets[now_sec % WINDOW_SECONDS]
+        vals = (1, inp, out, cost, 1 if error else 0)
+        for i in range(_FIELDS):
+            b[i] += vals[i]
+            self.totals[i] += vals[i]
+
+
+_lock = threading.Lock()
+_windows: Dict[Tuple[str, int], _Window] = {}
+
+
+def record(vendor_id, vendor_key_id, input_tokens: int, output_tokens: int,
+           cost: float, status_code: int):
+    """Account one ingested request in the global, vendor and key windows."""
+    now = int(time.time())
+    error = status_code >= 400
+    with _lock:
+        for scope, sid in (("all", 0), ("vendor", vendor_id), ("key", vendor_key_id)):
+            if sid is None:
+                continue
+            w = _windows.get((scope, sid))
+            if w is None:
+                w = _windows[(scope, sid)] = _Window(now)
+            w.add(now, input_tokens, output_tokens, cost, error)
+
+
+def _summary(totals) -> dict:
+    requests, inp, out, cost, errors = totals
+    return {
+        "requests": requests,
+        "input_tokens": inp,
+        "output_tokens": out,
+        "cost": round(cost, 6),
+        "error_rate": round(errors / requests, 4) if requests else 0.0,
+    }
+
+
+def snapshot() -> dict:
+    """Current window totals; idle vendors/keys are dropped from memory."""
+    now = int(time.time())
+    result = {"window_seconds": WINDOW_SECONDS, "ts": now,
+              "total": _summary([0, 0, 0, 0.0, 0]), "vendors": [], "keys": []}
+    with _lock:
+        for (scope, sid), w in list(_windows.items()):
+            w.advance(now)
+            if not w.totals[0]:
+                del _windows[(scope, sid)]
+                continue
+            summary = _summary(w.totals)
+            if scope == "all":
+                result["total"] = summary
+            elif scope == "vendor":
+                result["vendors"].append({"vendor_id": sid, **summary})
+            else:
+                result["keys"].append({"vendor_key_id": sid, **summary})
+    return result
@@ -0,0 +1,140 @@
+"""Master-key re-encryption — move every stored secret onto the primary key.
+
+After a new primary master key is added (db.add_master_key, or prepended to
+VAULT_KEY / .vault_key), old tokens keep decrypting through MultiFernet; this
+job rewrites them under the primary so the old keys can be retired. It walks
+each encrypted column in id order, VAULT_REKEY_BATCH rows per transaction:
+tokens are re-encrypted before the write lock is taken, a row is only updated
+if it still holds the token that was read (otherwise a concurrent write has
+already used the primary key), and the checkpoint commits with its batch.
+Progress is kept in meta ('rekey'), so a restarted server resumes where the
+job stopped. Snapshot objects (services.snapshots) are re-encrypted last, and
+the pass only counts as completed once no stored token still needs an older key.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from db import decrypt, get_db_ctx, on_primary_key, rotate_token
+
+log = logging.getLogger(__name__)
+
+# (table, encrypted column) pairs, walked in this order
+TARGETS = (("vendor_keys", "api_key_enc"), ("key_rotations", "new_key_enc"))
+BATCH = int(os.environ.get("VAULT_REKEY_BATCH", "500"))
+PAUSE = float(os.environ.get("VAULT_REKEY_PAUSE", "0.005"))  # between batches, so other writers get in
+
+_runner_lock = threading.Lock()
+_runner: Optional[threading.Thread] = None
+
+
+def status(db) -> Dict[str, Any]:
+    row = db.execute("SELECT value FROM meta WHERE key='rekey'").fetchone()
+    return json.loads(row[0]) if row else {"state": "idle"}
+
+
+def _save(db, st: Dict[str, Any]):
+    st["updated_at"] = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime())
+    db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('rekey', ?)", (json.dumps(st),))
+
+
+def start(db) -> Dict[str, Any]:
+    """Start a re-encryption pass (or pick up a running one) in the background."""
+    st = status(db)
+    if st.get("state") != "running":
+        total = sum(db.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table, _ in TARGETS)
+        st = {"state": "running", "phase": 0, "after": 0, "done": 0, "total": total, "failed": 0, "failed_ids": [],
+              "started_at": time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime())}
+        _save(db, st)
+        db.commit()
+    _spawn()
+    return st
+
+
+def resume_background():
+    """At startup: continue a pass an earlier process left running."""
+    with get_db_ctx() as db:
+        if status(db).get("state") == "running":
+            _spawn()
+
+
+def _spawn():
+    global _runner
+    with _runner_lock:
+        if _runner is None or not _runner.is_alive():
+            _runner = threading.Thread(target=run, name="rekey", daemon=True)
+            _runner.start()
+
+
+def run() -> Dict[str, Any]:
+    """Drive the recorded pass to completion. One runner at a time across workers;
+    a runner that waited on the lock finds the pass finished and returns."""
+    from locks import file_lock
+    with file_lock("rekey"), get_db_ctx() as db:
+        st = status(db)
+        if st.get("state") != "running":
+            return st
+        try:
+            for phase in range(st["phase"], len(TARGETS)):
+                _walk(db, st, *TARGETS[phase])
+                st.update(phase=phase + 1, after=0)
+                _save(db, st)
+                db.commit()
+            from services import snapshots
+            st["snapshots"] = snapshots.rekey(rotate_token)
+            stale = _count_stale(db) + snapshots.count_tokens(_stale)
+            if stale:
+                st.update(state="failed", error=f"{stale} tokens are still encrypted with an older master key; start the pass again")
+            else:
+                st.update(state="completed", finished_at=time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime()))
+        except Exception as e:
+            db.rollback()
+            st.update(state="failed", error=f"{type(e).__name__}: {e}")
+            log.exception("master key re-encryption failed")
+        _save(db, st)
+        db.commit()
+        return st
+
+
+def _stale(token: str) -> bool:
+    """Readable, but not with the primary key (unreadable tokens are already in failed)."""
+    if not token or on_primary_key(token):
+        return False
+    try:
+        decrypt(token)
+    except Exception:
+        return False
+    return True
+
+
+def _count_stale(db) -> int:
+    return sum(_stale(token) for table, column in TARGETS
+               for (token,) in db.execute(f"SELECT {column} FROM {table}").fetchall())
+
+
+def _walk(db, st: Dict[str, Any], table: str, column: str):
+    while True:
+        rows = db.execute(f"SELECT id, {column} FROM {table} WHERE id > ? ORDER BY id LIMIT ?",
+                          (st["after"], BATCH)).fetchall()
+        if not rows:
+            return
+        updates = []
+        for rid, token in rows:
+            if not token:
+                continue
+            try:
+                updates.append((rotate_token(token), rid, token))
+            except Exception:  # no master key opens it; leave the row and report it
+                st["failed"] += 1
+                if len(st["failed_ids"]) < 100:
+                    st["failed_ids"].append(f"{table}:{rid}")
+        db.execute("BEGIN IMMEDIATE")
+        db.executemany(f"UPDATE {table} SET {column}=? WHERE id=? AND {column}=?", updates)
+        st["after"] = rows[-1][0]
+        st["done"] += len(rows)
+        _save(db, st)
+        db.commit()
+        time.sleep(PAUSE)
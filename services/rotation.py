@@ -0,0 +1,254 @@
+"""Staged key rotation — swap a vendor key across every bound config, or not at all.
+
+A rotation is a state machine persisted in key_rotations; each step records
+its outcome before the next one starts:
+
+    registered ─▶ verified ─▶ pushing ─▶ committed
+        │                        └────▶ rolling_back ─▶ rolled_back
+        └─▶ failed
+
+- registered: the new key is stored encrypted on the rotation; vendor_keys is untouched.
+- verified: the providers using the key were health-probed with the new key
+  (skipped with verify=False). A rejected or unverifiable key ends in failed.
+- pushing: every affected config file was snapshotted (services.snapshots),
+  then the new key is pushed to all auto_sync bindings concurrently.
+- committed: at most max_failures bindings failed, so vendor_keys takes the new key.
+- rolled_back: more failed. Every adapter the push reached, failed or not, was
+  reverted: snapshotted files still holding what the push wrote (same SHA-256)
+  were restored; adapters without files, without a snapshot, or whose files
+  were written again meanwhile got the old key pushed back instead, so other
+  changes to those files survive.
+
+resume() continues an interrupted rotation from its recorded state. Pushing
+and restoring are idempotent, so a step cut off halfway is simply run again.
+"""
+import asyncio
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from db import get_db_ctx, encrypt, decrypt, bump_data_version
+from adapters import get_adapter
+
+_PUSH_EXECUTOR = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("VAULT_ROTATION_WORKERS", "8")), thread_name_prefix="key-rotation",
+)
+
+ACTIVE_STATES = ("registered", "verified", "pushing", "rolling_back")
+FINAL_STATES = ("committed", "rolled_back", "failed")
+
+
+class RotationError(Exception):
+    pass
+
+
+def _parse(raw, default):
+    try:
+        return json.loads(raw) if raw else default
+    except ValueError:
+        return default
+
+
+def rotation_out(row) -> Dict[str, Any]:
+    progress = _parse(row["progress"], {})
+    return {
+        "id": row["id"], "key_id": row["key_id"], "state": row["state"],
+        "verify": bool(row["verify"]), "max_failures": row["max_failures"],
+        "verification": progress.get("verification", []),
+        "results": progress.get("results", []),
+        "rollback": progress.get("rollback", []),
+        "error": row["error"] or "",
+        "created_at": row["created_at"], "updated_at": row["updated_at"],
+    }
+
+
+def _load(db, rid: int):
+    row = db.execute("SELECT * FROM key_rotations WHERE id=?", (rid,)).fetchone()
+    if not row:
+        raise RotationError("Rotation not found")
+    return row
+
+
+def _set_state(db, rid: int, state: str, progress: Dict[str, Any], error: str = ""):
+    db.execute(
+        "UPDATE key_rotations SET state=?, progress=?, error=?, updated_at=CURRENT_TIMESTAMP WHERE id=?",
+        (state, json.dumps(progress, ensure_ascii=False), error, rid),
+    )
+    db.commit()
+
+
+def start(key_id: int, api_key: str, verify: bool = True, max_failures: int = 0) -> Dict[str, Any]:
+    """Register a rotation of key_id to api_key and run it. Raises RotationError
+    if the key doesn't exist or already has a rotation in progress."""
+    from locks import file_lock
+    with file_lock(f"key-rotation-key-{key_id}"), get_db_ctx() as db:  # check + insert, across workers
+        if not db.execute("SELECT id FROM vendor_keys WHERE id=?", (key_id,)).fetchone():
+            raise RotationError("Key not found")
+        busy = db.execute(
+            f"SELECT id FROM key_rotations WHERE key_id=? AND state IN ({','.join('?' * len(ACTIVE_STATES))})",
+            (key_id, *ACTIVE_STATES),
+        ).fetchone()
+        if busy:
+            raise RotationError(f"Key already has rotation {busy['id']} in progress; resume it first")
+        cur = db.execute(
+            "INSERT INTO key_rotations (key_id, new_key_enc, verify, max_failures) VALUES (?,?,?,?)",
+            (key_id, encrypt(api_key), int(verify), max(0, max_failures)),
+        )
+        db.commit()
+        rid = cur.lastrowid
+    return resume(rid)
+
+
+def resume(rid: int) -> Dict[str, Any]:
+    """Run a rotation from its recorded state to a final one."""
+    from locks import file_lock
+    with file_lock(f"key-rotation-{rid}"):  # one runner per rotation, across workers
+        while True:
+            with get_db_ctx() as db:
+                row = _load(db, rid)
+                if row["state"] in FINAL_STATES:
+                    return rotation_out(row)
+                step = _STEPS[row["state"]]
+                step(db, row, _parse(row["progress"], {}))
+
+
+# ── Steps ──
+
+def _affected_bindings(db, key_id: int) -> list:
+    return db.execute(
+        "SELECT b.id, b.adapter_id, b.target_provider_name, a.config_path, "
+        "p.id as provider_id, p.name as provider_name, p.base_url, p.extra_config "
+        "FROM bindings b JOIN providers p ON b.provider_id=p.id LEFT JOIN adapters a ON b.adapter_id=a.id "
+        "WHERE p.vendor_key_id=? AND b.auto_sync=1 ORDER BY b.id",
+        (key_id,),
+    ).fetchall()
+
+
+def _verify(db, row, progress):
+    if not row["verify"]:
+        return _set_state(db, row["id"], "verified", progress)
+    from services import health
+    ids = [r["id"] for r in db.execute("SELECT id FROM providers WHERE vendor_key_id=?", (row["key_id"],))]
+    new_key = decrypt(row["new_key_enc"])
+    targets = [dict(t, api_key=new_key) for t in health.load_targets(db, ids)] if ids else []
+    results = asyncio.run(health.probe(targets)) if targets else []
+    progress["verification"] = results
+    statuses = {r["status"] for r in results}
+    if "auth_failed" in statuses:
+        return _set_state(db, row["id"], "failed", progress, "New key was rejected by the provider")
+    if results and "ok" not in statuses:
+        return _set_state(db, row["id"], "failed", progress, "New key could not be verified (no provider answered)")
+    _set_state(db, row["id"], "verified", progress)
+
+
+def _snapshot(db, row, progress):
+    """Snapshot every config file the push may touch, once per rotation."""
+    from services import snapshots
+    taken: Dict[str, Dict[str, Optional[str]]] = {}
+    for b in _affected_bindings(db, row["key_id"]):
+        adapter = get_adapter(b["adapter_id"])
+        if not adapter or b["adapter_id"] in taken:
+            continue
+        files = adapter.config_files(b["config_path"] or "")
+        taken[b["adapter_id"]] = {f: snapshots.capture(adapter.id, f) for f in files}
+    progress["snapshots"] = taken
+    _set_state(db, row["id"], "pushing", progress)
+
+
+def _push_all(bindings: list, api_key: str) -> List[Dict[str, Any]]:
+    """Push api_key to every binding concurrently; per-binding results in binding order."""
+    def one(b) -> Dict[str, Any]:
+        result = {"binding_id": b["id"], "adapter": b["adapter_id"], "target": b["target_provider_name"],
+                  "provider": b["provider_name"], "ok": False}
+        adapter = get_adapter(b["adapter_id"])
+        if not adapter:
+            return dict(result, error="Adapter not found")
+        try:
+            result["ok"] = adapter.apply_locked(
+                b["config_path"] or "", b["base_url"], api_key,
+                provider_name=b["target_provider_name"], extra_fields=_parse(b["extra_config"], {}))
+        except Exception as e:
+            result["error"] = f"{type(e).__name__}: {e}"
+        return result
+
+    return list(_PUSH_EXECUTOR.map(one, bindings))
+
+
+def _file_hash(path: str) -> Optional[str]:
+    try:
+        with open(path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except FileNotFoundError:
+        return None
+
+
+def _push(db, row, progress):
+    if "snapshots" not in progress:
+        return _snapshot(db, row, progress)
+    results = _push_all(_affected_bindings(db, row["key_id"]), decrypt(row["new_key_enc"]))
+    progress["results"] = results
+    # What the push left in each snapshotted file; rollback only restores files still holding it
+    progress["written"] = {aid: {path: _file_hash(path) for path in snaps}
+                           for aid, snaps in progress["snapshots"].items()}
+    failures = sum(1 for r in results if not r["ok"])
+    if failures > row["max_failures"]:
+        return _set_state(db, row["id"], "rolling_back", progress,
+                          f"{failures} of {len(results)} bindings failed (max {row['max_failures']})")
+    db.execute("UPDATE vendor_keys SET api_key_enc=?, updated_at=CURRENT_TIMESTAMP WHERE id=?",
+               (row["new_key_enc"], row["key_id"]))
+    bump_data_version(db)
+    _set_state(db, row["id"], "committed", progress,
+               f"{failures} of {len(results)} bindings failed" if failures else "")
+
+
+def _roll_back(db, row, progress):
+    from services import snapshots
+    # A failed push may still have written part of its files, so every adapter
+    # that was attempted is reverted, not only those that reported ok
+    attempted = {r["adapter"] for r in progress.get("results", [])}
+    config_paths = {b["adapter_id"]: b["config_path"] or "" for b in _affected_bindings(db, row["key_id"])}
+    restored, repush = [], []
+    for adapter_id in sorted(attempted):
+        adapter = get_adapter(adapter_id)
+        snaps = progress.get("snapshots", {}).get(adapter_id, {})
+        written = progress.get("written", {}).get(adapter_id, {})
+        untouched = all(path in written and _file_hash(path) == written[path] for path in snaps)
+        if adapter and snaps and all(snaps.values()) and untouched:
+            for path, sid in snaps.items():
+                try:
+                    ok = snapshots.restore(adapter, config_paths.get(adapter_id, ""), sid) is not None
+                except snapshots.SnapshotUnavailable:
+                    ok = False
+                restored.append({"adapter": adapter_id, "file": path, "ok": ok})
+        else:
+            repush.append(adapter_id)
+    if repush:
+        old = db.execute("SELECT api_key_enc FROM vendor_keys WHERE id=?", (row["key_id"],)).fetchone()
+        bindings = [b for b in _affected_bindings(db, row["key_id"]) if b["adapter_id"] in repush]
+        for r in _push_all(bindings, decrypt(old["api_key_enc"])):
+            restored.append({"adapter": r["adapter"], "target": r["target"], "ok": r["ok"]})
+    progress["rollback"] = restored
+    _set_state(db, row["id"], "rolled_back", progress, row["error"] or "")
+
+
+_STEPS = {
+    "registered": _verify,
+    "verified": _push,
+    "pushing": _push,
+    "rolling_back": _roll_back,
+}
+
+
+def list_rotations(db, key_id: Optional[int] = None, limit: int = 50) -> List[Dict[str, Any]]:
+    if key_id is None:
+        rows = db.execute("SELECT * FROM key_rotations ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+    else:
+        rows = db.execute("SELECT * FROM key_rotations WHERE key_id=? ORDER BY id DESC LIMIT ?",
+                          (key_id, limit)).fetchall()
+    return [rotation_out(r) for r in rows]
+
+
+def get_rotation(db, rid: int) -> Dict[str, Any]:
+    return rotation_out(_load(db, rid))
@@ -0,0 +1,232 @@
+"""Sankey graph for the topology view — nodes, links and flow weights, built server-side.
+
+Layers: vendor (0) → key (1) → provider (2) → adapter (3) → service endpoint (4).
+Node names keep the front end's prefixes (v_, k_, p_, a_, s_). Vendors with more
+keys + providers than the aggregation threshold have their keys and providers
+collapsed into one summary node each (kx_<vid>, px_<vid>), and adapters with
+more endpoints than the threshold into sx_<aid>. `expand` lists vendors to show
+in full; vendor / adapter filters return just that (expanded) subgraph.
+"""
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+
+DEFAULT_THRESHOLD = 20
+_CACHE_SIZE = 32
+
+_cache: "OrderedDict[tuple, dict]" = OrderedDict()
+_cache_lock = threading.Lock()
+_latest: Optional[tuple] = None  # (version, adapters_fp, topology) of the newest topology built
+
+
+def cache_get(key: tuple):
+    """Cached graph (or topology) for a key holding the data version + adapter fingerprint."""
+    with _cache_lock:
+        value = _cache.get(key)
+        if value is not None:
+            _cache.move_to_end(key)
+        return value
+
+
+def cache_put(key: tuple, value):
+    with _cache_lock:
+        _cache[key] = value
+        while len(_cache) > _CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+def latest() -> Optional[tuple]:
+    """(version, adapters_fp, topology) last passed to set_latest, for patching with a delta."""
+    return _latest
+
+
+def set_latest(version: int, fp: str, topology: dict):
+    global _latest
+    with _cache_lock:
+        if _latest is None or version >= _latest[0]:
+            _latest = (version, fp, topology)
+
+
+def propagate_flow(nodes: Dict[str, dict], links: list):
+    """Flow-balance link values in place (server port of the old client-side propagateFlow).
+
+    1. Scale provider→adapter links so an adapter's input matches its output.
+    2. key→provider links carry the provider's outgoing flow.
+    3. vendor→key links carry the key's outgoing flow.
+    """
+    def depth(name):
+        return nodes[name]["depth"]
+
+    out_flow: Dict[str, float] = {}
+    in_flow: Dict[str, float] = {}
+    for l in links:
+        out_flow[l["source"]] = out_flow.get(l["source"], 0) + l["value"]
+        in_flow[l["target"]] = in_flow.get(l["target"], 0) + l["value"]
+
+    for l in links:
+        a = l["target"]
+        if depth(a) == 3 and 0 < in_flow[a] < out_flow.get(a, 0):
+            l["value"] *= out_flow[a] / in_flow[a]
+
+    for layer in (2, 1):
+        out: Dict[str, float] = {}
+        for l in links:
+            if depth(l["source"]) == layer:
+                out[l["source"]] = out.get(l["source"], 0) + l["value"]
+        for l in links:
+            if depth(l["target"]) == layer:
+                l["value"] = out.get(l["target"]) or 1
+
+
+def build(topo: dict, threshold: int = DEFAULT_THRESHOLD, expand: Iterable[int] = (),
+          vendor_id: Optional[int] = None, adapter_id: Optional[str] = None) -> dict:
+    """Build {nodes, links} from a /topology payload. threshold <= 0 disables aggregation."""
+    vendors, keys, providers = topo["vendors"], topo["keys"], topo["providers"]
+    adapters, bindings = topo["adapters"], topo["bindings"]
+
+    # ── Subgraph filters ──
+    if vendor_id is not None:
+        vendors = [v for v in vendors if v["id"] == vendor_id]
+        keys = [k for k in keys if k["vendor_id"] == vendor_id]
+        providers = [p for p in providers if p["vendor_id"] == vendor_id]
+        kept = {p["id"] for p in providers}
+        bindings = [b for b in bindings if b["provider_id"] in kept]
+        bound = {b["adapter_id"] for b in bindings}
+        adapters = [a for a in adapters if a["id"] in bound]
+        expand = {vendor_id}
+    if adapter_id is not None:
+        bindings = [b for b in bindings if b["adapter_id"] == adapter_id]
+        bound = {b["provider_id"] for b in bindings}
+        providers = [p for p in providers if p["id"] in bound]
+        used_keys = {p["vendor_key_id"] for p in providers}
+        keys = [k for k in keys if k["id"] in used_keys]
+        used_vendors = {k["vendor_id"] for k in keys}
+        vendors = [v for v in vendors if v["id"] in used_vendors]
+        adapters = [a for a in adapters if a["id"] == adapter_id]
+    expand = set(expand)
+
+    # ── Aggregation: which vendors collapse ──
+    size: Dict[int, int] = {}
+    key_count: Dict[int, int] = {}
+    prov_count: Dict[int, int] = {}
+    for k in keys:
+        size[k["vendor_id"]] = size.get(k["vendor_id"], 0) + 1
+        key_count[k["vendor_id"]] = key_count.get(k["vendor_id"], 0) + 1
+    key_ids = {k["id"] for k in keys}
+    for p in providers:
+        if p["vendor_key_id"] not in key_ids:
+            continue  # not drawn
+        size[p["vendor_id"]] = size.get(p["vendor_id"], 0) + 1
+        prov_count[p["vendor_id"]] = prov_count.get(p["vendor_id"], 0) + 1
+    collapsed = {vid for vid, n in size.items() if threshold > 0 and n > threshold and vid not in expand}
+
+    nodes: Dict[str, dict] = OrderedDict()
+    links: Dict[tuple, dict] = OrderedDict()
+
+    def add_node(name, display, depth, **extra):
+        if name not in nodes:
+            nodes[name] = {"name": name, "displayName": display, "depth": depth, **extra}
+
+    def add_link(source, target, value):
+        # Collapsed nodes repeat key→provider pairs; keep one link (its value is recomputed anyway)
+        links.setdefault((source, target), {"source": source, "target": target, "value": value})
+
+    # Layer 0: vendors (only those with keys)
+    with_keys = {k["vendor_id"] for k in keys}
+    for v in vendors:
+        if v["id"] in with_keys:
+            add_node(f"v_{v['id']}", v["name"], 0)
+
+    # Layer 1: keys
+    key_node: Dict[int, str] = {}
+    for k in keys:
+        vid = k["vendor_id"]
+        if vid in collapsed:
+            name = f"kx_{vid}"
+            add_node(name, f"🔑 ×{key_count[vid]}", 1, aggregate={"vendor_id": vid, "kind": "keys", "count": key_count[vid]})
+        else:
+            name = f"k_{k['id']}"
+            add_node(name, "🔑 " + k["label"], 1)
+        key_node[k["id"]] = name
+        if f"v_{vid}" in nodes:
+            add_link(f"v_{vid}", name, 1)
+
+    # Layer 2: providers (must have a key node)
+    provider_node: Dict[int, str] = {}
+    for p in providers:
+        k_name = key_node.get(p["vendor_key_id"])
+        if not k_name:
+            continue
+        vid = p["vendor_id"]
+        if vid in collapsed:
+            name = f"px_{vid}"
+            add_node(name, f"端点配置 ×{prov_count[vid]}", 2, aggregate={"vendor_id": vid, "kind": "providers", "count": prov_count[vid]})
+        else:
+            name = f"p_{p['id']}"
+            add_node(name, p["name"], 2)
+        provider_node[p["id"]] = name
+        add_link(k_name, name, 1)
+
+    # Layer 3: adapters, layer 4: service endpoints (display name per node)
+    services: Dict[str, str] = OrderedDict()
+    service_adapter: Dict[str, str] = {}
+    for a in adapters:
+        add_node(f"a_{a['id']}", a["label"], 3)
+    for a in adapters:
+        for svc in a.get("services") or []:
+            services.setdefault(f"s_{a['id']}_{svc}", svc)
+            service_adapter.setdefault(f"s_{a['id']}_{svc}", a["id"])
+    for b in bindings:
+        if b["target_provider_name"] and f"a_{b['adapter_id']}" in nodes:
+            name = f"s_{b['adapter_id']}_{b['target_provider_name']}"
+            services.setdefault(name, b["target_provider_name"])
+            service_adapter.setdefault(name, b["adapter_id"])
+
+    # Adapters with more endpoints than the threshold get one summary node
+    svc_count: Dict[str, int] = {}
+    for aid in service_adapter.values():
+        svc_count[aid] = svc_count.get(aid, 0) + 1
+    collapsed_adapters = {aid for aid, n in svc_count.items()
+                          if threshold > 0 and n > threshold and aid != adapter_id}
+    service_node: Dict[str, str] = {}
+    for name, display in services.items():
+        aid = service_adapter[name]
+        if aid in collapsed_adapters:
+            service_node[name] = f"sx_{aid}"
+            add_node(f"sx_{aid}", f"服务内端点 ×{svc_count[aid]}", 4,
+                     aggregate={"adapter_id": aid, "kind": "services", "count": svc_count[aid]})
+        else:
+            service_node[name] = name
+            add_node(name, display, 4)
+
+    # provider→adapter weight = bound services through that adapter; adapter→service = bindings,
+    # unbound services count 1 (summary nodes add up what they stand for)
+    pa: Dict[tuple, int] = OrderedDict()
+    bound: Dict[tuple, int] = OrderedDict()
+    for b in bindings:
+        p_name = provider_node.get(b["provider_id"])
+        a_name = f"a_{b['adapter_id']}"
+        if not p_name or a_name not in nodes:
+            continue
+        pa.setdefault((p_name, a_name), 0)
+        s_name = f"s_{b['adapter_id']}_{b['target_provider_name']}"
+        if b["target_provider_name"] and s_name in service_node:
+            pa[(p_name, a_name)] += 1
+            bound[(a_name, s_name)] = bound.get((a_name, s_name), 0) + 1
+    as_: Dict[tuple, int] = OrderedDict()
+    for (a_name, s_name), n in bound.items():
+        key = (a_name, service_node[s_name])
+        as_[key] = as_.get(key, 0) + n
+    for s_name, aid in service_adapter.items():
+        if (f"a_{aid}", s_name) not in bound and f"a_{aid}" in nodes:
+            key = (f"a_{aid}", service_node[s_name])
+            as_[key] = as_.get(key, 0) + 1
+    for (src, dst), n in pa.items():
+        add_link(src, dst, max(n, 1))
+    for (src, dst), n in as_.items():
+        add_link(src, dst, n)
+
+    out_links = list(links.values())
+    propagate_flow(nodes, out_links)
+    return {"nodes": list(nodes.values()), "links": out_links,
+            "collapsed": sorted(collapsed), "collapsed_adapters": sorted(collapsed_adapters)}
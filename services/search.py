@@ -0,0 +1,110 @@
+"""Search + keyset pagination helpers for the list endpoints.
+
+Text search uses the FTS5 indexes created in db.init_db (vendors_fts,
+providers_fts, vendor_keys_fts), kept in sync with their tables by triggers.
+Each whitespace-separated term of `q` is matched as a prefix, all terms must
+match. When the SQLite build lacks FTS5 the same filter falls back to LIKE.
+
+Pagination is keyset-based: the cursor is an opaque token holding the sort key
+of the last row returned, so deep pages cost the same as the first one.
+"""
+import base64
+import json
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from db import FTS_TABLES
+
+MAX_LIMIT = 1000
+
+_fts_available: Optional[bool] = None
+
+
+def fts_available(db) -> bool:
+    global _fts_available
+    if _fts_available is None:
+        _fts_available = db.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name='vendors_fts'").fetchone() is not None
+    return _fts_available
+
+
+def match_expr(q: str) -> str:
+    """FTS5 query: every term as a quoted prefix match, so user input can't inject syntax."""
+    terms = [t.replace('"', '""') for t in q.split()]
+    return " AND ".join(f'"{t}"*' for t in terms)
+
+
+def text_filter(db, fts: str, alias: str, q: str) -> Tuple[str, list]:
+    """SQL condition (+ params) restricting `alias` rows to those matching q."""
+    table, columns = FTS_TABLES[fts]
+    if fts_available(db):
+        return f"{alias}.id IN (SELECT rowid FROM {fts} WHERE {fts} MATCH ?)", [match_expr(q)]
+    conds, params = [], []
+    for term in q.split():
+        like = "%" + term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        conds.append("(" + " OR ".join(f"{alias}.{c} LIKE ? ESCAPE '\\'" for c in columns) + ")")
+        params.extend([like] * len(columns))
+    return " AND ".join(conds), params
+
+
+def check_limit(limit: Optional[int]) -> Optional[int]:
+    if limit is not None and not 1 <= limit <= MAX_LIMIT:
+        raise HTTPException(400, f"limit must be between 1 and {MAX_LIMIT}")
+    return limit
+
+
+def encode_cursor(values: list) -> str:
+    return base64.urlsafe_b64encode(json.dumps(values, ensure_ascii=False).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, arity: int) -> list:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if isinstance(values, list) and len(values) == arity:
+            return values
+    except ValueError:
+        pass
+    raise HTTPException(400, "Invalid cursor")
+
+
+def page(rows: List, limit: Optional[int], sort_key) -> Tuple[List, Optional[str]]:
+    """Trim a `limit + 1` fetch to `limit` rows; returns (rows, next cursor or None)."""
+    if limit is None or len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(sort_key(rows[-1]))
+
+
+def fetch_page(db, select: str, where: List[str], params: list, *, alias: str, fts: str,
+               q: str, order: Tuple[str, ...], limit: Optional[int], cursor: Optional[str]):
+    """Run `select` filtered by q, positioned after `cursor`, ordered by `order`
+    (a unique key) and capped at limit. Returns (rows, next cursor or None)."""
+    where, params = list(where), list(params)
+    if q.strip():
+        cond, extra = text_filter(db, fts, alias, q)
+        where.append(cond)
+        params.extend(extra)
+    if cursor:
+        values = decode_cursor(cursor, len(order))
+        if len(order) == 1:
+            where.append(f"{order[0]} > ?")
+            params.append(values[0])
+        else:
+            where.append(f"({order[0]} > ? OR ({order[0]} = ? AND {order[1]} > ?))")
+            params.extend([values[0], values[0], values[1]])
+    sql = select
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY " + ", ".join(order)
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(limit + 1)
+    rows = db.execute(sql, params).fetchall()
+    return page(rows, limit, lambda r: [r[col.split(".")[-1]] for col in order])
+
+
+def page_headers(cache: dict, next_cursor: Optional[str]) -> dict:
+    if not next_cursor:
+        return cache
+    return {**cache, "X-Next-Cursor": next_cursor}
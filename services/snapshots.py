@@ -0,0 +1,178 @@
+"""Config snapshots — a content-addressed history of adapter config files.
+
+Right before an adapter overwrites one of its config files, the current file
+is captured: its SHA-256 names an object under VAULT_SNAPSHOT_DIR/objects,
+written only when that content isn't stored yet and encrypted with
+db.encrypt (configs hold API keys), and one line is appended to the
+adapter's index. Each adapter keeps its newest VAULT_SNAPSHOT_KEEP entries;
+pruning drops older index lines and every object no index references.
+VAULT_SNAPSHOTS=0 turns capturing off.
+"""
+import hashlib
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+from db import DB_PATH, decrypt, encrypt
+
+ENABLED = os.environ.get("VAULT_SNAPSHOTS", "1") != "0"
+SNAPSHOT_DIR = os.environ.get("VAULT_SNAPSHOT_DIR", os.path.join(os.path.dirname(os.path.abspath(DB_PATH)), "snapshots"))
+KEEP = int(os.environ.get("VAULT_SNAPSHOT_KEEP", "50"))
+
+
+class SnapshotUnavailable(Exception):
+    """The snapshot is indexed but its object is gone or can't be decrypted."""
+
+
+def _object_path(digest: str) -> str:
+    return os.path.join(SNAPSHOT_DIR, "objects", digest[:2], digest)
+
+
+def _index_path(adapter_id: str) -> str:
+    safe = "".join(c if c.isalnum() or c in "-_" else "_" for c in adapter_id)
+    return os.path.join(SNAPSHOT_DIR, "index", f"{safe}.jsonl")
+
+
+def _read_index(adapter_id: str) -> List[Dict[str, Any]]:
+    try:
+        with open(_index_path(adapter_id)) as f:
+            return [json.loads(line) for line in f if line.strip()]
+    except FileNotFoundError:
+        return []
+
+
+def _write_atomic(path: str, text: str):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+def _seal(data: bytes) -> str:
+    # latin-1 maps bytes 1:1, so any file content survives the str-based encrypt()
+    return encrypt(data.decode("latin-1"))
+
+
+def _unseal(token: str) -> bytes:
+    return decrypt(token).encode("latin-1")
+
+
+def capture(adapter_id: str, path: str) -> Optional[str]:
+    """Snapshot the file at path as it is now. Returns the snapshot id, or None
+    when capturing is off or there is no file yet."""
+    if not ENABLED:
+        return None
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return None
+    digest = hashlib.sha256(data).hexdigest()
+    obj = _object_path(digest)
+    # Stored content is encrypted once; unchanged files cost only the hash.
+    # Encrypting outside the lock keeps other writers from queueing behind it.
+    token = None if os.path.exists(obj) else _seal(data)
+
+    from locks import file_lock
+    path = os.path.abspath(path)
+    with file_lock("snapshots"):  # a concurrent _prune must not drop the object before it is indexed
+        if not os.path.exists(obj):
+            _write_atomic(obj, token if token is not None else _seal(data))
+        entries = _read_index(adapter_id)
+        last = next((e for e in reversed(entries) if e["path"] == path), None)
+        if last and last["hash"] == digest:
+            return last["id"]  # unchanged since the previous snapshot of this file
+        entry = {
+            "id": f"{time.time_ns()}-{digest[:12]}",
+            "path": path,
+            "hash": digest,
+            "size": len(data),
+            "created_at": time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime()),
+        }
+        index = _index_path(adapter_id)
+        os.makedirs(os.path.dirname(index), exist_ok=True)
+        with open(index, "a") as f:
+            f.write(json.dumps(entry) + "\n")
+        if len(entries) + 1 > KEEP * 5 // 4:  # prune in batches, not on every write
+            _prune(adapter_id, entries + [entry])
+    return entry["id"]
+
+
+def _prune(adapter_id: str, entries: List[Dict[str, Any]]):
+    """Keep the newest KEEP entries, then drop unreferenced objects. Caller holds the lock."""
+    kept = entries[-KEEP:]
+    _write_atomic(_index_path(adapter_id), "".join(json.dumps(e) + "\n" for e in kept))
+    referenced = set()
+    index_dir = os.path.join(SNAPSHOT_DIR, "index")
+    for name in os.listdir(index_dir):
+        if name.endswith(".jsonl"):
+            referenced.update(e["hash"] for e in _read_index(name[:-len(".jsonl")]))
+    objects = os.path.join(SNAPSHOT_DIR, "objects")
+    for sub in os.listdir(objects):
+        for digest in os.listdir(os.path.join(objects, sub)):
+            if digest not in referenced and not digest.endswith(".tmp"):
+                os.remove(os.path.join(objects, sub, digest))
+
+
+def history(adapter_id: str) -> List[Dict[str, Any]]:
+    """Snapshots of an adapter's config files, newest first."""
+    return list(reversed(_read_index(adapter_id)))
+
+
+def restore(adapter, config_path: str, snapshot_id: str) -> Optional[Dict[str, Any]]:
+    """Atomically put a snapshot back in place (the current file is snapshotted
+    first, so a restore can itself be undone). None if the snapshot is unknown;
+    raises SnapshotUnavailable if its content can't be read back."""
+    entry = next((e for e in _read_index(adapter.id) if e["id"] == snapshot_id), None)
+    if entry is None:
+        return None
+    try:
+        with open(_object_path(entry["hash"])) as f:
+            data = _unseal(f.read())
+    except FileNotFoundError:
+        raise SnapshotUnavailable("Snapshot content is missing")
+    except Exception as e:  # InvalidToken: no master key opens it
+        raise SnapshotUnavailable(f"Snapshot content can't be decrypted ({type(e).__name__})")
+    with adapter.config_lock(config_path):
+        adapter.write_bytes(entry["path"], data)
+    return entry
+
+
+def rekey(rotate) -> int:
+    """Re-encrypt every stored object with rotate(token) (services.rekey). Returns the count."""
+    from locks import file_lock
+    objects = os.path.join(SNAPSHOT_DIR, "objects")
+    if not os.path.isdir(objects):
+        return 0
+    count = 0
+    with file_lock("snapshots"):  # keeps pruning from racing the rewrites
+        for sub in os.listdir(objects):
+            for digest in os.listdir(os.path.join(objects, sub)):
+                if digest.endswith(".tmp"):
+                    continue
+                path = os.path.join(objects, sub, digest)
+                with open(path) as f:
+                    token = f.read()
+                _write_atomic(path, rotate(token))
+                count += 1
+    return count
+
+
+def count_tokens(match) -> int:
+    """Number of stored objects whose encrypted token satisfies match(token)."""
+    objects = os.path.join(SNAPSHOT_DIR, "objects")
+    if not os.path.isdir(objects):
+        return 0
+    count = 0
+    for sub in os.listdir(objects):
+        for digest in os.listdir(os.path.join(objects, sub)):
+            if digest.endswith(".tmp"):
+                continue
+            try:
+                with open(os.path.join(objects, sub, digest)) as f:
+                    count += bool(match(f.read()))
+            except FileNotFoundError:  # pruned meanwhile
+                pass
+    return count
@@ -0,0 +1,101 @@
+"""Static asset pipeline — content-hashed names, precompressed bodies, long caching.
+
+At startup every file under static/ is hashed and text assets are compressed
+once (gzip, plus brotli when the `brotli` package is installed). Assets are then
+reachable as /static/<name>.<hash>.<ext> with immutable cache headers, and
+index.html is rewritten to reference the hashed names. Unhashed paths keep
+working through the regular StaticFiles behaviour.
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+from typing import Dict, Optional
+
+from fastapi import Request
+from fastapi.responses import Response
+from fastapi.staticfiles import StaticFiles
+
+try:
+    import brotli
+except ImportError:  # optional
+    brotli = None
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "static")
+IMMUTABLE = "public, max-age=31536000, immutable"
+_COMPRESSIBLE = {".js", ".css", ".html", ".svg", ".json", ".txt", ".map"}
+_REF_RE = re.compile(r'((?:src|href)=")/static/([^"?#]+)(?:\?[^"#]*)?(")')
+
+
+class _Asset:
+    __slots__ = ("body", "gzip", "br", "media_type", "etag")
+
+    def __init__(self, body: bytes, ext: str, digest: str):
+        self.body = body
+        self.media_type = mimetypes.guess_type("x" + ext)[0] or "application/octet-stream"
+        self.etag = f'"{digest}"'
+        self.gzip = self.br = None
+        if ext in _COMPRESSIBLE:
+            self.gzip = gzip.compress(body, compresslevel=9, mtime=0)
+            if brotli is not None:
+                self.br = brotli.compress(body, quality=11)
+
+    def response(self, request: Request, cache_control: str) -> Response:
+        headers = {"Cache-Control": cache_control, "ETag": self.etag, "Vary": "Accept-Encoding"}
+        if self.etag in request.headers.get("if-none-match", ""):
+            return Response(status_code=304, headers=headers)
+        accept = request.headers.get("accept-encoding", "")
+        body = self.body
+        if self.br is not None and "br" in accept:
+            body, headers["Content-Encoding"] = self.br, "br"
+        elif self.gzip is not None and "gzip" in accept:
+            body, headers["Content-Encoding"] = self.gzip, "gzip"
+        return Response(body, media_type=self.media_type, headers=headers)
+
+
+_hashed: Dict[str, _Asset] = {}     # "app.1a2b3c4d5e.js" -> asset
+_names: Dict[str, str] = {}         # "app.js" -> "app.1a2b3c4d5e.js"
+_index: Optional[_Asset] = None
+
+
+def build(static_dir: str = STATIC_DIR):
+    """Hash and precompress every asset, then render index.html against the hashed names."""
+    global _index
+    _hashed.clear()
+    _names.clear()
+    for root, _, files in os.walk(static_dir):
+        for fname in files:
+            path = os.path.join(root, fname)
+            rel = os.path.relpath(path, static_dir).replace(os.sep, "/")
+            if rel == "index.html":
+                continue
+            with open(path, "rb") as f:
+                body = f.read()
+            digest = hashlib.sha256(body).hexdigest()[:10]
+            stem, ext = os.path.splitext(rel)
+            hashed = f"{stem}.{digest}{ext}"
+            _hashed[hashed] = _Asset(body, ext.lower(), digest)
+            _names[rel] = hashed
+    with open(os.path.join(static_dir, "index.html"), "r", encoding="utf-8") as f:
+        html = f.read()
+    html = _REF_RE.sub(lambda m: f"{m.group(1)}/static/{_names.get(m.group(2), m.group(2))}{m.group(3)}", html)
+    body = html.encode("utf-8")
+    _index = _Asset(body, ".html", hashlib.sha256(body).hexdigest()[:10])
+
+
+def index_response(request: Request) -> Response:
+    """index.html itself is revalidated on every load (it names the hashed assets)."""
+    if _index is None:
+        build()
+    return _index.response(request, "no-cache")
+
+
+class AssetFiles(StaticFiles):
+    """StaticFiles that serves hashed names from the precompressed in-memory cache."""
+
+    async def get_response(self, path: str, scope):
+        asset = _hashed.get(path)
+        if asset is not None:
+            return asset.response(Request(scope), IMMUTABLE)
+        return await super().get_response(path, scope)
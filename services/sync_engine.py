@@ -1,7 +1,7 @@
 """Sync engine — core sync/push/import business logic, decoupled from routes."""
 import json
 from urllib.parse import urlparse
-from db import get_db_ctx, encrypt
+from db import get_db_ctx, encrypt, bump_data_version
 from adapters import get_adapter, all_adapters
 from utils import resolve_api_key
 
@@ -19,7 +19,7 @@ def _parse_extra(raw) -> dict:
 
 def do_apply(adapter, config_path: str, base_url: str, api_key: str, target_name: str, extra_fields: dict = None) -> bool:
     """Apply config to an adapter, return ok bool."""
-    return adapter.apply(config_path, base_url, api_key, provider_name=target_name, extra_fields=extra_fields or {})
+    return adapter.apply_locked(config_path, base_url, api_key, provider_name=target_name, extra_fields=extra_fields or {})
 
 
 def sync_provider_to_bindings(provider_id: int) -> list:
@@ -85,13 +85,9 @@ def do_push(adapter_id: str, provider_id: int, target_provider_name: str = "") -
 
         # Orphan detection: warn if target endpoint doesn't exist in service config
         warning = ""
-        current = adapter.read_current(config_path)
-        if current:
-            live_names = set()
-            if "providers" in current:
-                live_names = {p.get("provider_name", "") for p in current["providers"] if p.get("provider_name")}
-            if pname and live_names and pname not in live_names:
-                warning = f"服务内端点 '{pname}' 在 {adapter_id} 的配置文件中不存在，推送可能无效"
+        live_names = set(adapter.list_endpoints(config_path).names)
+        if pname and live_names and pname not in live_names:
+            warning = f"服务内端点 '{pname}' 在 {adapter_id} 的配置文件中不存在，推送可能无效"
 
         ok = do_apply(adapter, config_path, row["base_url"], api_key, pname, extra)
         if not ok:
@@ -107,6 +103,7 @@ def do_push(adapter_id: str, provider_id: int, target_provider_name: str = "") -
             "INSERT OR IGNORE INTO bindings (provider_id, adapter_id, target_provider_name, auto_sync) VALUES (?,?,?,1)",
             (provider_id, adapter_id, pname),
         )
+        bump_data_version(db)
         db.commit()
     result = {"ok": True, "adapter": adapter_id, "provider": row["name"], "target_provider_name": pname}
     if warning:
@@ -201,6 +198,8 @@ def do_import(adapter_id: str) -> dict:
                 imported.append({"id": pid, "name": provider_name, "vendor_id": vid, "bound_to": pname})
             except Exception:
                 pass
+        bump_data_version(db)
+        db.commit()
     if not imported:
         return {"error": "No new providers imported (may already exist)"}
     return {"imported": imported}
@@ -0,0 +1,155 @@
+"""Topology data for the Sankey view — full snapshots and incremental deltas.
+
+Triggers on vendors, vendor_keys, providers, adapters and bindings append to
+`topology_changes` (see db.init_db) under the data version the write will be
+published as, so a client that has seen version N only needs the entities
+touched after N. When the client is older than the retained log
+(`topology_floor` in meta) or too many entities changed, it gets a full snapshot.
+The log is trimmed by a background thread, so reading deltas never writes.
+"""
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Set
+
+log = logging.getLogger(__name__)
+
+LOG_KEEP = int(os.environ.get("VAULT_TOPOLOGY_LOG_KEEP", "20000"))
+MAX_DELTA = int(os.environ.get("VAULT_TOPOLOGY_MAX_DELTA", "1000"))
+PRUNE_INTERVAL = float(os.environ.get("VAULT_TOPOLOGY_PRUNE_INTERVAL", "60"))
+
+ENTITIES = ("vendors", "keys", "providers", "adapters", "bindings")
+
+_SELECT = {
+    "vendors": ("SELECT id, name, domain, icon FROM vendors", "id", " ORDER BY name"),
+    "keys": ("SELECT id, vendor_id, label FROM vendor_keys", "id", " ORDER BY id"),
+    "providers": ("""SELECT p.id, p.vendor_id, p.vendor_key_id, p.name, p.base_url, h.status as health
+                     FROM providers p LEFT JOIN provider_health h ON h.provider_id=p.id""", "p.id", " ORDER BY p.name"),
+    "adapters": ("SELECT * FROM adapters", "id", ""),
+    "bindings": ("""SELECT b.id, b.provider_id, b.adapter_id, b.target_provider_name, b.auto_sync,
+                           p.name as provider_name, p.vendor_id
+                    FROM bindings b LEFT JOIN providers p ON b.provider_id=p.id""", "b.id", ""),
+}
+
+
+def load_rows(db, entity: str, ids: Optional[list] = None) -> list:
+    """Rows of one entity, all of them or only `ids`."""
+    sql, id_col, order = _SELECT[entity]
+    if ids is None:
+        return db.execute(sql + order).fetchall()
+    rows = []
+    for i in range(0, len(ids), 500):
+        chunk = ids[i:i + 500]
+        rows.extend(db.execute(f"{sql} WHERE {id_col} IN ({','.join('?' * len(chunk))}){order}", chunk).fetchall())
+    return rows
+
+
+def snapshot_rows(db) -> Dict[str, list]:
+    return {entity: load_rows(db, entity) for entity in ENTITIES}
+
+
+# ── Output shapes (shared by /topology and /topology/changes) ──
+
+def vendor_out(r) -> dict:
+    return {"id": r["id"], "name": r["name"], "domain": r["domain"], "icon": r["icon"] or ""}
+
+
+def key_out(r) -> dict:
+    return {"id": r["id"], "vendor_id": r["vendor_id"], "label": r["label"]}
+
+
+def provider_out(r) -> dict:
+    return {"id": r["id"], "vendor_id": r["vendor_id"], "vendor_key_id": r["vendor_key_id"], "name": r["name"],
+            "health": r["health"] or ""}
+
+
+def adapter_out(aid: str, adapter, db_info: dict, services: List[str]) -> dict:
+    return {
+        "id": aid,
+        "label": adapter.label,
+        "icon": db_info.get("icon", ""),
+        "enabled": bool(db_info.get("enabled", 1)),
+        "services": services,
+    }
+
+
+def binding_out(r, live: Optional[Set[str]]) -> dict:
+    """live: endpoint names in the adapter's config, None when it wasn't read (disabled)."""
+    return {
+        "id": r["id"], "provider_id": r["provider_id"], "adapter_id": r["adapter_id"],
+        "target_provider_name": r["target_provider_name"], "auto_sync": bool(r["auto_sync"]),
+        "provider_name": r["provider_name"] or "", "vendor_id": r["vendor_id"],
+        "orphaned": bool(live is not None and r["target_provider_name"] and r["target_provider_name"] not in live),
+    }
+
+
+def apply_delta(topo: dict, upsert: Dict[str, list], remove: Dict[str, list]) -> dict:
+    """A copy of a full topology with a /topology/changes delta merged in (topo is
+    not modified). Changed items are replaced in place, new ones appended, and
+    lists are re-sorted the way load_rows orders them."""
+    out = dict(topo)
+    for entity in ENTITIES:
+        changed = {item["id"]: item for item in upsert.get(entity, ())}
+        gone = set(remove.get(entity, ()))
+        if not changed and not gone:
+            continue
+        items = [changed.pop(item["id"], item) for item in topo[entity] if item["id"] not in gone]
+        items.extend(changed.values())
+        if entity in _ORDER:
+            items.sort(key=_ORDER[entity])
+        out[entity] = items
+    return out
+
+
+_ORDER = {
+    "vendors": lambda v: v["name"],
+    "keys": lambda k: k["id"],
+    "providers": lambda p: p["name"],
+    "bindings": lambda b: b["id"],
+}
+
+
+# ── Change log ──
+
+def changed_since(db, since: int) -> Optional[Dict[str, list]]:
+    """entity -> ids changed after `since`, or None when a full snapshot is needed."""
+    floor = db.execute("SELECT value FROM meta WHERE key='topology_floor'").fetchone()
+    if since < 0 or (floor and since < int(floor[0])):
+        return None
+    rows = db.execute(
+        "SELECT DISTINCT entity, entity_id FROM topology_changes WHERE version > ? LIMIT ?",
+        (since, MAX_DELTA + 1),
+    ).fetchall()
+    if len(rows) > MAX_DELTA:
+        return None
+    changed: Dict[str, list] = {entity: [] for entity in ENTITIES}
+    for entity, entity_id in rows:
+        changed[entity].append(entity_id if entity == "adapters" else int(entity_id))
+    return changed
+
+
+def prune(db):
+    """Keep the newest LOG_KEEP log rows; raise the floor past what was dropped."""
+    lo, hi = db.execute("SELECT MIN(id), MAX(id) FROM topology_changes").fetchone()
+    if hi is None or hi - lo < LOG_KEEP * 5 // 4:  # prune in batches, not on every call
+        return
+    cutoff = hi - LOG_KEEP
+    dropped = db.execute("SELECT MAX(version) FROM topology_changes WHERE id <= ?", (cutoff,)).fetchone()[0]
+    db.execute("DELETE FROM topology_changes WHERE id <= ?", (cutoff,))
+    db.execute("UPDATE meta SET value=MAX(CAST(value AS INTEGER), ?) WHERE key='topology_floor'", (dropped,))
+    db.commit()
+
+
+def start_background_prune():
+    def loop():
+        from db import get_db_ctx
+        while True:
+            time.sleep(PRUNE_INTERVAL)
+            try:
+                with get_db_ctx() as db:
+                    prune(db)
+            except Exception:
+                log.exception("topology change log prune failed")
+
+    threading.Thread(target=loop, name="topology-prune", daemon=True).start()
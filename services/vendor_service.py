@@ -1,7 +1,8 @@
 """Vendor service — aggregation queries for vendor data."""
 import json
 from db import decrypt
-from models import VendorOut, VendorKeyNested, ProviderNested
+from models import VendorOut
+from services.key_usage import live_values
 from utils import mask_key
 
 
@@ -16,30 +17,55 @@ def _parse_extra(raw) -> dict:
         return {}
 
 
-def build_vendor_out(db, v) -> VendorOut:
-    """Build a full VendorOut with nested keys and providers."""
-    keys = db.execute(
-        "SELECT * FROM vendor_keys WHERE vendor_id=? ORDER BY id", (v["id"],)
-    ).fetchall()
-    providers = db.execute(
+def build_vendor_dicts(db, vendors) -> list:
+    """Plain-dict VendorOut payloads for many vendors with two batched queries
+    (keys and providers for all vendors at once) instead of two per vendor."""
+    if not vendors:
+        return []
+    ids = [v["id"] for v in vendors]
+    # Large listings (usually "all vendors") scan everything rather than bind
+    # thousands of IN (...) parameters; rows for other vendors are skipped.
+    if len(ids) <= 500:
+        in_ids, params = f" IN ({','.join('?' * len(ids))})", ids
+    else:
+        in_ids, params = " IS NOT NULL", []
+    keys_by_vendor: dict = {vid: [] for vid in ids}
+    for k in db.execute(
+        f"SELECT * FROM vendor_keys WHERE vendor_id{in_ids} ORDER BY id", params
+    ).fetchall():
+        if k["vendor_id"] not in keys_by_vendor:
+            continue
+        live = live_values(k)
+        keys_by_vendor[k["vendor_id"]].append({
+            "id": k["id"], "label": k["label"],
+            "api_key_masked": mask_key(decrypt(k["api_key_enc"])),
+            "balance": live["balance"], "quota": k["quota"], "spent": live["spent"],
+            "status": k["status"], "fallback_key_id": k["fallback_key_id"],
+            "notes": k["notes"] or "",
+        })
+    providers_by_vendor: dict = {vid: [] for vid in ids}
+    for p in db.execute(
         "SELECT p.*, vk.label as key_label FROM providers p "
         "LEFT JOIN vendor_keys vk ON p.vendor_key_id=vk.id "
-        "WHERE p.vendor_id=? ORDER BY p.name", (v["id"],)
-    ).fetchall()
-    return VendorOut(
-        id=v["id"], name=v["name"], domain=v["domain"],
-        icon=v["icon"] or "", notes=v["notes"] or "",
-        keys=[VendorKeyNested(
-            id=k["id"], label=k["label"],
-            api_key_masked=mask_key(decrypt(k["api_key_enc"])),
-            balance=k["balance"], quota=k["quota"], status=k["status"],
-            notes=k["notes"] or "",
-        ) for k in keys],
-        providers=[ProviderNested(
-            id=p["id"], name=p["name"], base_url=p["base_url"],
-            vendor_key_id=p["vendor_key_id"],
-            vendor_key_label=p["key_label"] or "",
-            extra_config=_parse_extra(p["extra_config"]),
-            notes=p["notes"] or "",
-        ) for p in providers],
-    )
+        f"WHERE p.vendor_id{in_ids} ORDER BY p.name", params
+    ).fetchall():
+        if p["vendor_id"] not in providers_by_vendor:
+            continue
+        providers_by_vendor[p["vendor_id"]].append({
+            "id": p["id"], "name": p["name"], "base_url": p["base_url"],
+            "vendor_key_id": p["vendor_key_id"],
+            "vendor_key_label": p["key_label"] or "",
+            "extra_config": _parse_extra(p["extra_config"]),
+            "notes": p["notes"] or "",
+        })
+    return [{
+        "id": v["id"], "name": v["name"], "domain": v["domain"],
+        "icon": v["icon"] or "", "notes": v["notes"] or "",
+        "keys": keys_by_vendor[v["id"]],
+        "providers": providers_by_vendor[v["id"]],
+    } for v in vendors]
+
+
+def build_vendor_out(db, v) -> VendorOut:
+    """Build a full VendorOut with nested keys and providers."""
+    return VendorOut(**build_vendor_dicts(db, [v])[0])
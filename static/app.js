@@ -23,6 +23,16 @@ async function api(path, opts) {
   return res.json();
 }
 
+// GET a paginated list endpoint: the items plus the cursor for the next page (or null)
+async function apiPage(path) {
+  var res = await fetch(API + path);
+  if (!res.ok) {
+    var err = await res.json().catch(function() { return {}; });
+    throw new Error(err.detail || res.statusText);
+  }
+  return { items: await res.json(), next: res.headers.get('X-Next-Cursor') };
+}
+
 async function uploadIcon(fileInput) {
   var file = fileInput.files[0];
   if (!file) return null;
@@ -34,7 +44,8 @@ async function uploadIcon(fileInput) {
     throw new Error(err.detail || 'Upload failed');
   }
   var data = await res.json();
-  return data.url;
+  // Icons render small: use the pre-sized thumbnail when the server made one
+  return (data.thumbnails && data.thumbnails['128']) || data.url;
 }
 
 var SVG_EYE = '<svg width="14" height="14" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="1.8" stroke-linecap="round" stroke-linejoin="round"><path d="M1 12s4-8 11-8 11 8 11 8-4 8-11 8-11-8-11-8z"/><circle cx="12" cy="12" r="3"/></svg>';
@@ -142,6 +153,13 @@ document.addEventListener('click', function(e) {
 });
 
 async function loadBindings() { bindings = await api('/api/sync/bindings'); }
+
+// `vendors` only holds the page (or search results) on screen; lookups that
+// must see every vendor go to the server
+async function loadProviderLookup() { allProviders = await api('/api/providers'); }
+async function getVendor(id) {
+  return vendors.find(function(x) { return x.id === id; }) || await api('/api/vendors/' + id);
+}
 function getBindingsForProvider(pid) { return bindings.filter(function(b) { return b.provider_id === pid; }); }
 function getBindingsForAdapter(aid) { return bindings.filter(function(b) { return b.adapter_id === aid; }); }
 
@@ -163,8 +181,8 @@ function renderBindingTagsForAdapter(list) {
     var sync = b.auto_sync ? '<span class="binding-sync">⟳</span>' : '<span class="binding-nosync">○</span>';
     var target = b.target_provider_name || '(default)';
     var source = b.provider_name || ('Provider #' + b.provider_id);
-    var vendorName = '';
-    vendors.forEach(function(v) { v.providers.forEach(function(p) { if (p.name === source) vendorName = v.name; }); });
+    var provider = allProviders.find(function(p) { return p.id === b.provider_id; });
+    var vendorName = provider ? provider.vendor_name : '';
     var sourceLabel = vendorName ? vendorName + ' / ' + source : source;
     return '<span class="binding-tag">' + sync + ' ' + esc(sourceLabel) + ' → ' + esc(target) +
       ' <span class="unbind" onclick="unbind(' + b.id + ')">×</span></span>';
@@ -254,7 +272,7 @@ function renderKeyGroup(k, providers, vid) {
         '<div class="dropdown">' +
           '<button class="dropdown-trigger" onclick="toggleDropdown(this)">⋮</button>' +
           '<div class="dropdown-menu">' +
-            '<button class="dropdown-item" onclick="editKey(' + k.id + ')">编辑</button>' +
+            '<button class="dropdown-item" onclick="editKey(' + k.id + ',' + vid + ')">编辑</button>' +
             '<button class="dropdown-item dropdown-item-danger" onclick="delKey(' + k.id + ')">删除</button>' +
           '</div>' +
         '</div>' +
@@ -266,13 +284,33 @@ function renderKeyGroup(k, providers, vid) {
 
 // ── Vendors ──
 
-async function loadVendors() {
-  vendors = await api('/api/vendors');
+var VENDOR_PAGE = 100;
+var _vendorQuery = '', _vendorCursor = null, _vendorSearchTimer = null;
+
+function onVendorSearch(input) {
+  clearTimeout(_vendorSearchTimer);
+  _vendorSearchTimer = setTimeout(function() {
+    _vendorQuery = input.value.trim();
+    loadVendors();
+  }, 250);
+}
+
+// Search and pagination happen server-side; `more` appends the next page
+async function loadVendors(more) {
+  var path = '/api/vendors?limit=' + VENDOR_PAGE;
+  if (_vendorQuery) path += '&q=' + encodeURIComponent(_vendorQuery);
+  if (more && _vendorCursor) path += '&cursor=' + encodeURIComponent(_vendorCursor);
+  var page = await apiPage(path);
+  vendors = more ? vendors.concat(page.items) : page.items;
+  _vendorCursor = page.next;
   await loadBindings();
   var el = document.getElementById('vendor-list');
-  document.getElementById('vendor-count').textContent = '共 ' + vendors.length + ' 个服务商';
+  document.getElementById('vendor-count').textContent =
+    (_vendorCursor ? '已显示 ' : '共 ') + vendors.length + ' 个服务商' + (_vendorQuery ? '（搜索: ' + _vendorQuery + '）' : '');
   if (!vendors.length) {
-    el.innerHTML = '<div class="empty">还没有添加任何服务商<br><br>可以去「服务适配」页面从现有服务导入</div>';
+    el.innerHTML = _vendorQuery
+      ? '<div class="empty">没有匹配的服务商</div>'
+      : '<div class="empty">还没有添加任何服务商<br><br>可以去「服务适配」页面从现有服务导入</div>';
     return;
   }
   el.innerHTML = vendors.map(function(v) {
@@ -324,9 +362,8 @@ async function loadVendors() {
       '</div>' +
       '<div class="vendor-body">' + bodyContent + '</div>' +
     '</div>';
-  }).join('');
-  allProviders = [];
-  vendors.forEach(function(v) { v.providers.forEach(function(p) { allProviders.push(p); }); });
+  }).join('') +
+  (_vendorCursor ? '<div style="text-align:center;margin:16px 0;"><button class="btn" onclick="loadVendors(true)">加载更多</button></div>' : '');
 }
 
 // ── Vendor CRUD ──
@@ -342,8 +379,8 @@ function showAddVendor() {
   document.getElementById('modal-vendor').classList.remove('hidden');
 }
 
-function editVendor(id) {
-  var v = vendors.find(function(x) { return x.id === id; });
+async function editVendor(id) {
+  var v = await getVendor(id).catch(function() { return null; });
   if (!v) return;
   document.getElementById('modal-vendor-title').textContent = '编辑服务商';
   document.getElementById('edit-vendor-id').value = id;
@@ -400,9 +437,9 @@ function showAddKey(vendorId) {
   document.getElementById('modal-key').classList.remove('hidden');
 }
 
-function editKey(kid) {
-  var key = null;
-  vendors.forEach(function(v) { v.keys.forEach(function(k) { if (k.id === kid) key = k; }); });
+async function editKey(kid, vendorId) {
+  var v = await getVendor(vendorId).catch(function() { return null; });
+  var key = v ? v.keys.find(function(k) { return k.id === kid; }) : null;
   if (!key) return;
   document.getElementById('modal-key-title').textContent = '编辑 Key';
   document.getElementById('edit-key-id').value = kid;
@@ -449,7 +486,7 @@ async function delKey(kid) {
 
 // ── Provider CRUD ──
 
-function showAddProvider(vendorId) {
+async function showAddProvider(vendorId) {
   document.getElementById('modal-provider-title').textContent = '添加配置';
   document.getElementById('edit-provider-id').value = '';
   document.getElementById('f-p-vendor-id').value = vendorId;
@@ -457,7 +494,7 @@ function showAddProvider(vendorId) {
   document.getElementById('f-p-url').value = '';
   document.getElementById('f-p-notes').value = '';
   // Populate key selector
-  var v = vendors.find(function(x) { return x.id === vendorId; });
+  var v = await getVendor(vendorId).catch(function() { return null; });
   var sel = document.getElementById('f-p-key');
   sel.innerHTML = '<option value="">请选择 Key</option>';
   if (v) v.keys.forEach(function(k) {
@@ -466,14 +503,14 @@ function showAddProvider(vendorId) {
   document.getElementById('modal-provider').classList.remove('hidden');
 }
 
-function showAddProviderForKey(vendorId, keyId) {
-  showAddProvider(vendorId);
+async function showAddProviderForKey(vendorId, keyId) {
+  await showAddProvider(vendorId);
   document.getElementById('f-p-key').value = String(keyId);
 }
 
-function editProvider(id, vendorId) {
-  var p = null, v = null;
-  vendors.forEach(function(vv) { vv.providers.forEach(function(pp) { if (pp.id === id) { p = pp; v = vv; } }); });
+async function editProvider(id, vendorId) {
+  var v = await getVendor(vendorId).catch(function() { return null; });
+  var p = v ? v.providers.find(function(pp) { return pp.id === id; }) : null;
   if (!p) return;
   document.getElementById('modal-provider-title').textContent = '编辑配置';
   document.getElementById('edit-provider-id').value = id;
@@ -529,7 +566,7 @@ async function delProvider(id) {
 
 async function loadAdapters() {
   adapters = await api('/api/sync/adapters');
-  await loadBindings();
+  await Promise.all([loadBindings(), loadProviderLookup()]);
   var el = document.getElementById('adapter-list');
   if (!adapters.length) {
     el.innerHTML = '<div class="empty">没有注册的服务适配器</div>';
@@ -660,14 +697,12 @@ async function doPush() {
   loadVendors();
 }
 
-function showBind(providerId) {
+async function showBind(providerId) {
+  try { await loadProviderLookup(); } catch (e) { toast(e.message, false); return; }
   var provSel = document.getElementById('f-bind-provider');
-  provSel.innerHTML = '';
-  vendors.forEach(function(v) {
-    v.providers.forEach(function(p) {
-      provSel.innerHTML += '<option value="' + p.id + '"' + (p.id === providerId ? ' selected' : '') + '>' + esc(v.name + ' / ' + p.name) + '</option>';
-    });
-  });
+  provSel.innerHTML = allProviders.map(function(p) {
+    return '<option value="' + p.id + '"' + (p.id === providerId ? ' selected' : '') + '>' + esc(p.vendor_name + ' / ' + p.name) + '</option>';
+  }).join('');
   var adaSel = document.getElementById('f-bind-adapter');
   adaSel.innerHTML = adapters.map(function(a) {
     return '<option value="' + a.id + '">' + esc(a.label) + '</option>';
@@ -711,6 +746,24 @@ function loadHome() {
   loadDistChart();
   loadTopology();
   loadLogs();
+  startLiveStats();
+}
+
+// ── Live counters (SSE) ──
+
+var liveSource = null;
+
+function startLiveStats() {
+  if (liveSource || !window.EventSource) return;
+  liveSource = new EventSource(API + '/api/stats/live');
+  liveSource.onmessage = function(ev) {
+    var s = JSON.parse(ev.data);
+    var t = s.total;
+    document.getElementById('live-stats').textContent =
+      '实时 (近 ' + s.window_seconds + ' 秒): ' + t.requests + ' 请求 · ' +
+      fmtTokens(t.input_tokens + t.output_tokens) + ' Tokens · $' + t.cost.toFixed(4) +
+      ' · 错误率 ' + (t.error_rate * 100).toFixed(1) + '%';
+  };
 }
 
 // ── Dashboard filter state ──
@@ -732,7 +785,10 @@ function setDashboardFilter(filter) {
   loadLogs();
 }
 
-function resetDashboardFilter() { setDashboardFilter({}); }
+function resetDashboardFilter() {
+  if (_topoAdapter) { _topoAdapter = ''; loadTopology(); }
+  setDashboardFilter({});
+}
 
 // ── Overview stats cards ──
 
@@ -903,54 +959,6 @@ function buildAdj(nodes, links) {
   return { fwd: fwd, rev: rev };
 }
 
-// Compute leaf-count weight bottom-up
-// ── Flow-balanced link value propagation ──
-// 1. Balance adapter nodes: scale provider→adapter input links so input = output
-// 2. Propagate upward to key→provider and vendor→key layers
-function propagateFlow(links) {
-  // Step 0: Balance adapter nodes — ensure input flow = output flow
-  var adapterOutFlow = {};
-  var adapterInFlow = {};
-  var adapterInLinks = {};
-  links.forEach(function(l, i) {
-    if (l.source.indexOf('a_') === 0) {
-      adapterOutFlow[l.source] = (adapterOutFlow[l.source] || 0) + l.value;
-    }
-    if (l.target.indexOf('a_') === 0) {
-      adapterInFlow[l.target] = (adapterInFlow[l.target] || 0) + l.value;
-      if (!adapterInLinks[l.target]) adapterInLinks[l.target] = [];
-      adapterInLinks[l.target].push(i);
-    }
-  });
-  Object.keys(adapterOutFlow).forEach(function(aKey) {
-    var outTotal = adapterOutFlow[aKey] || 0;
-    var inTotal = adapterInFlow[aKey] || 0;
-    if (inTotal > 0 && outTotal > inTotal) {
-      var scale = outTotal / inTotal;
-      (adapterInLinks[aKey] || []).forEach(function(idx) {
-        links[idx].value = links[idx].value * scale;
-      });
-    }
-  });
-
-  // Pass 1: key→provider links inherit provider's total outgoing flow
-  var providerOut = {};
-  links.forEach(function(l) {
-    if (l.source.indexOf('p_') === 0) providerOut[l.source] = (providerOut[l.source] || 0) + l.value;
-  });
-  links.forEach(function(l) {
-    if (l.target.indexOf('p_') === 0) l.value = providerOut[l.target] || 1;
-  });
-  // Pass 2: vendor→key links inherit key's total outgoing flow
-  var keyOut = {};
-  links.forEach(function(l) {
-    if (l.source.indexOf('k_') === 0) keyOut[l.source] = (keyOut[l.source] || 0) + l.value;
-  });
-  links.forEach(function(l) {
-    if (l.target.indexOf('k_') === 0) l.value = keyOut[l.target] || 1;
-  });
-}
-
 // Trace full path from a node (both directions)
 function traceFullPath(nodeName, nodes, links) {
   var adj = buildAdj(nodes, links);
@@ -974,126 +982,72 @@ function traceFullPath(nodeName, nodes, links) {
   return { nodes: pathNodes, links: pathLinks };
 }
 
-async function loadTopology() {
-  try {
-    var data = await api('/api/sync/topology');
-    var nodes = [], links = [], nodeSet = {};
-
-    // Layer 0: Vendors (only show vendors that have keys)
-    var vendorHasKey = {};
-    (data.keys || []).forEach(function(k) { vendorHasKey[k.vendor_id] = true; });
-    data.vendors.forEach(function(v) {
-      if (!vendorHasKey[v.id]) return; // skip vendors without keys
-      var key = 'v_' + v.id;
-      nodes.push({ name: key, displayName: v.name, depth: 0 });
-      nodeSet[key] = true;
-    });
-    // Layer 1: Keys
-    (data.keys || []).forEach(function(k) {
-      var key = 'k_' + k.id;
-      nodes.push({ name: key, displayName: '🔑 ' + k.label, depth: 1 });
-      nodeSet[key] = true;
-      var vKey = 'v_' + k.vendor_id;
-      if (nodeSet[vKey]) links.push({ source: vKey, target: key, value: 1 });
-    });
-    // Layer 2: Providers (must have key)
-    data.providers.forEach(function(p) {
-      var key = 'p_' + p.id;
-      if (!p.vendor_key_id) return; // skip providers without key
-      var kKey = 'k_' + p.vendor_key_id;
-      if (!nodeSet[kKey]) return; // skip if key node missing
-      nodes.push({ name: key, displayName: p.name, depth: 2 });
-      nodeSet[key] = true;
-      links.push({ source: kKey, target: key, value: 1 });
-    });
-    // Layer 3: Adapters
-    data.adapters.forEach(function(a) {
-      var key = 'a_' + a.id;
-      nodes.push({ name: key, displayName: a.label, depth: 3 });
-      nodeSet[key] = true;
-    });
-
-    // Layer 4: Services — strict 5-layer topology
-    // All links must flow: vendor→key→provider→adapter→service (no skipping)
-    var serviceNodes = {};
-
-    // Create service nodes from adapter.services and bindings
-    data.adapters.forEach(function(a) {
-      (a.services || []).forEach(function(svc) {
-        var key = 's_' + a.id + '_' + svc;
-        if (!serviceNodes[key]) {
-          serviceNodes[key] = a.id;
-          nodes.push({ name: key, displayName: svc, depth: 4 });
-          nodeSet[key] = true;
-        }
-      });
-    });
-    data.bindings.forEach(function(b) {
-      if (b.target_provider_name) {
-        var key = 's_' + b.adapter_id + '_' + b.target_provider_name;
-        if (!serviceNodes[key]) {
-          serviceNodes[key] = b.adapter_id;
-          nodes.push({ name: key, displayName: b.target_provider_name, depth: 4 });
-          nodeSet[key] = true;
-        }
-      }
-    });
-
-    // Build provider→adapter and adapter→service links from bindings
-    // Track weights: how many services each provider maps to through an adapter
-    var paLinks = {}; // "p_X|a_Y" → count
-    var asLinks = {}; // "a_X|s_Y" → count
-
-    data.bindings.forEach(function(b) {
-      var pKey = 'p_' + b.provider_id;
-      var aKey = 'a_' + b.adapter_id;
-      if (!nodeSet[pKey] || !nodeSet[aKey]) return;
-
-      // provider → adapter
-      var paKey = pKey + '|' + aKey;
-      if (!paLinks[paKey]) paLinks[paKey] = 0;
-
-      if (b.target_provider_name) {
-        var sKey = 's_' + b.adapter_id + '_' + b.target_provider_name;
-        if (nodeSet[sKey]) {
-          paLinks[paKey] += 1;
-          var asKey = aKey + '|' + sKey;
-          asLinks[asKey] = (asLinks[asKey] || 0) + 1;
-        }
-      } else {
-        // Binding without target: just connect provider→adapter with weight 1
-        paLinks[paKey] = Math.max(paLinks[paKey], 1);
-      }
-    });
-
-    // Emit provider→adapter links
-    Object.keys(paLinks).forEach(function(k) {
-      var parts = k.split('|');
-      links.push({ source: parts[0], target: parts[1], value: Math.max(paLinks[k], 1) });
-    });
-
-    // Emit adapter→service links (bound ones with weight from bindings)
-    Object.keys(asLinks).forEach(function(k) {
-      var parts = k.split('|');
-      links.push({ source: parts[0], target: parts[1], value: asLinks[k] });
-    });
-
-    // Unbound services: adapter→service with value 1
-    Object.keys(serviceNodes).forEach(function(sKey) {
-      var aid = serviceNodes[sKey];
-      var aKey = 'a_' + aid;
-      var alreadyLinked = Object.keys(asLinks).some(function(k) { return k === aKey + '|' + sKey; });
-      if (!alreadyLinked && nodeSet[aKey]) {
-        links.push({ source: aKey, target: sKey, value: 1 });
-      }
+// Expanded (un-aggregated) vendors, adapter subgraph filter, and the graph on screen
+var _topoExpand = [];
+var _topoAdapter = '';
+var _topoShown = '';
+var _topoQuery = null;
+
+// Client copy of the topology, kept current with /api/sync/topology/changes
+var _topo = null; // { version, fp, data }
+var _topoSort = {
+  vendors: function(a, b) { return a.name < b.name ? -1 : a.name > b.name ? 1 : 0; },
+  keys: function(a, b) { return a.id - b.id; },
+  providers: function(a, b) { return a.name < b.name ? -1 : a.name > b.name ? 1 : 0; },
+  bindings: function(a, b) { return a.id - b.id; }
+};
+
+// Merge changes since the last seen version into _topo; false when nothing changed
+async function syncTopology() {
+  var q = _topo ? '?since=' + _topo.version + '&fp=' + encodeURIComponent(_topo.fp) : '';
+  var res = await api('/api/sync/topology/changes' + q);
+  if (res.full) {
+    _topo = { version: res.version, fp: res.adapters_fp, data: res.topology };
+    return true;
+  }
+  var changed = false;
+  Object.keys(res.upsert).forEach(function(entity) {
+    var upsert = res.upsert[entity], remove = res.remove[entity];
+    if (!upsert.length && !remove.length) return;
+    changed = true;
+    var byId = {}, gone = {};
+    upsert.forEach(function(item) { byId[item.id] = item; });
+    remove.forEach(function(id) { gone[id] = true; });
+    // Replace in place so unchanged nodes keep their order in the diagram
+    var list = _topo.data[entity].filter(function(item) { return !gone[item.id]; }).map(function(item) {
+      var next = byId[item.id];
+      if (next) delete byId[item.id];
+      return next || item;
     });
+    Object.keys(byId).forEach(function(id) { list.push(byId[id]); });
+    if (_topoSort[entity]) list.sort(_topoSort[entity]);
+    _topo.data[entity] = list;
+  });
+  _topo.version = res.version;
+  _topo.fp = res.adapters_fp;
+  return changed;
+}
 
-    // Propagate flow values bottom-up (flow-conserving)
-    propagateFlow(links);
+async function loadTopology() {
+  try {
+    // Polls only fetch the delta (a few ms); the Sankey itself is re-requested after a change.
+    // Nodes, links and flow weights are computed server-side; vendors with many
+    // keys/providers arrive collapsed into summary nodes until expanded.
+    var changed = await syncTopology();
+    var query = '?expand=' + _topoExpand.join(',') + (_topoAdapter ? '&adapter_id=' + encodeURIComponent(_topoAdapter) : '');
+    if (!changed && query === _topoQuery && topoChart) { topoChart.resize(); return; }
+    var graph = await api('/api/sync/topology/sankey' + query);
+    _topoQuery = query;
+    var shown = graph.version + '|' + graph.adapters_fp + '|' + query;
+    if (shown === _topoShown && topoChart) { topoChart.resize(); return; }
+    _topoShown = shown;
+    var nodes = graph.nodes, links = graph.links;
     _topoNodes = nodes;
     _topoLinks = links;
 
-    var maxN = Math.max(data.vendors.length, (data.keys || []).length, data.providers.length, data.adapters.length, Object.keys(serviceNodes).length);
+    var perDepth = [0, 0, 0, 0, 0];
+    nodes.forEach(function(n) { perDepth[n.depth]++; });
+    var maxN = Math.max.apply(null, perDepth);
     var el = document.getElementById('topology-chart');
     el.style.height = Math.max(400, maxN * 36 + 80) + 'px';
     if (!topoChart) { topoChart = echarts.init(el, null, { renderer: 'canvas' }); } else { topoChart.resize(); }
@@ -1110,7 +1064,14 @@ async function loadTopology() {
         });
       })(),
       tooltip: { trigger: 'item', formatter: function(p) {
-        if (p.dataType === 'node') return p.data.displayName;
+        if (p.dataType === 'node') {
+          if (p.data.name.indexOf('p_') === 0) {
+            var pid = parseInt(p.data.name.slice(2));
+            var prov = _topo.data.providers.find(function(x) { return x.id === pid; });
+            if (prov && prov.health) return p.data.displayName + ' · ' + prov.health;
+          }
+          return p.data.displayName;
+        }
         if (p.dataType === 'edge') {
           var s = nodes.find(function(n) { return n.name === p.data.source; });
           var t = nodes.find(function(n) { return n.name === p.data.target; });
@@ -1168,6 +1129,20 @@ async function loadTopology() {
       if (params.dataType !== 'node') return;
       var name = params.data.name;
       var display = params.data.displayName;
+      var agg = params.data.aggregate;
+      if (agg && agg.kind === 'services') {
+        // Endpoint summary → show that adapter's subgraph in full
+        _topoAdapter = agg.adapter_id;
+        loadTopology();
+        setDashboardFilter({ adapter_id: agg.adapter_id, label: '运行服务: ' + agg.adapter_id });
+        return;
+      }
+      if (agg) {
+        // Key/provider summary → expand that vendor
+        _topoExpand.push(agg.vendor_id);
+        loadTopology();
+        return;
+      }
       if (name.indexOf('v_') === 0) {
         setDashboardFilter({ vendor_id: parseInt(name.slice(2)), label: '服务商: ' + display });
       } else if (name.indexOf('k_') === 0) {
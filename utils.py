@@ -1,6 +1,12 @@
 """Common utility functions shared across routes and services."""
+from fastapi.responses import JSONResponse, Response
 from db import decrypt
 
+try:
+    import orjson
+except ImportError:  # optional; falls back to the stdlib encoder
+    orjson = None
+
 
 def mask_key(key: str) -> str:
     """Mask an API key for display, showing first/last 4 chars."""
@@ -16,6 +22,17 @@ def mask_key_enc(api_key_enc: str) -> str:
     return mask_key(decrypt(api_key_enc))
 
 
+def fast_json(content, headers: dict = None) -> Response:
+    """Serialize already-trusted plain data straight to a response.
+
+    For list endpoints built from internal rows: returning a Response skips
+    FastAPI's response_model re-validation (the model still documents the
+    schema in OpenAPI), and orjson is used when installed."""
+    if orjson is not None:
+        return Response(orjson.dumps(content), media_type="application/json", headers=headers)
+    return JSONResponse(content, headers=headers)
+
+
 def resolve_api_key(db, provider) -> str:
     """Get the decrypted API key for a provider via its vendor_key_id."""
     kid = provider["vendor_key_id"]